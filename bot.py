@@ -1,10 +1,10 @@
 import discord
 import yaml
-import asyncio
 import os
 import time
 from core.logs.logger import logger, log_command
-from core.utils.cleanup import start_cleanup, stop_cleanup
+from core.utils.cleanup import CleanupManager
+from core.tickets import manager as tickets
 
 # Carregar configurações
 with open('config/bot.yaml', 'r', encoding='utf-8') as f:
@@ -23,8 +23,16 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
 
+class HyperDeployBot(discord.Bot):
+    """Bot com parada ordenada (deploys em andamento, sessões e dados pendentes)"""
+    
+    async def close(self):
+        await shutdown_services()
+        await super().close()
+
 # Criar bot
-bot = discord.Bot(intents=intents)
+bot = HyperDeployBot(intents=intents)
+bot.modules_ready = False
 
 # Variável global para o gerenciador de limpeza
 cleanup_manager = None
@@ -38,46 +46,96 @@ async def on_ready():
     logger.success(f"Bot online como {bot.user}")
     logger.info(f"Versão {BOT_VERSION} • {len(bot.guilds)} servidor(es)")
     
-    # Inicializar módulos primeiro
-    await initialize_modules()
-    
-    # Sincronizar comandos slash após inicializar módulos
-    try:
-        # Forçar sincronização completa para remover comandos antigos
-        synced = await bot.sync_commands(force=True)
-        if synced:
-            logger.info(f"Comandos sincronizados ({len(synced)} total)")
-        else:
-            logger.info("Comandos sincronizados")
-    except Exception as e:
-        logger.warning(f"Erro ao sincronizar comandos: {e}")
+    # on_ready dispara de novo a cada reconexão: módulos e comandos só na primeira vez
+    if not bot.modules_ready:
+        bot.modules_ready = True
+        
+        # Inicializar módulos primeiro
+        await initialize_modules()
+        
+        # Sincronizar comandos slash após inicializar módulos
+        try:
+            # Forçar sincronização completa para remover comandos antigos
+            synced = await bot.sync_commands(force=True)
+            if synced:
+                logger.info(f"Comandos sincronizados ({len(synced)} total)")
+            else:
+                logger.info("Comandos sincronizados")
+        except Exception as e:
+            logger.warning(f"Erro ao sincronizar comandos: {e}")
     
-    # Iniciar loops assíncronos após o bot estar online
+    # Iniciar loops assíncronos após o bot estar online (tarefas já ativas não são duplicadas)
     try:
-        from core.payments.manager import payment_manager
-        from core.payments.deploy_manager import deploy_manager
-        from core.tickets.manager import ticket_manager
-        
-        # Iniciar loop de limpeza de pagamentos
-        if payment_manager:
-            bot.loop.create_task(payment_manager.cleanup_loop())
-            logger.info("Loop de limpeza de pagamentos ativo")
-        
-        # Iniciar loop de deploy automático
-        if deploy_manager:
-            bot.loop.create_task(deploy_manager.start_deploy_loop())
-            logger.info("Loop de deploy automático ativo")
-        
-        # Iniciar loop de limpeza de tickets
-        if ticket_manager:
-            bot.loop.create_task(ticket_manager.cleanup_expired_tickets())
-            logger.info("Loop de limpeza de tickets ativo")
-            
+        start_background_tasks()
     except Exception as e:
         logger.error(f"Erro ao iniciar loops assíncronos: {e}")
     
     logger.success("Sistema HyperDeploy inicializado com sucesso")
 
+def start_background_tasks():
+    """Registra os loops em segundo plano no supervisor e inicia os que não estão rodando"""
+    global cleanup_manager
+    from core.utils.supervisor import setup as setup_supervisor
+    from core.utils.deadlines import deadline_scheduler
+    from core.payments.deploy_manager import deploy_manager
+    from core.payments.reconciliation import payment_reconciler
+    from core.tickets.access_control import RELOAD_INTERVAL, access_control
+    from core.storage.async_io import run_io
+    from core.logs.shipping import log_shipper
+    from core.utils.metrics_server import metrics_server
+    
+    supervisor = setup_supervisor()
+    
+    # Expiração de pagamentos, tickets, seleções e blobs (um único timer para o próximo prazo)
+    if deadline_scheduler:
+        supervisor.add_service("deadlines", deadline_scheduler.run)
+    
+    # Reconciliação de pagamentos com o Mercado Pago
+    if payment_reconciler:
+        supervisor.add_service("payments_reconciliation", payment_reconciler.start_reconciliation_loop, payment_reconciler.stop)
+    
+    # Deploy automático (na parada, os deploys em andamento terminam antes de desconectar; drain tem o próprio prazo)
+    if deploy_manager:
+        supervisor.add_service("deploys", deploy_manager.start_deploy_loop, deploy_manager.drain, shutdown_timeout=None)
+    
+    # Recarregar blacklist/whitelist quando os arquivos mudarem
+    if access_control:
+        supervisor.add_periodic("access_lists_reload", lambda: run_io(access_control.reload_if_changed), RELOAD_INTERVAL)
+    
+    # Varredura de segurança: QR Codes antigos, downloads interrompidos e blobs sem registro
+    if cleanup_manager is None:
+        cleanup_manager = CleanupManager(bot)
+    supervisor.add_periodic("files_cleanup", cleanup_manager.cleanup_expired_files, cleanup_manager.cleanup_interval)
+    
+    # Endpoint local de métricas (Prometheus)
+    if metrics_server:
+        supervisor.add_service("metrics_server", metrics_server.serve, metrics_server.stop)
+    
+    # Envio dos logs para os canais (registrado por último: na parada, entrega o que os outros serviços logaram)
+    if log_shipper:
+        supervisor.add_service("log_shipping", log_shipper.run, log_shipper.flush, shutdown_timeout=None)
+    
+    supervisor.start()
+
+async def shutdown_services():
+    """Encerra tarefas, sessões HTTP e gravações pendentes antes de desconectar"""
+    try:
+        from core.utils.supervisor import supervisor
+        if supervisor:
+            await supervisor.shutdown()
+        
+        from core.tickets.uploads import upload_manager
+        if upload_manager:
+            await upload_manager.close()
+        
+        from core.payments.mercadopago import close_client
+        await close_client()
+        
+        from core.storage.async_io import drain_writes
+        await drain_writes()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar serviços: {e}")
+
 async def initialize_modules():
     """Inicializa todos os módulos do sistema"""
     try:
@@ -85,9 +143,32 @@ async def initialize_modules():
         from core.payments.config_manager import setup as setup_config_manager
         setup_config_manager()
         
+        # Agendador de prazos antes dos módulos que registram expirações ao carregar
+        from core.utils.deadlines import setup as setup_deadlines
+        setup_deadlines()
+        
+        from core.utils.metrics_server import setup as setup_metrics_server
+        setup_metrics_server(bot_config.get('metrics') or {})
+        
         from core.payments.manager import setup as setup_payment_manager
         setup_payment_manager()
         
+        # Rastreamento da jornada (depois dos pagamentos: acompanha as transições de status)
+        from core.logs.tracing import setup as setup_tracing
+        setup_tracing(bot_config.get('tracing') or {})
+        
+        mercadopago_token = bot_config.get('mercadopago_access_token')
+        if mercadopago_token and mercadopago_token != "SEU_ACCESS_TOKEN_MERCADOPAGO_AQUI":
+            from core.payments.mercadopago import MERCADOPAGO_API_URL
+            from core.payments.reconciliation import setup as setup_reconciliation
+            setup_reconciliation(
+                mercadopago_token,
+                bot_config.get('mercadopago_api_url') or MERCADOPAGO_API_URL,
+                bot_config.get('mercadopago_reconciliation') or {}
+            )
+        else:
+            logger.warning("Access token Mercado Pago não configurado: pagamentos não serão confirmados automaticamente")
+        
         from core.squarecloud.client import setup as setup_squarecloud_manager
         api_key = squarecloud_config.get('api_key')
         if api_key and api_key != "SUA_API_KEY_AQUI":
@@ -98,6 +179,9 @@ async def initialize_modules():
         from core.squarecloud.user_keys import setup as setup_user_keys_manager
         setup_user_keys_manager()
         
+        from core.payments.repack import setup as setup_repack
+        setup_repack()
+        
         from core.payments.deploy_manager import setup as setup_deploy_manager
         setup_deploy_manager()
         
@@ -108,10 +192,19 @@ async def initialize_modules():
         setup_domain_manager()
         
         # Inicializar sistema de tickets
+        from core.tickets.access_control import setup as setup_access_control
+        setup_access_control()
+        
         from core.tickets.manager import setup as setup_tickets
         setup_tickets(bot)
         
-        # Inicializar sistema de uploads
+        # Inicializar sistema de uploads (arquivos endereçados por conteúdo)
+        from core.storage.blobs import setup as setup_blob_store
+        setup_blob_store()
+        
+        from core.tickets.copycat import setup as setup_copycat
+        setup_copycat()
+        
         from core.tickets.uploads import setup as setup_uploads
         setup_uploads(bot)
         
@@ -119,10 +212,12 @@ async def initialize_modules():
         from core.commands.userpanel import setup as setup_userpanel
         from core.commands.admin_panel import setup as setup_admin_panel
         from core.logs.organized_logger import setup as setup_organized_logger
+        from core.logs.shipping import setup as setup_log_shipping
 
         setup_userpanel(bot, GUILD_ID)
         setup_admin_panel(bot, GUILD_ID)
         setup_organized_logger(bot)
+        setup_log_shipping(bot)
         
         logger.info("Todos os módulos carregados com sucesso")
         
@@ -144,14 +239,21 @@ async def on_guild_remove(guild):
 @bot.event
 async def on_message(message):
     """Evento executado quando uma mensagem é enviada"""
-    # Ignorar mensagens do próprio bot
-    if message.author == bot.user:
-        return
-    
-    # Processar uploads em tickets
-    if message.channel.name.startswith('ticket-'):
+    # Caminho rápido: só anexos em canais de tickets abertos chegam ao sistema de uploads
+    # (o resto das mensagens custa uma consulta ao conjunto de canais)
+    if message.attachments and tickets.ticket_manager and tickets.ticket_manager.is_ticket_channel(message.channel.id):
+        # Ignorar mensagens do próprio bot
+        if message.author == bot.user:
+            return
+        from core.tickets.access_control import access_control
         from core.tickets.uploads import upload_manager
-        if upload_manager:
+        # Usuário ou servidor bloqueado: recusado antes de baixar o anexo
+        guild_id = message.guild.id if message.guild else None
+        if access_control and access_control.check(message.author.id, guild_id, surface="upload"):
+            if upload_manager:
+                await upload_manager.send_blocked_upload_message(message.channel)
+        elif upload_manager and message.attachments:
+            # Mensagens sem anexo não são uploads: nada a verificar
             await upload_manager.process_upload(message)
     
     # Processar seleção de aplicações
@@ -261,9 +363,11 @@ if __name__ == "__main__":
         bot.run(BOT_TOKEN)
     except KeyboardInterrupt:
         logger.info("Bot interrompido pelo usuário")
-        if cleanup_manager:
-            asyncio.run(stop_cleanup(cleanup_manager))
     except Exception as e:
         logger.critical(f"Erro fatal ao iniciar bot: {e}")
-        if cleanup_manager:
-            asyncio.run(stop_cleanup(cleanup_manager))
+    finally:
+        # Gravações de dados que ainda estavam agendadas quando o loop parou
+        from core.storage.async_io import flush_writes_sync
+        flush_writes_sync()
+        from core.utils.workers import shutdown_workers
+        shutdown_workers()
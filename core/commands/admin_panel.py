@@ -41,7 +41,7 @@ class AdminMainPanel(discord.ui.View):
     async def status_btn(self, button, interaction):
         if not await self.check_admin_permissions(interaction):
             return
-        await interaction.response.send_message(embed=embed_status_panel(), view=StatusPanel(self.ctx), ephemeral=True)
+        await interaction.response.send_message(embed=await embed_status_panel(), view=StatusPanel(self.ctx), ephemeral=True)
         await self.log_admin_action(interaction.user.id, "Acessou Painel de Status")
 
     @discord.ui.button(label="🧹 Limpeza", style=discord.ButtonStyle.danger, custom_id="cleanup_btn")
@@ -132,23 +132,32 @@ def embed_config_panel():
     embed.set_footer(text="HyperDeploy • Configurações")
     return embed
 
-def embed_status_panel():
+async def embed_status_panel():
     import os
     from datetime import datetime
+    from core.storage.async_io import get_io_statistics, scan_dir
     
     # Verificar status dos serviços
     mercadopago_status = "✅ Configurado" if os.path.exists('config/bot.yaml') else "❌ Não configurado"
     squarecloud_status = "✅ Configurado" if os.path.exists('config/squarecloud.yaml') else "❌ Não configurado"
     
-    # Verificar arquivos importantes
-    uploads_count = len([f for f in os.listdir('uploads') if f.endswith('.zip')]) if os.path.exists('uploads') else 0
-    qrcodes_count = len([f for f in os.listdir('qrcodes') if f.endswith('.png')]) if os.path.exists('qrcodes') else 0
+    # Verificar arquivos importantes (listagem fora do loop)
+    from core.storage.blobs import blob_store
+    uploads_count = len(await scan_dir('uploads', '.zip'))
+    blob_stats = blob_store.get_statistics() if blob_store else None
+    if blob_stats:
+        uploads_count += blob_stats['blobs']
+    qrcodes_count = len(await scan_dir('qrcodes', '.png'))
     
     # Verificar configurações atuais
     current_price = config_manager.get_fresh_deploy_price() if config_manager else 10.00
     current_size = config_manager.get_max_file_size_mb() if config_manager else 25
     current_timeout = config_manager.get_ticket_timeout_minutes() if config_manager else 30
     
+    # Fila de deploys
+    from core.payments.deploy_manager import deploy_manager
+    deploy_stats = deploy_manager.get_deploy_statistics() if deploy_manager else None
+    
     embed = discord.Embed(
         title="📊 Status do Sistema HyperDeploy",
         description="Monitoramento completo do sistema",
@@ -171,6 +180,117 @@ def embed_status_panel():
     embed.add_field(name="📏 Tamanho Máx", value=f"{current_size} MB", inline=True)
     embed.add_field(name="⏱️ Timeout", value=f"{current_timeout} min", inline=True)
     
+    if deploy_stats:
+        embed.add_field(
+            name="🚀 Deploys",
+            value=(
+                f"Fila: {deploy_stats['queue_depth']} | Ativos: {deploy_stats['active']}/{deploy_stats['max_concurrent']}\n"
+                f"Espera p95: {deploy_stats['wait_time']['p95']:.1f}s | Execução p95: {deploy_stats['run_time']['p95']:.1f}s"
+            ),
+            inline=False
+        )
+    
+    # Cache da Square Cloud
+    from core.squarecloud.client import squarecloud_manager
+    cache_stats = squarecloud_manager.get_cache_statistics() if squarecloud_manager else None
+    if cache_stats:
+        embed.add_field(
+            name="☁️ Cache Square Cloud",
+            value=(
+                f"Acertos: {cache_stats['cache']['hits']} | Falhas: {cache_stats['cache']['misses']} | "
+                f"Agrupadas: {cache_stats['cache']['coalesced']}\n"
+                f"Taxa de acerto: {cache_stats['cache']['hit_rate'] * 100:.0f}% | Clientes: {cache_stats['clients']['clients']}"
+            ),
+            inline=False
+        )
+    
+    io_stats = get_io_statistics()
+    embed.add_field(
+        name="💾 Disco",
+        value=(
+            f"Pendentes: {io_stats['pending_writes']} | Agrupadas: {io_stats['coalesced_writes']}\n"
+            f"Latência p95: {io_stats['latency']['p95'] * 1000:.1f}ms | máx: {io_stats['latency']['max'] * 1000:.1f}ms"
+        ),
+        inline=False
+    )
+    
+    if blob_stats:
+        embed.add_field(
+            name="📦 Uploads",
+            value=(
+                f"Blobs: {blob_stats['blobs']} ({blob_stats['bytes'] / (1024 * 1024):.1f} MB) | Em uso: {blob_stats['referenced']}\n"
+                f"Duplicados: {blob_stats['dedup_hits']} | Economia: {blob_stats['bytes_saved'] / (1024 * 1024):.1f} MB"
+            ),
+            inline=False
+        )
+    
+    from core.tickets.access_control import access_control
+    access_stats = access_control.get_statistics() if access_control else None
+    if access_stats:
+        embed.add_field(
+            name="🛡️ Controle de Acesso",
+            value=(
+                f"Bloqueios: {access_stats['blacklist']} | Liberações: {access_stats['whitelist']}\n"
+                f"Rejeições: {access_stats['total_rejections']} | Recargas: {access_stats['reloads']}"
+            ),
+            inline=False
+        )
+    
+    from core.utils.supervisor import supervisor
+    task_stats = supervisor.get_statistics() if supervisor else None
+    if task_stats:
+        embed.add_field(
+            name="🧭 Tarefas",
+            value="\n".join(
+                f"{'🟢' if stats['running'] else '🔴'} {name}: {stats['runs']} exec. | "
+                f"falhas {stats['failures']} | atraso p95 {stats['lag']['p95']:.2f}s"
+                for name, stats in task_stats.items()
+            ),
+            inline=False
+        )
+    
+    from core.utils.deadlines import deadline_scheduler
+    deadline_stats = deadline_scheduler.get_statistics() if deadline_scheduler else None
+    if deadline_stats:
+        next_in = deadline_stats["next_in"]
+        embed.add_field(
+            name="⏰ Prazos",
+            value=(
+                f"Agendados: {deadline_stats['scheduled']} | Disparados: {deadline_stats['fired']} | "
+                f"Falhas: {deadline_stats['failures']}\n"
+                f"Próximo: {f'{next_in:.0f}s' if next_in is not None else '—'} | "
+                f"Atraso p99: {deadline_stats['lateness']['p99'] * 1000:.0f} ms"
+            ),
+            inline=False
+        )
+    
+    from core.logs.shipping import log_shipper
+    shipping_stats = log_shipper.get_statistics() if log_shipper else None
+    if shipping_stats:
+        embed.add_field(
+            name="📨 Logs nos Canais",
+            value=(
+                f"Na fila: {shipping_stats['backlog']} (mais antigo {shipping_stats['oldest_age']:.0f}s) | "
+                f"Entrega p95: {shipping_stats['delivery_delay']['p95']:.1f}s\n"
+                f"Enviados: {shipping_stats['sent_embeds']} em {shipping_stats['sent_messages']} mensagens | "
+                f"Descartados: {sum(shipping_stats['dropped'].values()) + sum(shipping_stats['sampled'].values())}"
+            ),
+            inline=False
+        )
+    
+    from core.logs.tracing import journey_tracer
+    journey_stats = journey_tracer.get_statistics() if journey_tracer else None
+    if journey_stats and journey_stats["stages"]:
+        embed.add_field(
+            name="🛤️ Jornadas",
+            value="\n".join(
+                f"{stage}: {stats['count']} | duração p50 {stats['duration']['p50']:.0f}s | "
+                f"desde o ticket p50 {stats['since_start']['p50']:.0f}s"
+                for stage, stats in journey_stats["stages"].items()
+            ),
+            inline=False
+        )
+    
     embed.set_footer(text="HyperDeploy • Monitoramento em Tempo Real")
     return embed
 
@@ -588,7 +708,7 @@ class StatusPanel(discord.ui.View):
     async def refresh(self, button, interaction):
         if not await self.check_admin_permissions(interaction):
             return
-        embed = embed_status_panel()
+        embed = await embed_status_panel()
         await interaction.response.edit_message(embed=embed)
 
     @discord.ui.button(label="❌ Fechar", style=discord.ButtonStyle.danger)
@@ -626,35 +746,20 @@ class CleanupPanel(discord.ui.View):
             backup_dir = f"backups/cleanup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             os.makedirs(backup_dir, exist_ok=True)
             
-            # Limpar arquivos temporários
-            cleaned_files = 0
-            cleaned_size = 0
-            
-            # Limpar QR codes antigos (mais de 1 hora)
-            qrcodes_dir = "qrcodes"
-            if os.path.exists(qrcodes_dir):
-                for file in os.listdir(qrcodes_dir):
-                    if file.endswith('.png'):
-                        file_path = os.path.join(qrcodes_dir, file)
-                        file_age = datetime.now().timestamp() - os.path.getmtime(file_path)
-                        if file_age > 3600:  # 1 hora
-                            size = os.path.getsize(file_path)
-                            os.remove(file_path)
-                            cleaned_files += 1
-                            cleaned_size += size
+            # Limpar arquivos temporários (listagem e remoção fora do loop)
+            from core.storage.async_io import remove_files, scan_dir
+            now = datetime.now().timestamp()
             
-            # Limpar uploads antigos (mais de 24 horas)
-            uploads_dir = "uploads"
-            if os.path.exists(uploads_dir):
-                for file in os.listdir(uploads_dir):
-                    if file.endswith('.zip'):
-                        file_path = os.path.join(uploads_dir, file)
-                        file_age = datetime.now().timestamp() - os.path.getmtime(file_path)
-                        if file_age > 86400:  # 24 horas
-                            size = os.path.getsize(file_path)
-                            os.remove(file_path)
-                            cleaned_files += 1
-                            cleaned_size += size
+            # QR codes antigos (mais de 1 hora) e uploads antigos (mais de 24 horas)
+            expired = [
+                file_path for _, file_path, _, mtime, _ in await scan_dir("qrcodes", ".png")
+                if now - mtime > 3600
+            ]
+            expired += [
+                file_path for _, file_path, _, mtime, _ in await scan_dir("uploads", ".zip")
+                if now - mtime > 86400
+            ]
+            cleaned_files, cleaned_size = await remove_files(expired)
             
             cleaned_size_mb = cleaned_size / (1024 * 1024)
             
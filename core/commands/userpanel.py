@@ -1,8 +1,8 @@
 import discord
 import yaml
-import json
 import asyncio
-from squarecloud import Client
+import time
+from core.squarecloud.client import get_manager
 from datetime import datetime
 from core.logs.logger import logger
 
@@ -16,10 +16,21 @@ BOT_VERSION = bot_config.get('version', '1.0.0')
 with open('config/squarecloud.yaml', 'r', encoding='utf-8') as f:
     squarecloud_config = yaml.safe_load(f)
 
-PAYMENTS_FILE = "data/payments.json"
-
 # Dicionário para armazenar seleções de aplicação por usuário
 user_app_selections = {}
+# Seleções expiram junto com os painéis (segundos)
+APP_SELECTION_TTL = 300
+
+def remember_app_selection(user_id: str, selection: dict):
+    """Guarda a seleção do usuário e agenda sua remoção"""
+    user_app_selections[user_id] = selection
+    from core.utils.deadlines import deadline_scheduler
+    if deadline_scheduler:
+        deadline_scheduler.schedule(
+            f"app_selection:{user_id}",
+            time.time() + APP_SELECTION_TTL,
+            lambda: user_app_selections.pop(user_id, None)
+        )
 
 class UserMainPanel(discord.ui.View):
     def __init__(self, ctx):
@@ -95,7 +106,7 @@ def embed_key_panel():
     return embed
 
 def embed_payments_panel():
-    return discord.Embed(title="💳 Pagamentos", description="Veja seu histórico de pagamentos.", color=0x00ffff)
+    return discord.Embed(title="💳 Pagamentos", description="Veja seu histórico de pagamentos e o QR Code do pagamento pendente.", color=0x00ffff)
 
 def embed_status_panel():
     return discord.Embed(title="📊 Status", description="Veja status e controle aplicações.", color=0x00ff00)
@@ -134,8 +145,15 @@ class DeployPanel(discord.ui.View):
                 await interaction.response.send_message("❌ Sistema de tickets não disponível.", ephemeral=True, delete_after=5)
                 return
             
-            # Verificar se usuário já tem ticket ativo
+            # Usuário ou servidor bloqueado não abre ticket
+            from core.tickets.access_control import access_control
             user_id = interaction.user.id
+            guild_id = interaction.guild.id if interaction.guild else None
+            if access_control and access_control.check(user_id, guild_id, surface="ticket_panel"):
+                await interaction.response.send_message("🚫 Você não pode abrir tickets. Entre em contato com um administrador.", ephemeral=True, delete_after=10)
+                return
+            
+            # Verificar se usuário já tem ticket ativo
             existing_ticket = ticket_manager.get_ticket_info(user_id)
             
             if existing_ticket:
@@ -208,8 +226,7 @@ class DeletePanel(discord.ui.View):
     @discord.ui.button(label="Selecionar App", style=discord.ButtonStyle.primary)
     async def select_app(self, button, interaction):
         try:
-            client = Client(squarecloud_config["api_key"])
-            apps = await client.all_apps()
+            apps = await get_manager().list_apps(squarecloud_config["api_key"], raise_errors=True)
             if not apps:
                 await interaction.response.send_message("❌ Nenhuma aplicação encontrada.", ephemeral=True, delete_after=5)
                 return
@@ -222,11 +239,11 @@ class DeletePanel(discord.ui.View):
             
             # Armazenar apps para seleção posterior
             user_id = str(interaction.user.id)
-            user_app_selections[user_id] = {
+            remember_app_selection(user_id, {
                 'apps': apps[:10],
                 'panel': 'delete',
                 'timestamp': datetime.now()
-            }
+            })
             
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao carregar aplicações: {e}", ephemeral=True, delete_after=5)
@@ -241,8 +258,9 @@ class DeletePanel(discord.ui.View):
             return
         
         try:
-            client = Client(squarecloud_config["api_key"])
-            await client.delete_app(selected_app)
+            if not await get_manager().delete_app(squarecloud_config["api_key"], selected_app):
+                await interaction.response.send_message("❌ Erro ao deletar aplicação.", ephemeral=True, delete_after=5)
+                return
             await interaction.response.send_message(f"✅ Aplicação {selected_app} deletada com sucesso!", ephemeral=True, delete_after=10)
             
             # Limpar seleção
@@ -324,8 +342,7 @@ class KeyPanel(discord.ui.View):
             
             # Testar chave com Square Cloud
             try:
-                client = Client(api_key)
-                apps = await client.all_apps()
+                apps = await get_manager().list_apps(api_key, raise_errors=True)
                 
                 embed = discord.Embed(
                     title="✅ Chave Válida",
@@ -365,18 +382,17 @@ class UserPaymentsPanel(discord.ui.View):
     @discord.ui.button(label="Ver Histórico", style=discord.ButtonStyle.primary)
     async def view_history(self, button, interaction):
         try:
-            user_id = str(interaction.user.id)
-            with open(PAYMENTS_FILE, "r") as f:
-                all_payments = json.load(f)
+            from core.payments.manager import payment_manager
             
-            user_payments = all_payments.get(user_id, [])
+            # O snapshot em disco pode estar atrás do journal; consultar o gerenciador
+            user_payments = payment_manager.get_payments_by_user(interaction.user.id) if payment_manager else []
             if not user_payments:
                 await interaction.response.send_message("Nenhum pagamento encontrado.", ephemeral=True, delete_after=10)
                 return
             
             # Mostrar últimos 5 pagamentos
             recent_payments = user_payments[-5:]
-            msg = '\n'.join([f"R$ {p.get('amount', 0):.2f} - {p.get('status', 'unknown')} - {p.get('date', 'unknown')}" for p in recent_payments])
+            msg = '\n'.join([f"R$ {p.get('amount', 0):.2f} - {p.get('status', 'unknown')} - {(p.get('created_at') or 'unknown')[:16]}" for p in recent_payments])
             
             embed = discord.Embed(title="💳 Seus Últimos Pagamentos", color=0x00ffff)
             embed.add_field(name="Histórico", value=msg, inline=False)
@@ -387,6 +403,35 @@ class UserPaymentsPanel(discord.ui.View):
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao carregar pagamentos: {e}", ephemeral=True, delete_after=5)
     
+    @discord.ui.button(label="Ver QR Code", style=discord.ButtonStyle.success)
+    async def show_qr_code(self, button, interaction):
+        try:
+            from core.payments.manager import payment_manager
+            from core.payments.qrcodes import qr_renderer
+            
+            # Pagamento pendente mais recente com código PIX
+            user_payments = payment_manager.get_payments_by_user(interaction.user.id) if payment_manager else []
+            pending = [p for p in user_payments if p.get("status") == "pending" and p.get("pix_key")]
+            if not pending:
+                await interaction.response.send_message("Nenhum pagamento pendente.", ephemeral=True, delete_after=10)
+                return
+            payment = max(pending, key=lambda p: p.get("created_at") or "")
+            
+            # Reenvio: o PNG normalmente já está no cache
+            file = await qr_renderer.get_file(payment["pix_key"])
+            embed = discord.Embed(title="💳 QR Code PIX", color=0x00ff00)
+            embed.add_field(name="Valor", value=f"R$ {payment.get('amount', 0):.2f}", inline=True)
+            if payment.get("expires_at"):
+                expires_at = int(datetime.fromisoformat(payment["expires_at"]).timestamp())
+                embed.add_field(name="⏰ Expira", value=f"<t:{expires_at}:R>", inline=True)
+            embed.set_image(url="attachment://qrcode.png")
+            embed.set_footer(text="HyperDeploy • Sistema de Pagamentos")
+            
+            await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+            
+        except Exception as e:
+            await interaction.response.send_message(f"❌ Erro ao carregar QR Code: {e}", ephemeral=True, delete_after=5)
+    
     @discord.ui.button(label="Fechar", style=discord.ButtonStyle.danger)
     async def close(self, button, interaction):
         await interaction.response.defer(ephemeral=True)
@@ -402,8 +447,7 @@ class UserStatusPanel(discord.ui.View):
     @discord.ui.button(label="Selecionar App", style=discord.ButtonStyle.primary)
     async def select_app(self, button, interaction):
         try:
-            client = Client(squarecloud_config["api_key"])
-            apps = await client.all_apps()
+            apps = await get_manager().list_apps(squarecloud_config["api_key"], raise_errors=True)
             if not apps:
                 await interaction.response.send_message("❌ Nenhuma aplicação encontrada.", ephemeral=True, delete_after=5)
                 return
@@ -416,11 +460,11 @@ class UserStatusPanel(discord.ui.View):
             
             # Armazenar apps para seleção posterior
             user_id = str(interaction.user.id)
-            user_app_selections[user_id] = {
+            remember_app_selection(user_id, {
                 'apps': apps[:10],
                 'panel': 'status',
                 'timestamp': datetime.now()
-            }
+            })
             
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao carregar aplicações: {e}", ephemeral=True, delete_after=5)
@@ -434,8 +478,7 @@ class UserStatusPanel(discord.ui.View):
             await interaction.response.send_message("❌ Selecione uma aplicação primeiro.", ephemeral=True, delete_after=5)
             return
         try:
-            client = Client(squarecloud_config["api_key"])
-            app = await client.app(selected_app)
+            app = await get_manager().get_app_status(squarecloud_config["api_key"], selected_app, raise_errors=True)
             embed = discord.Embed(title=f"📊 Status de {selected_app}", color=0x00ff00)
             embed.add_field(name="Status", value=getattr(app, "status", "-"), inline=True)
             embed.add_field(name="CPU", value=getattr(app, "cpu", "-"), inline=True)
@@ -454,8 +497,9 @@ class UserStatusPanel(discord.ui.View):
             await interaction.response.send_message("❌ Selecione uma aplicação primeiro.", ephemeral=True, delete_after=5)
             return
         try:
-            client = Client(squarecloud_config["api_key"])
-            await client.start_app(selected_app)
+            if not await get_manager().start_app(squarecloud_config["api_key"], selected_app):
+                await interaction.response.send_message("❌ Erro ao iniciar aplicação.", ephemeral=True, delete_after=5)
+                return
             await interaction.response.send_message(f"✅ Aplicação {selected_app} iniciada!", ephemeral=True, delete_after=5)
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao iniciar aplicação: {e}", ephemeral=True, delete_after=5)
@@ -469,8 +513,9 @@ class UserStatusPanel(discord.ui.View):
             await interaction.response.send_message("❌ Selecione uma aplicação primeiro.", ephemeral=True, delete_after=5)
             return
         try:
-            client = Client(squarecloud_config["api_key"])
-            await client.stop_app(selected_app)
+            if not await get_manager().stop_app(squarecloud_config["api_key"], selected_app):
+                await interaction.response.send_message("❌ Erro ao parar aplicação.", ephemeral=True, delete_after=5)
+                return
             await interaction.response.send_message(f"🛑 Aplicação {selected_app} parada!", ephemeral=True, delete_after=5)
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao parar aplicação: {e}", ephemeral=True, delete_after=5)
@@ -490,8 +535,7 @@ class UserBackupPanel(discord.ui.View):
     @discord.ui.button(label="Selecionar App", style=discord.ButtonStyle.primary)
     async def select_app(self, button, interaction):
         try:
-            client = Client(squarecloud_config["api_key"])
-            apps = await client.all_apps()
+            apps = await get_manager().list_apps(squarecloud_config["api_key"], raise_errors=True)
             if not apps:
                 await interaction.response.send_message("❌ Nenhuma aplicação encontrada.", ephemeral=True, delete_after=5)
                 return
@@ -504,11 +548,11 @@ class UserBackupPanel(discord.ui.View):
             
             # Armazenar apps para seleção posterior
             user_id = str(interaction.user.id)
-            user_app_selections[user_id] = {
+            remember_app_selection(user_id, {
                 'apps': apps[:10],
                 'panel': 'backup',
                 'timestamp': datetime.now()
-            }
+            })
             
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao carregar aplicações: {e}", ephemeral=True, delete_after=5)
@@ -522,8 +566,10 @@ class UserBackupPanel(discord.ui.View):
             await interaction.response.send_message("❌ Selecione uma aplicação primeiro.", ephemeral=True, delete_after=5)
             return
         try:
-            client = Client(squarecloud_config["api_key"])
-            result = await client.create_backup(selected_app)
+            result = await get_manager().create_backup(squarecloud_config["api_key"], selected_app)
+            if not result:
+                await interaction.response.send_message("❌ Erro ao criar backup.", ephemeral=True, delete_after=5)
+                return
             await interaction.response.send_message(f"✅ Backup criado para {selected_app}! ID: {result.get('backup_id', '-')}", ephemeral=True, delete_after=10)
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao criar backup: {e}", ephemeral=True, delete_after=5)
@@ -537,8 +583,7 @@ class UserBackupPanel(discord.ui.View):
             await interaction.response.send_message("❌ Selecione uma aplicação primeiro.", ephemeral=True, delete_after=5)
             return
         try:
-            client = Client(squarecloud_config["api_key"])
-            backups = await client.list_backups(selected_app)
+            backups = await get_manager().list_backups(squarecloud_config["api_key"], selected_app)
             if not backups:
                 await interaction.response.send_message(f"Nenhum backup encontrado para {selected_app}.", ephemeral=True, delete_after=10)
                 return
@@ -562,8 +607,7 @@ class UserDomainPanel(discord.ui.View):
     @discord.ui.button(label="Selecionar App", style=discord.ButtonStyle.primary)
     async def select_app(self, button, interaction):
         try:
-            client = Client(squarecloud_config["api_key"])
-            apps = await client.all_apps()
+            apps = await get_manager().list_apps(squarecloud_config["api_key"], raise_errors=True)
             if not apps:
                 await interaction.response.send_message("❌ Nenhuma aplicação encontrada.", ephemeral=True, delete_after=5)
                 return
@@ -576,11 +620,11 @@ class UserDomainPanel(discord.ui.View):
             
             # Armazenar apps para seleção posterior
             user_id = str(interaction.user.id)
-            user_app_selections[user_id] = {
+            remember_app_selection(user_id, {
                 'apps': apps[:10],
                 'panel': 'domain',
                 'timestamp': datetime.now()
-            }
+            })
             
         except Exception as e:
             await interaction.response.send_message(f"❌ Erro ao carregar aplicações: {e}", ephemeral=True, delete_after=5)
@@ -594,8 +638,7 @@ class UserDomainPanel(discord.ui.View):
             await interaction.response.send_message("❌ Selecione uma aplicação primeiro.", ephemeral=True, delete_after=5)
             return
         try:
-            client = Client(squarecloud_config["api_key"])
-            domains = await client.list_domains(selected_app)
+            domains = await get_manager().list_domains(squarecloud_config["api_key"], selected_app)
             if not domains:
                 await interaction.response.send_message(f"Nenhum domínio encontrado para {selected_app}.", ephemeral=True, delete_after=10)
                 return
@@ -1,102 +1,231 @@
+import atexit
+import gzip
+import json
 import logging
 import os
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Tamanhos aceitos em logging.max_size ("10MB", "512KB", 1048576)
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "B": 1}
+
+
+def load_logging_config() -> dict:
+    """Lê a seção `logging` do config/bot.yaml (valores padrão se ausente)"""
+    try:
+        if os.path.exists('config/bot.yaml'):
+            import yaml
+            with open('config/bot.yaml', 'r', encoding='utf-8') as f:
+                return (yaml.safe_load(f) or {}).get("logging") or {}
+    except Exception:
+        # O logger ainda não existe: segue com os padrões
+        pass
+    return {}
+
+
+def parse_size(value, default: int) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value or "").strip().upper()
+    for unit, multiplier in SIZE_UNITS.items():
+        if text.endswith(unit):
+            try:
+                return int(float(text[:-len(unit)].strip()) * multiplier)
+            except ValueError:
+                return default
+    return int(text) if text.isdigit() else default
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Entrega o registro à fila sem formatá-lo: data, nível e layout ficam para o thread de escrita.
+    Só o que não pode esperar é resolvido aqui (argumentos mutáveis e traceback).
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro (para coletores de log)"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "icon": getattr(record, "icon", ""),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class IconFormatter(logging.Formatter):
+    """Formatação em texto com o emoji do nível (registros de fora do HyperDeployLogger não têm ícone)"""
+
+    def format(self, record):
+        if not hasattr(record, "icon"):
+            record.icon = ""
+        return super().format(record)
+
+
+def compress_rotated(source: str, dest: str):
+    """Compacta o arquivo rotacionado em segundo plano (o thread de escrita só faz o rename)"""
+    # Nome único: uma rotação nova não sobrescreve um arquivo que ainda está sendo compactado
+    pending = f"{dest}.{time.monotonic_ns()}.tmp"
+    os.replace(source, pending)
+
+    def compress():
+        try:
+            with open(pending, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.remove(pending)
+        except OSError:
+            # Fica o arquivo sem compactar, mas nenhum log se perde
+            pass
+
+    try:
+        threading.Thread(target=compress, name="log-compress").start()
+    except RuntimeError:
+        # Interpretador encerrando: não dá mais para criar threads
+        compress()
+
 
 class HyperDeployLogger:
     def __init__(self, name="HyperDeploy", log_dir="logs"):
         self.name = name
         self.log_dir = log_dir
-        
+        self.config = load_logging_config()
+        self.listener = None
+
         # Criar diretório de logs se não existir
         if not os.path.exists(log_dir):
             os.makedirs(log_dir)
-        
-        # Configurar logger
+
+        # Configurar logger (nível filtrado antes de montar qualquer mensagem)
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
-        
+        self.logger.setLevel(str(self.config.get("level", "DEBUG")).upper())
+
         # Evitar duplicação de handlers
         if not self.logger.handlers:
             self._setup_handlers()
-    
+
     def _setup_handlers(self):
-        # Handler para arquivo com rotação (10MB por arquivo, máximo 5 arquivos)
+        log_file = self.config.get("file") or os.path.join(self.log_dir, "hyperdeploy.log")
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        
+        # Handler para arquivo com rotação (10MB por arquivo, máximo 5 arquivos compactados)
         file_handler = RotatingFileHandler(
-            os.path.join(self.log_dir, "hyperdeploy.log"),
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
+            log_file,
+            maxBytes=parse_size(self.config.get("max_size"), 10*1024*1024),  # 10MB
+            backupCount=int(self.config.get("backup_count", 5)),
             encoding='utf-8'
         )
+        file_handler.namer = lambda name: name + ".gz"
+        file_handler.rotator = compress_rotated
         file_handler.setLevel(logging.DEBUG)
-        
+
         # Handler para console (sem timestamp)
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
-        
-        # Formatação para arquivo (com timestamp completo)
-        file_formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] - %(name)s: %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
+
+        # Formatação para arquivo (com timestamp completo, ou JSON com logging.format: json)
+        if str(self.config.get("format", "text")).lower() == "json":
+            file_formatter = JsonFormatter()
+        else:
+            file_formatter = IconFormatter(
+                '[%(asctime)s] [%(levelname)s] - %(name)s: %(icon)s %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            )
+
         # Formatação para console (limpa, sem timestamp)
-        console_formatter = logging.Formatter('%(message)s')
-        
+        console_formatter = IconFormatter('%(icon)s %(message)s')
+
         file_handler.setFormatter(file_formatter)
         console_handler.setFormatter(console_formatter)
-        
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-    
-    def debug(self, message):
+
+        # Quem loga só coloca o registro na fila; arquivo e console são escritos por um thread próprio
+        log_queue = queue.SimpleQueue()
+        self.logger.addHandler(LazyQueueHandler(log_queue))
+        self.listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """Escreve o que ainda está na fila e fecha os arquivos"""
+        if self.listener:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+
+    def _log(self, level, icon, message, args):
+        # Nível desativado: nada é montado nem enfileirado
+        if self.logger.isEnabledFor(level):
+            # Registro montado direto: sem a busca de arquivo/linha na pilha (que o formato não usa)
+            record = self.logger.makeRecord(self.name, level, "(unknown file)", 0, message, args, None, extra={"icon": icon})
+            self.logger.handle(record)
+
+    def debug(self, message, *args):
         """Log de debug para informações detalhadas"""
-        self.logger.debug(f"🔍 {message}")
-    
-    def info(self, message):
+        self._log(logging.DEBUG, "🔍", message, args)
+
+    def info(self, message, *args):
         """Log de informação geral"""
-        self.logger.info(f"ℹ️ {message}")
-    
-    def warning(self, message):
+        self._log(logging.INFO, "ℹ️", message, args)
+
+    def warning(self, message, *args):
         """Log de aviso"""
-        self.logger.warning(f"⚠️ {message}")
-    
-    def error(self, message):
+        self._log(logging.WARNING, "⚠️", message, args)
+
+    def error(self, message, *args):
         """Log de erro"""
-        self.logger.error(f"❌ {message}")
-    
-    def critical(self, message):
+        self._log(logging.ERROR, "❌", message, args)
+
+    def critical(self, message, *args):
         """Log de erro crítico"""
-        self.logger.critical(f"🚨 {message}")
-    
-    def success(self, message):
+        self._log(logging.CRITICAL, "🚨", message, args)
+
+    def success(self, message, *args):
         """Log de sucesso personalizado"""
-        self.logger.info(f"✅ {message}")
-    
+        self._log(logging.INFO, "✅", message, args)
+
     def command(self, user_id, command_name, guild_id=None):
         """Log de comando executado"""
         guild_info = f" (Guild: {guild_id})" if guild_id else ""
-        self.logger.info(f"🎯 Comando /{command_name} executado por {user_id}{guild_info}")
-    
+        self._log(logging.INFO, "🎯", "Comando /%s executado por %s%s", (command_name, user_id, guild_info))
+
     def payment(self, user_id, amount, status, payment_id=None):
         """Log de pagamento"""
         payment_info = f" (ID: {payment_id})" if payment_id else ""
-        self.logger.info(f"💳 Pagamento R$ {amount:.2f} - Status: {status} - User: {user_id}{payment_info}")
-    
+        self._log(logging.INFO, "💳", "Pagamento R$ %.2f - Status: %s - User: %s%s", (amount, status, user_id, payment_info))
+
     def deploy(self, user_id, app_name, status):
         """Log de deploy"""
-        self.logger.info(f"🚀 Deploy {app_name} - Status: {status} - User: {user_id}")
-    
+        self._log(logging.INFO, "🚀", "Deploy %s - Status: %s - User: %s", (app_name, status, user_id))
+
     def api_call(self, endpoint, status, response_time=None):
         """Log de chamada à API"""
         time_info = f" ({response_time}ms)" if response_time else ""
-        self.logger.debug(f"🌐 API {endpoint} - Status: {status}{time_info}")
-    
+        self._log(logging.DEBUG, "🌐", "API %s - Status: %s%s", (endpoint, status, time_info))
+
     def security(self, event, user_id=None, details=None):
         """Log de eventos de segurança"""
         user_info = f" - User: {user_id}" if user_id else ""
         details_info = f" - {details}" if details else ""
-        self.logger.warning(f"🔒 Segurança: {event}{user_info}{details_info}")
+        self._log(logging.WARNING, "🔒", "Segurança: %s%s%s", (event, user_info, details_info))
 
 # Instância global do logger
 logger = HyperDeployLogger()
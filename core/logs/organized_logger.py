@@ -1,23 +1,22 @@
 import discord
-import json
-import os
 from datetime import datetime
 from typing import Optional, Dict, Any
 from core.logs.logger import logger
+from core.storage import get_repository
 
 class OrganizedLogger:
     def __init__(self, bot):
         self.bot = bot
         self.log_channels_file = "data/log_channels.json"
         self.log_channels: Dict[str, int] = {}
+        self.repository = get_repository("log_channels", self.log_channels_file)
         self.load_log_channels()
     
     def load_log_channels(self):
         """Carrega configuração dos canais de log"""
         try:
-            if os.path.exists(self.log_channels_file):
-                with open(self.log_channels_file, 'r', encoding='utf-8') as f:
-                    self.log_channels = json.load(f)
+            if self.repository.exists():
+                self.log_channels = self.repository.load_all()
             else:
                 self.save_log_channels()
         except Exception as e:
@@ -27,9 +26,7 @@ class OrganizedLogger:
     def save_log_channels(self):
         """Salva configuração dos canais de log"""
         try:
-            os.makedirs(os.path.dirname(self.log_channels_file), exist_ok=True)
-            with open(self.log_channels_file, 'w', encoding='utf-8') as f:
-                json.dump(self.log_channels, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.log_channels)
         except Exception as e:
             logger.error(f"Erro ao salvar canais de log: {e}")
     
@@ -37,7 +34,7 @@ class OrganizedLogger:
         """Define um canal para um tipo específico de log"""
         try:
             self.log_channels[log_type] = channel_id
-            self.save_log_channels()
+            self.repository.put(log_type, channel_id)
             logger.info(f"📋 Canal de log '{log_type}' configurado: {channel_id}")
             return True
         except Exception as e:
@@ -49,13 +46,18 @@ class OrganizedLogger:
         return self.log_channels.get(log_type)
     
     async def send_log(self, log_type: str, embed: discord.Embed, content: str = None) -> bool:
-        """Envia log para o canal apropriado"""
+        """Envia log para o canal apropriado (pela fila de envio, sem esperar o Discord)"""
         try:
             channel_id = self.get_log_channel(log_type)
             if not channel_id:
                 logger.warning(f"⚠️ Canal de log '{log_type}' não configurado")
                 return False
             
+            from core.logs.shipping import log_shipper
+            if log_shipper:
+                log_shipper.enqueue(channel_id, log_type, embed, content)
+                return True
+            
             channel = self.bot.get_channel(channel_id)
             if not channel:
                 logger.error(f"❌ Canal de log não encontrado: {channel_id}")
@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+import discord
+from core.logs.logger import logger
+from core.utils.metrics import LatencyHistogram, discord_send_errors, discord_send_seconds
+
+# Limites do Discord por mensagem
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# Intervalo mínimo entre mensagens no mesmo canal (o Discord aceita ~5 a cada 5s por canal)
+SEND_INTERVAL = 1.0
+
+# Sobrecarga: acima de SAMPLE_BACKLOG, logs de baixa prioridade são amostrados (1 a cada SAMPLE_RATE);
+# acima de MAX_BACKLOG, novos logs do canal são descartados
+SAMPLE_BACKLOG = 100
+SAMPLE_RATE = 5
+MAX_BACKLOG = 1000
+# Tipos que podem ser amostrados (pagamentos e ações administrativas nunca são)
+SAMPLED_TYPES = {"actions", "deploys"}
+
+# Aviso no console quando a fila total passa desse tamanho
+BACKLOG_WARNING = 200
+
+# Falhas seguidas no mesmo canal antes de descartar o lote
+MAX_SEND_ATTEMPTS = 3
+RETRY_BACKOFF_MAX = 60
+
+
+class LogEntry(NamedTuple):
+    log_type: str
+    embed: discord.Embed
+    content: Optional[str]
+    enqueued_at: float
+
+
+class LogShipper:
+    """
+    Fila de envio dos logs para os canais do Discord.
+    Quem loga não espera o envio: os embeds são agrupados por canal (até 10 por mensagem)
+    e enviados respeitando o intervalo por canal.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queues: Dict[int, Deque[LogEntry]] = {}
+        # Envio em andamento por canal (no máximo um por vez)
+        self.sending: Dict[int, asyncio.Task] = {}
+        # Próximo envio permitido por canal (relógio do loop)
+        self.next_send_at: Dict[int, float] = {}
+        self.attempts: Dict[int, int] = {}
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.backlog_warned = False
+
+        # Métricas
+        self.enqueued = 0
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.failures = 0
+        self.dropped: Dict[str, int] = {}
+        self.sampled: Dict[str, int] = {}
+        self.sample_counter = 0
+        # Tempo entre o log e a entrega no canal
+        self.delivery_delay = LatencyHistogram()
+        self.send_time = LatencyHistogram()
+
+    @property
+    def backlog(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def enqueue(self, channel_id: int, log_type: str, embed: discord.Embed, content: str = None) -> bool:
+        """Coloca o log na fila do canal e retorna imediatamente (False se descartado)"""
+        queue = self.queues.setdefault(channel_id, deque())
+
+        if len(queue) >= MAX_BACKLOG:
+            self.dropped[log_type] = self.dropped.get(log_type, 0) + 1
+            return False
+        if len(queue) >= SAMPLE_BACKLOG and log_type in SAMPLED_TYPES:
+            self.sample_counter += 1
+            if self.sample_counter % SAMPLE_RATE:
+                self.sampled[log_type] = self.sampled.get(log_type, 0) + 1
+                return False
+
+        queue.append(LogEntry(log_type, embed, content, time.time()))
+        self.enqueued += 1
+        self.idle.clear()
+        self.wakeup.set()
+
+        backlog = self.backlog
+        if backlog >= BACKLOG_WARNING and not self.backlog_warned:
+            self.backlog_warned = True
+            logger.warning(f"📨 Fila de logs acumulada: {backlog} mensagens aguardando envio")
+        return True
+
+    def take_batch(self, queue: Deque[LogEntry]) -> List[LogEntry]:
+        """Retira da fila o maior lote que cabe em uma mensagem"""
+        batch = [queue.popleft()]
+        # Logs com texto vão sozinhos (uma mensagem tem um único conteúdo)
+        if batch[0].content:
+            return batch
+        chars = len(batch[0].embed)
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE and not queue[0].content:
+            size = len(queue[0].embed)
+            if chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            chars += size
+            batch.append(queue.popleft())
+        return batch
+
+    async def run(self):
+        """Loop de envio (serviço supervisionado): despacha um lote por canal liberado"""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            next_wake = None
+            for channel_id, queue in self.queues.items():
+                if not queue or channel_id in self.sending:
+                    continue
+                ready_at = self.next_send_at.get(channel_id, 0)
+                if ready_at > now:
+                    next_wake = ready_at if next_wake is None else min(next_wake, ready_at)
+                    continue
+                batch = self.take_batch(queue)
+                self.sending[channel_id] = asyncio.create_task(self.deliver(channel_id, batch))
+
+            if not self.sending and not self.backlog:
+                self.idle.set()
+                self.backlog_warned = False
+
+            self.wakeup.clear()
+            timeout = None if next_wake is None else max(0.0, next_wake - loop.time())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def deliver(self, channel_id: int, batch: List[LogEntry]):
+        loop = asyncio.get_running_loop()
+        delay = SEND_INTERVAL
+        try:
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                logger.error(f"❌ Canal de log não encontrado: {channel_id}")
+                self.drop(batch)
+                return
+
+            start = loop.time()
+            try:
+                await channel.send(content=batch[0].content, embeds=[entry.embed for entry in batch])
+            except Exception:
+                discord_send_errors.inc(kind="log")
+                raise
+            elapsed = loop.time() - start
+            self.send_time.observe(elapsed)
+            discord_send_seconds.observe(elapsed, kind="log")
+
+            now = time.time()
+            for entry in batch:
+                self.delivery_delay.observe(now - entry.enqueued_at)
+            self.sent_messages += 1
+            self.sent_embeds += len(batch)
+            self.attempts.pop(channel_id, None)
+
+        except (discord.Forbidden, discord.NotFound) as e:
+            # Sem permissão ou canal apagado: tentar de novo não adianta
+            logger.error(f"Erro ao enviar log: {e}")
+            self.drop(batch)
+        except Exception as e:
+            self.failures += 1
+            attempts = self.attempts.get(channel_id, 0) + 1
+            if attempts >= MAX_SEND_ATTEMPTS:
+                logger.error(f"Erro ao enviar log (lote descartado após {attempts} tentativas): {e}")
+                self.attempts.pop(channel_id, None)
+                self.drop(batch)
+            else:
+                # Devolve o lote ao início da fila, na mesma ordem
+                self.attempts[channel_id] = attempts
+                self.queues.setdefault(channel_id, deque()).extendleft(reversed(batch))
+                delay = min(SEND_INTERVAL * 5 ** attempts, RETRY_BACKOFF_MAX)
+        finally:
+            self.next_send_at[channel_id] = loop.time() + delay
+            self.sending.pop(channel_id, None)
+            self.wakeup.set()
+
+    def drop(self, batch: List[LogEntry]):
+        for entry in batch:
+            self.dropped[entry.log_type] = self.dropped.get(entry.log_type, 0) + 1
+
+    async def flush(self, timeout: float = 10) -> bool:
+        """Espera a fila esvaziar (usado na parada, antes de desconectar)"""
+        if self.idle.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"📨 {self.backlog} logs não enviados antes da parada")
+            return False
+
+    def get_statistics(self) -> Dict:
+        oldest = min((queue[0].enqueued_at for queue in self.queues.values() if queue), default=None)
+        return {
+            "backlog": self.backlog,
+            "oldest_age": time.time() - oldest if oldest is not None else 0.0,
+            "enqueued": self.enqueued,
+            "sent_messages": self.sent_messages,
+            "sent_embeds": self.sent_embeds,
+            "failures": self.failures,
+            "dropped": dict(self.dropped),
+            "sampled": dict(self.sampled),
+            "delivery_delay": self.delivery_delay.snapshot(),
+            "send_time": self.send_time.snapshot(),
+        }
+
+
+# Instância global
+log_shipper = None
+
+
+def setup(bot):
+    global log_shipper
+    log_shipper = LogShipper(bot)
+    return log_shipper
@@ -0,0 +1,89 @@
+import argparse
+import glob
+import gzip
+import json
+from typing import Dict, Iterator, List
+from core.logs.tracing import DEFAULT_TRACES_FILE, STAGES
+
+
+def read_spans(traces_file: str) -> Iterator[Dict]:
+    """Spans do arquivo atual e dos rotacionados (.1.gz, .2.gz...)"""
+    for path in sorted(glob.glob(f"{traces_file}.*.gz"), reverse=True) + [traces_file]:
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Linha cortada (ex.: parada no meio da escrita)
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def format_seconds(value: float) -> str:
+    if value >= 3600:
+        return f"{value / 3600:.1f}h"
+    if value >= 60:
+        return f"{value / 60:.1f}min"
+    return f"{value:.1f}s"
+
+
+def funnel(spans: Iterator[Dict]) -> Dict:
+    """Por etapa: jornadas que chegaram nela, duração e tempo desde a abertura do ticket"""
+    journeys = set()
+    stages = {stage: {"journeys": set(), "failed": 0, "duration": [], "since_start": {}} for stage in STAGES}
+    for span in spans:
+        stage = stages.get(span.get("stage"))
+        journey_id = span.get("journey_id")
+        if stage is None or not journey_id:
+            continue
+        journeys.add(journey_id)
+        stage["journeys"].add(journey_id)
+        stage["duration"].append(span.get("duration", 0.0))
+        if span.get("status") != "ok":
+            stage["failed"] += 1
+        # Uma jornada pode ter vários pagamentos: vale a primeira vez que chegou na etapa
+        if "since_start" in span:
+            previous = stage["since_start"].get(journey_id)
+            if previous is None or span["since_start"] < previous:
+                stage["since_start"][journey_id] = span["since_start"]
+    return {"journeys": len(journeys), "stages": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Funil da jornada (ticket até o deploy) a partir dos traces")
+    parser.add_argument("--file", default=DEFAULT_TRACES_FILE, help="Arquivo de traces (tracing.file)")
+    args = parser.parse_args()
+
+    result = funnel(read_spans(args.file))
+    total = result["journeys"]
+    print(f"🛤️ Jornadas: {total}")
+    if not total:
+        return
+    for stage, data in result["stages"].items():
+        reached = len(data["journeys"])
+        if not reached:
+            continue
+        since_start = list(data["since_start"].values())
+        print(
+            f"  {stage}: {reached} ({reached / total * 100:.0f}%) | "
+            f"duração p50 {format_seconds(percentile(data['duration'], 50))} "
+            f"p95 {format_seconds(percentile(data['duration'], 95))} | "
+            f"desde o ticket p50 {format_seconds(percentile(since_start, 50))} "
+            f"p95 {format_seconds(percentile(since_start, 95))} | "
+            f"falhas {data['failed']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import secrets
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Dict, NamedTuple, Optional, Tuple
+from core.logs.logger import LazyQueueHandler, compress_rotated, logger, parse_size
+from core.utils.metrics import metrics
+
+DEFAULT_TRACES_FILE = "logs/traces.jsonl"
+
+# Etapas da jornada do cliente, na ordem do funil
+STAGES = ("ticket", "upload", "download", "payment", "awaiting_payment", "deploy_queue", "deploy")
+
+# Etapas derivadas das transições de status do pagamento (status que abre a etapa -> etapa)
+PAYMENT_STAGES = {
+    "pending": "awaiting_payment",
+    "paid": "deploy_queue",
+    "processing": "deploy",
+}
+# Campo do pagamento com o início da etapa (para etapas abertas antes de um restart)
+STAGE_START_FIELDS = {"pending": "created_at", "paid": "paid_at"}
+# Status que encerram a jornada sem deploy
+FAILED_STATUSES = {"failed", "expired"}
+
+# Buckets das etapas (segundos a horas: o cliente pode levar minutos para pagar)
+JOURNEY_BUCKETS = (0.5, 1, 5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 21600)
+
+# Os ids começam com o instante de criação em ms (11 dígitos hex): o início da jornada
+# é recuperado do próprio id, mesmo depois de um restart
+JOURNEY_TIME_DIGITS = 11
+
+stage_duration_seconds = metrics.histogram(
+    "journey_stage_duration_seconds", "Duração de cada etapa da jornada (ticket até o deploy)",
+    ("stage",), JOURNEY_BUCKETS
+)
+stage_since_start_seconds = metrics.histogram(
+    "journey_stage_since_start_seconds", "Tempo entre a abertura do ticket e o início de cada etapa",
+    ("stage",), JOURNEY_BUCKETS
+)
+stage_failures = metrics.counter(
+    "journey_stage_failures_total", "Etapas da jornada encerradas sem sucesso", ("stage", "status")
+)
+
+
+def new_journey_id(now: float = None) -> str:
+    started_at = time.time() if now is None else now
+    return f"{int(started_at * 1000):0{JOURNEY_TIME_DIGITS}x}{secrets.token_hex(4)}"
+
+
+def journey_started_at(journey_id: str) -> Optional[float]:
+    """Instante de início da jornada, lido do id (None para ids em outro formato)"""
+    try:
+        return int(journey_id[:JOURNEY_TIME_DIGITS], 16) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+class Span(NamedTuple):
+    journey_id: str
+    stage: str
+    start: float
+    attributes: Dict
+
+
+class JsonLineFormatter(logging.Formatter):
+    """O registro já é o dicionário do span: serializado no thread de escrita"""
+
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class JourneyTracer:
+    """
+    Rastreamento da jornada do cliente (ticket -> upload -> pagamento -> deploy).
+    O id da jornada nasce no ticket e segue no pagamento; cada etapa vira um span
+    (início, fim, duração e tempo desde a abertura do ticket) gravado em um arquivo JSONL rotativo.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.traces_file = config.get("file") or DEFAULT_TRACES_FILE
+        self.listener = None
+        # Etapa aberta por transição de status: pagamento -> (etapa, início)
+        self.open_stages: Dict[str, Tuple[str, float]] = {}
+        self.spans = 0
+
+        # Logger próprio, sem propagar para o log principal
+        self.trace_logger = logging.getLogger("HyperDeploy.traces")
+        self.trace_logger.propagate = False
+        self.trace_logger.setLevel(logging.INFO)
+        if not self.trace_logger.handlers:
+            self._setup_handlers(config)
+
+    def _setup_handlers(self, config: Dict):
+        os.makedirs(os.path.dirname(self.traces_file) or ".", exist_ok=True)
+        file_handler = RotatingFileHandler(
+            self.traces_file,
+            maxBytes=parse_size(config.get("max_size"), 10 * 1024 * 1024),
+            backupCount=int(config.get("backup_count", 5)),
+            encoding="utf-8"
+        )
+        file_handler.namer = lambda name: name + ".gz"
+        file_handler.rotator = compress_rotated
+        file_handler.setFormatter(JsonLineFormatter())
+
+        # Mesmo esquema do log principal: quem rastreia só enfileira, a escrita é de outro thread
+        trace_queue = queue.SimpleQueue()
+        self.trace_logger.addHandler(LazyQueueHandler(trace_queue))
+        self.listener = QueueListener(trace_queue, file_handler)
+        self.listener.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """Grava os spans que ainda estão na fila e fecha o arquivo"""
+        if self.listener:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+
+    def start(self, journey_id: str, stage: str, **attributes) -> Span:
+        return Span(journey_id, stage, time.time(), attributes)
+
+    def end(self, span: Span, status: str = "ok", **attributes):
+        self.record(span.journey_id, span.stage, span.start, time.time(), status, {**span.attributes, **attributes})
+
+    def record(self, journey_id: str, stage: str, start: float, end: float, status: str = "ok", attributes: Dict = None):
+        """Registra uma etapa concluída: métricas do funil e uma linha no arquivo de traces"""
+        try:
+            duration = max(0.0, end - start)
+            entry = {
+                "journey_id": journey_id,
+                "stage": stage,
+                "start": datetime.fromtimestamp(start).isoformat(timespec="milliseconds"),
+                "end": datetime.fromtimestamp(end).isoformat(timespec="milliseconds"),
+                "duration": round(duration, 3),
+                "status": status,
+            }
+            stage_duration_seconds.observe(duration, stage=stage)
+            started_at = journey_started_at(journey_id)
+            if started_at is not None:
+                since_start = max(0.0, start - started_at)
+                entry["since_start"] = round(since_start, 3)
+                stage_since_start_seconds.observe(since_start, stage=stage)
+            if status != "ok":
+                stage_failures.inc(stage=stage, status=status)
+            if attributes:
+                entry.update(attributes)
+
+            self.spans += 1
+            record = self.trace_logger.makeRecord(
+                self.trace_logger.name, logging.INFO, "(unknown file)", 0, entry, None, None
+            )
+            self.trace_logger.handle(record)
+        except Exception as e:
+            logger.error(f"Erro ao registrar span {stage} da jornada {journey_id}: {e}")
+
+    def on_payment_status_changed(self, payment: Dict, old_status: Optional[str]):
+        """Etapas do pagamento (aguardando PIX, fila de deploy, deploy) a partir das transições de status"""
+        journey_id = payment.get("journey_id")
+        payment_id = payment.get("id")
+        if not journey_id or not payment_id:
+            return
+        status = payment.get("status")
+        now = time.time()
+
+        # Encerrar a etapa do status anterior
+        if old_status in PAYMENT_STAGES:
+            stage, start = self.open_stages.pop(payment_id, (PAYMENT_STAGES[old_status], None))
+            if start is None:
+                # Etapa aberta antes de um restart: início pelo timestamp do pagamento (0 se não houver)
+                from core.payments.index import parse_timestamp
+                start = parse_timestamp(payment.get(STAGE_START_FIELDS.get(old_status)))
+            if start:
+                self.record(
+                    journey_id, stage, start, now,
+                    status if status in FAILED_STATUSES else "ok",
+                    {"payment_id": payment_id}
+                )
+
+        # Abrir a etapa do novo status
+        if status in PAYMENT_STAGES:
+            self.open_stages[payment_id] = (PAYMENT_STAGES[status], now)
+
+    def get_statistics(self) -> Dict:
+        stages = {}
+        for stage in STAGES:
+            duration = stage_duration_seconds.labels(stage=stage).snapshot()
+            if duration["count"]:
+                stages[stage] = {
+                    "count": duration["count"],
+                    "duration": duration,
+                    "since_start": stage_since_start_seconds.labels(stage=stage).snapshot(),
+                }
+        return {
+            "file": self.traces_file,
+            "spans": self.spans,
+            "open": len(self.open_stages),
+            "stages": stages,
+        }
+
+
+# Instância global
+journey_tracer = None
+
+
+def start_span(journey_id: Optional[str], stage: str, **attributes) -> Optional[Span]:
+    """Abre um span da jornada (None se o rastreamento está desligado ou a jornada é desconhecida)"""
+    if journey_tracer is None or not journey_id:
+        return None
+    return journey_tracer.start(journey_id, stage, **attributes)
+
+
+def end_span(span: Optional[Span], status: str = "ok", **attributes):
+    if span is not None and journey_tracer is not None:
+        journey_tracer.end(span, status, **attributes)
+
+
+@contextmanager
+def trace(journey_id: Optional[str], stage: str, **attributes):
+    """Span em volta de um bloco (status error se o bloco levantar exceção)"""
+    span = start_span(journey_id, stage, **attributes)
+    try:
+        yield span
+    except BaseException as e:
+        end_span(span, "error", error=str(e) or type(e).__name__)
+        raise
+    else:
+        end_span(span)
+
+
+def setup(config: Dict = None):
+    """Cria o rastreador (seção `tracing` do bot.yaml) e o liga às transições dos pagamentos"""
+    global journey_tracer
+    config = config or {}
+    if not config.get("enabled", True):
+        return None
+    journey_tracer = JourneyTracer(config)
+    from core.payments.manager import payment_manager
+    if payment_manager:
+        payment_manager.add_status_listener(journey_tracer.on_payment_status_changed)
+    return journey_tracer
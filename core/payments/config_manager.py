@@ -1,19 +1,18 @@
-import json
-import os
 from typing import Dict, Optional
 from core.logs.logger import logger
+from core.storage import get_repository
 
 class ConfigManager:
     def __init__(self):
         self.config_file = "data/admin_config.json"
+        self.repository = get_repository("admin_config", self.config_file)
         self.config = self.load_config(log_message=False)
     
     def load_config(self, log_message: bool = False) -> Dict:
-        """Carrega configurações do arquivo JSON"""
+        """Carrega configurações do repositório"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+            if self.repository.exists():
+                config = self.repository.load_all()
                 if log_message:
                     logger.info(f"Configurações carregadas ({len(config)} itens)")
                 return config
@@ -34,14 +33,12 @@ class ConfigManager:
             return {}
     
     def save_config(self, config: Dict = None):
-        """Salva configurações no arquivo JSON"""
+        """Salva configurações no repositório"""
         try:
             if config:
                 self.config = config
             
-            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.config)
             
             logger.info("Configurações salvas")
         except Exception as e:
@@ -103,6 +100,10 @@ class ConfigManager:
         self.config["ticket_timeout_minutes"] = int(minutes)
         self.save_config()
         self.reload_config()
+        # Tickets abertos passam a expirar pelo novo timeout
+        from core.tickets.manager import ticket_manager
+        if ticket_manager:
+            ticket_manager.schedule_expiries()
         logger.info(f"Timeout dos tickets: {minutes} minutos")
     
     def get_payment_timeout_minutes(self) -> int:
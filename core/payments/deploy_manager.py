@@ -1,22 +1,87 @@
 import asyncio
 import os
 import shutil
+import time
 import discord
-from typing import Optional, Dict
+from collections import deque
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 from core.logs.logger import logger
-from core.payments.manager import payment_manager
+from core.utils.metrics import LatencyHistogram, instrument
+from core.payments.manager import get_deploy_files, payment_manager
 from core.tickets.manager import ticket_manager
-from core.squarecloud.client import squarecloud_manager
+from core.squarecloud.client import get_manager
 from core.squarecloud.user_keys import user_keys_manager
 
 class DeployManager:
     def __init__(self):
-        self.deploy_queue = []
+        # Limites de concorrência (config/squarecloud.yaml -> auto_deploy)
+        self.squarecloud_manager = get_manager()
+        config = self.squarecloud_manager.config.get("auto_deploy", {})
+        self.max_concurrent_deploys = max(1, int(config.get("max_concurrent_deploys", 4)))
+        self.max_deploys_per_key = max(1, int(config.get("max_deploys_per_key", 1)))
+        
+        # Fila justa: uma fila FIFO por usuário, atendidas em round-robin
+        self.pending_by_user: Dict[int, deque] = {}
+        self.user_rotation: deque = deque()
+        self.queued_payments: set = set()
+        self.work_available = asyncio.Event()
+        
+        # Deploys em andamento
+        self.active_deploys: Dict[str, Dict] = {}
+        self.active_by_key: Dict[str, int] = {}
+        self.workers: List[asyncio.Task] = []
         self.processing = False
+        # Na parada: nenhum deploy novo começa, os em andamento terminam
+        self.stopping = False
+        
+        # Métricas de espera na fila e duração dos deploys
+        self.wait_times = LatencyHistogram()
+        self.run_times = LatencyHistogram()
+        self.completed_deploys = 0
+        
+        # Acordar os workers a cada pagamento que passa para "paid"
+        if payment_manager:
+            payment_manager.add_status_listener(self.on_payment_status_changed)
+    
+    def on_payment_status_changed(self, payment: Dict, old_status: Optional[str]):
+        """Enfileira o pagamento assim que ele é confirmado"""
+        if payment.get("status") == "paid":
+            self.enqueue_payment(payment.get("id"))
+    
+    def enqueue_payment(self, payment_id: str) -> bool:
+        """Adiciona um pagamento à fila de deploy (ignora duplicados)"""
+        if not payment_id or payment_id in self.queued_payments or payment_id in self.active_deploys:
+            return False
+        
+        payment = payment_manager.get_payment(payment_id) if payment_manager else None
+        if not payment or not payment.get("user_id"):
+            return False
+        
+        user_id = payment["user_id"]
+        if user_id not in self.pending_by_user:
+            self.pending_by_user[user_id] = deque()
+            self.user_rotation.append(user_id)
+        self.pending_by_user[user_id].append((payment_id, time.monotonic()))
+        self.queued_payments.add(payment_id)
+        self.work_available.set()
+        
+        logger.debug(f"Pagamento {payment_id} enfileirado para deploy")
+        return True
+    
+    def enqueue_user_payments(self, user_id: int) -> int:
+        """Reenfileira pagamentos confirmados de um usuário (ex.: após configurar a chave)"""
+        if not payment_manager:
+            return 0
+        
+        queued = 0
+        for payment in payment_manager.get_payments_by_user(user_id):
+            if payment.get("status") == "paid" and self.enqueue_payment(payment.get("id")):
+                queued += 1
+        return queued
     
     async def process_confirmed_payments(self):
-        """Processa pagamentos confirmados e faz deploy automático"""
+        """Enfileira pagamentos confirmados já existentes (recuperação na inicialização)"""
         try:
             if not payment_manager:
                 logger.warning("Payment manager não inicializado")
@@ -41,38 +106,137 @@ class DeployManager:
                     logger.error(f"Formato inválido de payment: {type(payment)}")
                     continue
                 
-                payment_id = payment.get("id")
-                user_id = payment.get("user_id")
-                deploy_file = payment.get("deploy_file")
-                
-                if not payment_id or not user_id:
-                    logger.error(f"Dados inválidos no payment: {payment}")
-                    continue
-                
-                # Verificar se já foi processado
-                if payment.get("deploy_processed"):
-                    continue
-                
-                # Verificar se tem arquivo de deploy
-                if not deploy_file or not os.path.exists(deploy_file):
-                    logger.warning(f"Arquivo de deploy não encontrado para pagamento {payment_id}")
-                    continue
-                
-                # Verificar se usuário tem chave configurada
-                if not user_keys_manager.has_user_key(user_id):
-                    logger.warning(f"Usuário {user_id} não tem chave da API configurada")
-                    continue
-                
-                # Processar deploy
-                await self.process_deploy(payment_id, user_id, deploy_file)
+                self.enqueue_payment(payment.get("id"))
                 
         except Exception as e:
             logger.error(f"Erro ao processar pagamentos confirmados: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
     
-    async def process_deploy(self, payment_id: str, user_id: int, zip_path: str):
-        """Processa o deploy de uma aplicação"""
+    def get_queue_depth(self) -> int:
+        """Quantidade de pagamentos aguardando um worker"""
+        return len(self.queued_payments)
+    
+    def take_next_job(self) -> Optional[Tuple[str, float, str]]:
+        """Escolhe o próximo deploy respeitando o round-robin e o limite por chave"""
+        # A rotação fica ordenada do usuário atendido há mais tempo para o mais recente
+        for user_id in list(self.user_rotation):
+            api_key = user_keys_manager.get_user_key(user_id) if user_keys_manager else None
+            if not api_key:
+                # Sem chave não há deploy; os pagamentos voltam à fila quando a chave for definida
+                logger.warning(f"Usuário {user_id} não tem chave da API configurada")
+                self.drop_user_queue(user_id)
+                continue
+            
+            if self.active_by_key.get(api_key, 0) >= self.max_deploys_per_key:
+                continue
+            
+            payment_id, enqueued_at = self.pending_by_user[user_id].popleft()
+            self.queued_payments.discard(payment_id)
+            self.user_rotation.remove(user_id)
+            if self.pending_by_user[user_id]:
+                self.user_rotation.append(user_id)
+            else:
+                del self.pending_by_user[user_id]
+            return payment_id, enqueued_at, api_key
+        
+        return None
+    
+    def drop_user_queue(self, user_id: int):
+        """Remove a fila de um usuário do round-robin"""
+        for payment_id, _ in self.pending_by_user.pop(user_id, ()):
+            self.queued_payments.discard(payment_id)
+        if user_id in self.user_rotation:
+            self.user_rotation.remove(user_id)
+    
+    async def dispatch_payment(self, payment_id: str):
+        """Valida um pagamento retirado da fila e inicia o deploy"""
+        payment = payment_manager.get_payment(payment_id) if payment_manager else None
+        if not isinstance(payment, dict):
+            logger.error(f"Formato inválido de payment: {type(payment)}")
+            return
+        
+        # O status pode ter mudado enquanto o pagamento estava na fila
+        if payment.get("status") != "paid":
+            return
+        
+        user_id = payment.get("user_id")
+        deploy_file = payment.get("deploy_file")
+        
+        if not user_id:
+            logger.error(f"Dados inválidos no payment: {payment}")
+            return
+        
+        # Verificar se já foi processado
+        if payment.get("deploy_processed"):
+            return
+        
+        # Verificar se tem arquivo de deploy
+        deploy_files = get_deploy_files(payment)
+        if not any(os.path.exists(f["file_path"]) for f in deploy_files):
+            logger.warning(f"Arquivo de deploy não encontrado para pagamento {payment_id}")
+            return
+        
+        # Processar deploy
+        await self.process_deploy(payment_id, user_id, deploy_file)
+    
+    async def run_job(self, payment_id: str, enqueued_at: float, api_key: str):
+        """Executa um deploy ocupando uma vaga da chave da API"""
+        started_at = time.monotonic()
+        wait_time = started_at - enqueued_at
+        self.wait_times.observe(wait_time)
+        self.active_by_key[api_key] = self.active_by_key.get(api_key, 0) + 1
+        self.active_deploys[payment_id] = {"started_at": started_at}
+        
+        try:
+            await self.dispatch_payment(payment_id)
+        finally:
+            run_time = time.monotonic() - started_at
+            self.run_times.observe(run_time)
+            self.completed_deploys += 1
+            logger.info(f"⏱️ Deploy {payment_id}: espera {wait_time:.1f}s, execução {run_time:.1f}s")
+            del self.active_deploys[payment_id]
+            self.active_by_key[api_key] -= 1
+            if self.active_by_key[api_key] <= 0:
+                del self.active_by_key[api_key]
+            # Uma vaga de chave foi liberada: outros workers podem ter trabalho
+            self.work_available.set()
+    
+    async def deploy_worker(self, worker_id: int):
+        """Worker que consome a fila de deploys"""
+        while not self.stopping:
+            job = self.take_next_job()
+            if not job:
+                self.work_available.clear()
+                await self.work_available.wait()
+                continue
+            
+            try:
+                self.processing = True
+                await self.run_job(*job)
+            except Exception as e:
+                logger.error(f"Erro no worker de deploy {worker_id}: {e}")
+            finally:
+                self.processing = bool(self.active_deploys)
+    
+    def get_deploy_statistics(self) -> Dict:
+        """Obtém estatísticas da fila e dos workers de deploy"""
+        return {
+            "queue_depth": self.get_queue_depth(),
+            "queued_users": len(self.pending_by_user),
+            "active": len(self.active_deploys),
+            "active_keys": len(self.active_by_key),
+            "workers": len(self.workers),
+            "max_concurrent": self.max_concurrent_deploys,
+            "max_per_key": self.max_deploys_per_key,
+            "completed": self.completed_deploys,
+            "wait_time": self.wait_times.snapshot(),
+            "run_time": self.run_times.snapshot()
+        }
+    
+    @instrument("deploy", failed=lambda deployed: not deployed)
+    async def process_deploy(self, payment_id: str, user_id: int, zip_path: str) -> bool:
+        """Processa o deploy de uma aplicação (True se ao menos um arquivo foi publicado)"""
         try:
             logger.info(f"Iniciando deploy para pagamento {payment_id} - Usuário {user_id}")
             
@@ -84,55 +248,81 @@ class DeployManager:
             if not api_key:
                 logger.error(f"Chave da API não encontrada para usuário {user_id}")
                 payment_manager.update_payment_status(payment_id, "failed", {"error": "Chave da API não configurada"})
-                return
+                return False
             
-            # Fazer upload para Square Cloud
-            result = await squarecloud_manager.upload_app(api_key, zip_path)
-            
-            if result["status"] == "success":
-                app_result = result["result"]
-                app_id = app_result.id if hasattr(app_result, 'id') else "N/A"
-                app_name = getattr(app_result, 'name', 'N/A')
+            # Um pagamento pode cobrir vários arquivos (uploads em lote): uma aplicação por arquivo
+            payment = payment_manager.get_payment(payment_id) or {}
+            deploy_files = get_deploy_files(payment) or [{"file_path": zip_path, "sha256": None}]
+            deployed = []
+            errors = []
+            for deploy_file in deploy_files:
+                file_path = deploy_file["file_path"]
+                sha256 = deploy_file.get("sha256")
+                filename = deploy_file.get("filename") or os.path.basename(file_path)
+                if not os.path.exists(file_path):
+                    errors.append(f"{filename}: arquivo não encontrado")
+                    await self.notify_deploy_failed(user_id, payment_id, f"Arquivo {filename} não encontrado")
+                    continue
                 
+                # Versão sem pastas desnecessárias, preparada no upload (opcional)
+                from core.payments.repack import repack_stage
+                upload_path = await repack_stage.prepared_path(file_path, sha256) if repack_stage else file_path
+                
+                # Fazer upload para Square Cloud
+                result = await self.squarecloud_manager.upload_app(api_key, upload_path)
+                
+                if result["status"] == "success":
+                    app_result = result["result"]
+                    app_id = app_result.id if hasattr(app_result, 'id') else "N/A"
+                    app_name = getattr(app_result, 'name', 'N/A')
+                    deployed.append({"app_id": app_id, "app_name": app_name, "filename": filename})
+                    
+                    # Iniciar aplicação se configurado
+                    config = self.squarecloud_manager.config
+                    if config.get("auto_deploy", {}).get("start_after_deploy", True):
+                        try:
+                            await self.squarecloud_manager.start_app(api_key, app_id)
+                            logger.info(f"Aplicação {app_id} iniciada automaticamente")
+                        except Exception as e:
+                            logger.warning(f"Erro ao iniciar aplicação automaticamente: {e}")
+                    
+                    # Notificar usuário
+                    await self.notify_deploy_success(user_id, payment_id, app_id, app_name, file_path)
+                    
+                    logger.info(f"✅ Deploy concluído com sucesso - App ID: {app_id}")
+                    
+                else:
+                    error_msg = result.get("error", "Erro desconhecido")
+                    errors.append(f"{filename}: {error_msg}")
+                    await self.notify_deploy_failed(user_id, payment_id, error_msg)
+                    logger.error(f"❌ Deploy de {filename} falhou para pagamento {payment_id}: {error_msg}")
+                
+                # Limpar arquivo temporário (blobs são removidos pela coleta, quando ninguém mais os referencia)
+                try:
+                    if not sha256 and os.path.exists(file_path):
+                        os.remove(file_path)
+                        logger.info(f"🗑️ Arquivo temporário removido: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Erro ao remover arquivo temporário: {e}")
+            
+            if deployed:
                 # Marcar pagamento como deploy concluído
                 payment_manager.update_payment_status(payment_id, "deployed", {
-                    "app_id": app_id,
-                    "app_name": app_name,
+                    "app_id": deployed[0]["app_id"],
+                    "app_name": deployed[0]["app_name"],
+                    "apps": deployed,
+                    "errors": errors,
                     "deploy_completed_at": datetime.now().isoformat()
                 })
-                
-                # Iniciar aplicação se configurado
-                config = squarecloud_manager.config
-                if config.get("auto_deploy", {}).get("start_after_deploy", True):
-                    try:
-                        await squarecloud_manager.start_app(api_key, app_id)
-                        logger.info(f"Aplicação {app_id} iniciada automaticamente")
-                    except Exception as e:
-                        logger.warning(f"Erro ao iniciar aplicação automaticamente: {e}")
-                
-                # Notificar usuário
-                await self.notify_deploy_success(user_id, payment_id, app_id, app_name, zip_path)
-                
-                logger.info(f"✅ Deploy concluído com sucesso - App ID: {app_id}")
-                
             else:
-                error_msg = result.get("error", "Erro desconhecido")
-                payment_manager.update_payment_status(payment_id, "failed", {"error": error_msg})
-                await self.notify_deploy_failed(user_id, payment_id, error_msg)
-                logger.error(f"❌ Deploy falhou para pagamento {payment_id}: {error_msg}")
-            
-            # Limpar arquivo temporário
-            try:
-                if os.path.exists(zip_path):
-                    os.remove(zip_path)
-                    logger.info(f"🗑️ Arquivo temporário removido: {zip_path}")
-            except Exception as e:
-                logger.warning(f"Erro ao remover arquivo temporário: {e}")
+                payment_manager.update_payment_status(payment_id, "failed", {"error": "; ".join(errors)})
+            return bool(deployed)
                 
         except Exception as e:
             logger.error(f"Erro ao processar deploy: {e}")
             payment_manager.update_payment_status(payment_id, "failed", {"error": str(e)})
             await self.notify_deploy_failed(user_id, payment_id, str(e))
+            return False
     
     async def notify_deploy_success(self, user_id: int, payment_id: str, app_id: str, app_name: str, zip_path: str):
         """Notifica usuário sobre deploy bem-sucedido"""
@@ -221,14 +411,36 @@ class DeployManager:
             logger.error(f"Erro ao notificar falha do deploy: {e}")
     
     async def start_deploy_loop(self):
-        """Inicia o loop de verificação de pagamentos para deploy"""
-        while True:
-            try:
-                await self.process_confirmed_payments()
-                await asyncio.sleep(10)  # Verificar a cada 10 segundos
-            except Exception as e:
-                logger.error(f"Erro no loop de deploy: {e}")
-                await asyncio.sleep(30)  # Aguardar mais tempo em caso de erro
+        """Inicia o pool de workers de deploy (acordados por eventos de pagamento)"""
+        # Recuperar pagamentos confirmados antes da inicialização
+        await self.process_confirmed_payments()
+        
+        self.workers = [
+            asyncio.create_task(self.deploy_worker(worker_id))
+            for worker_id in range(self.max_concurrent_deploys)
+        ]
+        logger.info(f"🚀 {len(self.workers)} workers de deploy ativos (máx. {self.max_deploys_per_key} por chave)")
+        
+        try:
+            await asyncio.gather(*self.workers)
+        finally:
+            for worker in self.workers:
+                worker.cancel()
+    
+    async def drain(self, timeout: float = 120):
+        """Para de iniciar deploys e espera os que estão em andamento (os enfileirados voltam na próxima inicialização)"""
+        self.stopping = True
+        self.work_available.set()
+        workers = [worker for worker in self.workers if not worker.done()]
+        if not workers:
+            return
+        if self.active_deploys:
+            logger.info(f"⏳ Aguardando {len(self.active_deploys)} deploy(s) em andamento...")
+        _, pending = await asyncio.wait(workers, timeout=timeout)
+        if pending:
+            logger.warning(f"{len(self.active_deploys)} deploy(s) interrompido(s) na parada")
+            for worker in pending:
+                worker.cancel()
 
 # Instância global
 deploy_manager = None
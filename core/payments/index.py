@@ -0,0 +1,168 @@
+import bisect
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def parse_timestamp(value: Optional[str]) -> float:
+    """Converte um timestamp ISO em segundos (0 se ausente ou inválido)"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PaymentIndex:
+    """Índices secundários dos pagamentos (status, usuário, expiração e criação)"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Remove todos os pagamentos dos índices"""
+        self.by_status: Dict[str, Set[str]] = {}
+        self.by_user: Dict[int, Set[str]] = {}
+        self.amount_by_status: Dict[str, float] = {}
+        # Listas ordenadas de (timestamp, payment_id)
+        self.pending_expiry: List[Tuple[float, str]] = []
+        self.by_created: List[Tuple[float, str]] = []
+        # Id do pagamento no Mercado Pago -> id interno
+        self.by_provider: Dict[str, str] = {}
+        # Valores indexados de cada pagamento: (status, user_id, amount, created_ts, expires_ts, provider_id)
+        self.entries: Dict[str, Tuple[str, int, float, float, float, Optional[str]]] = {}
+
+    def rebuild(self, payments: Dict[str, Dict]):
+        """Reconstrói todos os índices a partir dos pagamentos"""
+        self.clear()
+        for payment_id, payment in payments.items():
+            self.add(payment_id, payment)
+
+    @staticmethod
+    def _entry(payment: Dict) -> Tuple[str, int, float, float, float, Optional[str]]:
+        """Valores indexados de um pagamento (timestamps são convertidos uma única vez)"""
+        return (
+            payment.get("status"),
+            payment.get("user_id"),
+            float(payment.get("amount") or 0),
+            parse_timestamp(payment.get("created_at")),
+            parse_timestamp(payment.get("expires_at")),
+            str(payment["provider_payment_id"]) if payment.get("provider_payment_id") else None,
+        )
+
+    def add(self, payment_id: str, payment: Dict):
+        """Indexa um pagamento"""
+        entry = self._entry(payment)
+        status, user_id, amount, created_ts, expires_ts, provider_id = entry
+        self.entries[payment_id] = entry
+
+        self.by_status.setdefault(status, set()).add(payment_id)
+        self.by_user.setdefault(user_id, set()).add(payment_id)
+        self.amount_by_status[status] = self.amount_by_status.get(status, 0.0) + amount
+        bisect.insort(self.by_created, (created_ts, payment_id))
+        if status == "pending":
+            bisect.insort(self.pending_expiry, (expires_ts, payment_id))
+        if provider_id:
+            self.by_provider[provider_id] = payment_id
+
+    def remove(self, payment_id: str):
+        """Remove um pagamento dos índices"""
+        entry = self.entries.pop(payment_id, None)
+        if not entry:
+            return
+        status, user_id, amount, created_ts, expires_ts, provider_id = entry
+
+        self._discard(self.by_status, status, payment_id)
+        self._discard(self.by_user, user_id, payment_id)
+        self.amount_by_status[status] = self.amount_by_status.get(status, 0.0) - amount
+        self._remove_sorted(self.by_created, (created_ts, payment_id))
+        if status == "pending":
+            self._remove_sorted(self.pending_expiry, (expires_ts, payment_id))
+        if provider_id and self.by_provider.get(provider_id) == payment_id:
+            del self.by_provider[provider_id]
+
+    def update(self, payment_id: str, payment: Dict):
+        """Reindexa um pagamento após uma alteração (só os índices cujos valores mudaram)"""
+        old = self.entries.get(payment_id)
+        entry = self._entry(payment)
+        # by_created só muda em add/remove: a data de criação não muda numa transição de status
+        if old is None or old[3] != entry[3]:
+            self.remove(payment_id)
+            self.add(payment_id, payment)
+            return
+        if old == entry:
+            return
+        old_status, old_user, old_amount, _, old_expires, old_provider = old
+        status, user_id, amount, _, expires_ts, provider_id = entry
+        self.entries[payment_id] = entry
+
+        if old_status != status:
+            self._discard(self.by_status, old_status, payment_id)
+            self.by_status.setdefault(status, set()).add(payment_id)
+        if old_user != user_id:
+            self._discard(self.by_user, old_user, payment_id)
+            self.by_user.setdefault(user_id, set()).add(payment_id)
+        if old_status != status or old_amount != amount:
+            self.amount_by_status[old_status] = self.amount_by_status.get(old_status, 0.0) - old_amount
+            self.amount_by_status[status] = self.amount_by_status.get(status, 0.0) + amount
+        if (old_status == "pending") != (status == "pending") or (status == "pending" and old_expires != expires_ts):
+            if old_status == "pending":
+                self._remove_sorted(self.pending_expiry, (old_expires, payment_id))
+            if status == "pending":
+                bisect.insort(self.pending_expiry, (expires_ts, payment_id))
+        if old_provider != provider_id:
+            if old_provider and self.by_provider.get(old_provider) == payment_id:
+                del self.by_provider[old_provider]
+            if provider_id:
+                self.by_provider[provider_id] = payment_id
+
+    def ids_by_status(self, status: str) -> Set[str]:
+        return self.by_status.get(status, set())
+
+    def ids_by_user(self, user_id: int) -> Set[str]:
+        return self.by_user.get(user_id, set())
+
+    def id_by_provider(self, provider_id) -> Optional[str]:
+        return self.by_provider.get(str(provider_id))
+
+    def created_at(self, payment_id: str) -> float:
+        entry = self.entries.get(payment_id)
+        return entry[3] if entry else 0.0
+
+    def count_by_status(self, status: str) -> int:
+        return len(self.by_status.get(status, ()))
+
+    def amount_for_status(self, status: str) -> float:
+        return self.amount_by_status.get(status, 0.0)
+
+    def expired_ids(self, now_ts: float) -> List[str]:
+        """Pagamentos pendentes cuja expiração já passou"""
+        end = bisect.bisect_left(self.pending_expiry, (now_ts,))
+        return [payment_id for _, payment_id in self.pending_expiry[:end]]
+
+    def next_expiry(self) -> Optional[float]:
+        """Próximo instante de expiração entre os pendentes"""
+        return self.pending_expiry[0][0] if self.pending_expiry else None
+
+    def created_since(self, cutoff_ts: float) -> List[str]:
+        """Pagamentos criados depois de um instante, em ordem de criação"""
+        start = bisect.bisect_right(self.by_created, (cutoff_ts, "\uffff"))
+        return [payment_id for _, payment_id in self.by_created[start:]]
+
+    def created_order(self, payment_ids) -> List[str]:
+        """Ordena ids de pagamento pela data de criação"""
+        return sorted(payment_ids, key=lambda payment_id: (self.entries[payment_id][3], payment_id))
+
+    @staticmethod
+    def _discard(index: Dict, key, payment_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(payment_id)
+            if not ids:
+                del index[key]
+
+    @staticmethod
+    def _remove_sorted(items: List[Tuple[float, str]], item: Tuple[float, str]):
+        position = bisect.bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
@@ -1,51 +1,69 @@
-import json
 import os
-import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from core.logs.logger import logger
+from core.payments.index import PaymentIndex, parse_timestamp
+from core.storage import get_repository
+
+def get_deploy_files(payment: Dict) -> List[Dict]:
+    """Arquivos de deploy do pagamento (pagamentos antigos têm só deploy_file)"""
+    if payment.get("deploy_files"):
+        return payment["deploy_files"]
+    if payment.get("deploy_file"):
+        return [{"file_path": payment["deploy_file"], "sha256": payment.get("deploy_sha256")}]
+    return []
 
 class PaymentManager:
     def __init__(self):
         self.payments_file = "data/payments.json"
+        self.repository = get_repository("payments", self.payments_file, "data/payments.journal.jsonl")
         self.payments: Dict[str, Dict] = {}
+        # Índices secundários (status, usuário, expiração) mantidos a cada mutação
+        self.index = PaymentIndex()
+        # Callbacks notificados a cada transição de status (ex.: fila de deploy)
+        self.status_listeners: List[Callable[[Dict, Optional[str]], None]] = []
         self.load_payments()
     
     def load_payments(self):
-        """Carrega pagamentos salvos do arquivo JSON"""
+        """Carrega os pagamentos do repositório configurado"""
         try:
-            if os.path.exists(self.payments_file):
-                with open(self.payments_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Verificar se é uma lista (formato antigo) e converter para dicionário
-                    if isinstance(data, list):
-                        logger.warning("Formato antigo de payments.json detectado (lista). Convertendo para dicionário...")
-                        self.payments = {}
-                        # Se havia dados na lista, tentar preservar (mas geralmente lista vazia)
-                        if data:
-                            logger.warning("Dados na lista serão perdidos na conversão")
-                    else:
-                        self.payments = data
-                logger.info(f"{len(self.payments)} pagamentos carregados")
-            else:
-                self.save_payments()
+            self.payments = self.repository.load_all()
+            self.index.rebuild(self.payments)
+            self.schedule_pending_expiries()
+            logger.info(f"{len(self.payments)} pagamentos carregados")
         except Exception as e:
             logger.error(f"Erro ao carregar pagamentos: {e}")
             self.payments = {}
+            self.index.clear()
     
     def save_payments(self):
-        """Salva pagamentos no arquivo JSON"""
+        """Salva todos os pagamentos no repositório"""
         try:
-            os.makedirs(os.path.dirname(self.payments_file), exist_ok=True)
-            with open(self.payments_file, 'w', encoding='utf-8') as f:
-                json.dump(self.payments, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.payments)
         except Exception as e:
             logger.error(f"Erro ao salvar pagamentos: {e}")
     
-    def create_payment(self, user_id: int, amount: float, description: str = "Deploy HyperDeploy") -> str:
-        """Cria um novo pagamento"""
+    def save_payment(self, payment_id: str):
+        """Persiste apenas o pagamento alterado"""
+        try:
+            payment = self.payments.get(payment_id)
+            if payment is None:
+                self.repository.delete(payment_id)
+            else:
+                self.repository.put(payment_id, payment)
+        except Exception as e:
+            logger.error(f"Erro ao salvar pagamento {payment_id}: {e}")
+    
+    def create_payment(self, user_id: int, amount: float, description: str = "Deploy HyperDeploy", journey_id: str = None) -> str:
+        """Cria um novo pagamento (journey_id: jornada do ticket de origem, para o rastreamento)"""
         try:
-            payment_id = f"pix_{user_id}_{int(datetime.now().timestamp())}"
+            base_id = f"pix_{user_id}_{int(datetime.now().timestamp())}"
+            # Dois pagamentos do mesmo usuário no mesmo segundo não podem compartilhar o id
+            payment_id = base_id
+            suffix = 2
+            while payment_id in self.payments:
+                payment_id = f"{base_id}_{suffix}"
+                suffix += 1
             
             # Obter timeout configurado do config_manager
             from core.payments.config_manager import config_manager
@@ -62,13 +80,17 @@ class PaymentManager:
                 "paid_at": None,
                 "qr_code_path": None,
                 "pix_key": None,
-                "deploy_file": None
+                "deploy_file": None,
+                "journey_id": journey_id
             }
             
             self.payments[payment_id] = payment_info
-            self.save_payments()
+            self.index.update(payment_id, payment_info)
+            self.save_payment(payment_id)
             
             logger.info(f"Pagamento criado: {payment_id} - R$ {amount:.2f} (expira em {timeout_minutes} min)")
+            self.schedule_expiry(payment_info)
+            self.notify_status_change(payment_info, None)
             return payment_id
             
         except Exception as e:
@@ -79,6 +101,27 @@ class PaymentManager:
         """Obtém informações de um pagamento"""
         return self.payments.get(payment_id)
     
+    def get_payment_by_provider_id(self, provider_payment_id) -> Optional[Dict]:
+        """Obtém um pagamento pelo id do Mercado Pago"""
+        payment_id = self.index.id_by_provider(provider_payment_id)
+        return self.payments.get(payment_id) if payment_id else None
+    
+    def set_provider_payment(self, payment_id: str, provider_payment_id, pix_code: str = None) -> bool:
+        """Vincula o pagamento interno à cobrança criada no Mercado Pago"""
+        try:
+            if payment_id not in self.payments:
+                return False
+            payment = self.payments[payment_id]
+            payment["provider_payment_id"] = str(provider_payment_id)
+            if pix_code:
+                payment["pix_key"] = pix_code
+            self.index.update(payment_id, payment)
+            self.save_payment(payment_id)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao vincular pagamento do Mercado Pago: {e}")
+            return False
+    
     def update_payment_status(self, payment_id: str, status: str, additional_info: Dict = None):
         """Atualiza status de um pagamento"""
         try:
@@ -87,6 +130,7 @@ class PaymentManager:
                 return False
             
             payment = self.payments[payment_id]
+            old_status = payment.get("status")
             payment["status"] = status
             
             if status == "paid":
@@ -95,28 +139,50 @@ class PaymentManager:
             if additional_info:
                 payment.update(additional_info)
             
-            self.save_payments()
+            self.index.update(payment_id, payment)
+            self.save_payment(payment_id)
             
             logger.info(f"Status atualizado: {payment_id} -> {status}")
+            
+            if old_status != status:
+                if old_status == "pending":
+                    self.cancel_expiry(payment_id)
+                self.notify_status_change(payment, old_status)
             return True
             
         except Exception as e:
             logger.error(f"Erro ao atualizar status do pagamento: {e}")
             return False
     
+    def add_status_listener(self, callback: Callable[[Dict, Optional[str]], None]):
+        """Registra um callback chamado quando o status de um pagamento muda"""
+        if callback not in self.status_listeners:
+            self.status_listeners.append(callback)
+    
+    def remove_status_listener(self, callback: Callable[[Dict, Optional[str]], None]):
+        """Remove um callback de mudança de status"""
+        if callback in self.status_listeners:
+            self.status_listeners.remove(callback)
+    
+    def notify_status_change(self, payment: Dict, old_status: Optional[str]):
+        """Notifica os listeners sobre uma transição de status"""
+        for callback in list(self.status_listeners):
+            try:
+                callback(payment, old_status)
+            except Exception as e:
+                logger.error(f"Erro em listener de status de pagamento: {e}")
+    
+    def get_payments_by_ids(self, payment_ids) -> List[Dict]:
+        """Obtém pagamentos a partir de ids do índice, em ordem de criação"""
+        return [self.payments[payment_id] for payment_id in self.index.created_order(payment_ids)]
+    
     def get_payments_by_user(self, user_id: int) -> List[Dict]:
         """Obtém pagamentos de um usuário"""
-        return [
-            payment for payment in self.payments.values()
-            if payment.get("user_id") == user_id
-        ]
+        return self.get_payments_by_ids(self.index.ids_by_user(user_id))
     
     def get_payments_by_status(self, status: str) -> List[Dict]:
         """Obtém pagamentos por status"""
-        return [
-            payment for payment in self.payments.values()
-            if payment.get("status") == status
-        ]
+        return self.get_payments_by_ids(self.index.ids_by_status(status))
     
     def get_pending_payments(self) -> List[Dict]:
         """Obtém pagamentos pendentes"""
@@ -128,16 +194,51 @@ class PaymentManager:
     
     def get_expired_payments(self) -> List[Dict]:
         """Obtém pagamentos expirados"""
-        expired_payments = []
-        current_time = datetime.now()
+        expired_ids = self.index.expired_ids(datetime.now().timestamp())
+        return [self.payments[payment_id] for payment_id in expired_ids]
+    
+    def schedule_expiry(self, payment: Dict):
+        """Registra o prazo de expiração de um pagamento pendente no agendador"""
+        from core.utils.deadlines import deadline_scheduler
+        if deadline_scheduler is None or payment.get("status") != "pending":
+            return
+        payment_id = payment["id"]
+        deadline_scheduler.schedule(
+            f"payment:{payment_id}",
+            parse_timestamp(payment.get("expires_at")),
+            lambda: self.expire_payment(payment_id)
+        )
+    
+    def cancel_expiry(self, payment_id: str):
+        from core.utils.deadlines import deadline_scheduler
+        if deadline_scheduler:
+            deadline_scheduler.cancel(f"payment:{payment_id}")
+    
+    def schedule_pending_expiries(self) -> int:
+        """Reconstrói os prazos a partir dos pagamentos pendentes persistidos"""
+        pending = self.get_pending_payments()
+        for payment in pending:
+            self.schedule_expiry(payment)
+        return len(pending)
+    
+    def expire_payment(self, payment_id: str) -> bool:
+        """Expira um pagamento que continua pendente no fim do prazo"""
+        payment = self.payments.get(payment_id)
+        if not payment or payment.get("status") != "pending":
+            return False
+        self.update_payment_status(payment_id, "expired")
         
-        for payment in self.payments.values():
-            if payment.get("status") == "pending":
-                expires_at = datetime.fromisoformat(payment["expires_at"])
-                if current_time > expires_at:
-                    expired_payments.append(payment)
+        # QR Code do PIX não é mais válido
+        if payment.get("pix_key"):
+            from core.payments.qrcodes import qr_renderer
+            qr_renderer.discard(payment["pix_key"])
+        qr_code_path = payment.get("qr_code_path")
+        if qr_code_path and os.path.exists(qr_code_path):
+            os.remove(qr_code_path)
+            logger.info(f"🗑️ QR Code removido: {qr_code_path}")
         
-        return expired_payments
+        logger.info(f"⏰ Pagamento expirado: {payment_id}")
+        return True
     
     def cleanup_expired_payments(self):
         """Remove pagamentos expirados"""
@@ -145,14 +246,7 @@ class PaymentManager:
             expired_payments = self.get_expired_payments()
             
             for payment in expired_payments:
-                payment_id = payment["id"]
-                self.update_payment_status(payment_id, "expired")
-                
-                # Remover QR Code se existir
-                qr_code_path = payment.get("qr_code_path")
-                if qr_code_path and os.path.exists(qr_code_path):
-                    os.remove(qr_code_path)
-                    logger.info(f"🗑️ QR Code removido: {qr_code_path}")
+                self.expire_payment(payment["id"])
             
             if expired_payments:
                 logger.info(f"🧹 {len(expired_payments)} pagamentos expirados processados")
@@ -164,14 +258,11 @@ class PaymentManager:
         """Obtém estatísticas dos pagamentos"""
         try:
             total_payments = len(self.payments)
-            pending_payments = len(self.get_pending_payments())
-            paid_payments = len(self.get_paid_payments())
-            expired_payments = len(self.get_expired_payments())
+            pending_payments = self.index.count_by_status("pending")
+            paid_payments = self.index.count_by_status("paid")
+            expired_payments = len(self.index.expired_ids(datetime.now().timestamp()))
             
-            total_amount = sum(
-                payment["amount"] for payment in self.payments.values()
-                if payment.get("status") == "paid"
-            )
+            total_amount = self.index.amount_for_status("paid")
             
             return {
                 "total": total_payments,
@@ -186,12 +277,22 @@ class PaymentManager:
             logger.error(f"Erro ao calcular estatísticas: {e}")
             return {}
     
-    def add_deploy_file(self, payment_id: str, file_path: str):
-        """Adiciona arquivo de deploy ao pagamento"""
+    def add_deploy_file(self, payment_id: str, file_path: str, sha256: str = None, filename: str = None):
+        """Adiciona arquivo de deploy ao pagamento (um pagamento pode cobrir vários arquivos)"""
         try:
             if payment_id in self.payments:
-                self.payments[payment_id]["deploy_file"] = file_path
-                self.save_payments()
+                payment = self.payments[payment_id]
+                # deploy_file/deploy_sha256 continuam apontando para o primeiro arquivo
+                if not payment.get("deploy_file"):
+                    payment["deploy_file"] = file_path
+                    if sha256:
+                        payment["deploy_sha256"] = sha256
+                payment.setdefault("deploy_files", []).append({
+                    "file_path": file_path,
+                    "sha256": sha256,
+                    "filename": filename or os.path.basename(file_path)
+                })
+                self.save_payment(payment_id)
                 logger.info(f"📁 Arquivo de deploy adicionado ao pagamento {payment_id}")
                 return True
             return False
@@ -211,7 +312,7 @@ class PaymentManager:
             if payment_id in self.payments:
                 self.payments[payment_id]["deploy_ready"] = True
                 self.payments[payment_id]["deploy_ready_at"] = datetime.now().isoformat()
-                self.save_payments()
+                self.save_payment(payment_id)
                 logger.info(f"🚀 Pagamento {payment_id} marcado para deploy")
                 return True
             return False
@@ -223,8 +324,8 @@ class PaymentManager:
     def get_payments_ready_for_deploy(self) -> List[Dict]:
         """Obtém pagamentos prontos para deploy"""
         return [
-            payment for payment in self.payments.values()
-            if payment.get("status") == "paid" and payment.get("deploy_ready") and payment.get("deploy_file")
+            payment for payment in self.get_paid_payments()
+            if payment.get("deploy_ready") and payment.get("deploy_file")
         ]
     
     def complete_deploy(self, payment_id: str, success: bool = True):
@@ -234,7 +335,7 @@ class PaymentManager:
                 self.payments[payment_id]["deploy_completed"] = True
                 self.payments[payment_id]["deploy_completed_at"] = datetime.now().isoformat()
                 self.payments[payment_id]["deploy_success"] = success
-                self.save_payments()
+                self.save_payment(payment_id)
                 
                 status = "✅" if success else "❌"
                 logger.info(f"{status} Deploy concluído para pagamento {payment_id}")
@@ -249,28 +350,12 @@ class PaymentManager:
         """Obtém pagamentos recentes"""
         try:
             cutoff_time = datetime.now() - timedelta(hours=hours)
-            recent_payments = []
-            
-            for payment in self.payments.values():
-                created_at = datetime.fromisoformat(payment["created_at"])
-                if created_at > cutoff_time:
-                    recent_payments.append(payment)
-            
-            return recent_payments
+            recent_ids = self.index.created_since(cutoff_time.timestamp())
+            return [self.payments[payment_id] for payment_id in recent_ids]
             
         except Exception as e:
             logger.error(f"Erro ao obter pagamentos recentes: {e}")
             return []
-    
-    async def cleanup_loop(self):
-        """Loop de limpeza automática de pagamentos"""
-        while True:
-            try:
-                self.cleanup_expired_payments()
-                await asyncio.sleep(300)  # Verificar a cada 5 minutos
-            except Exception as e:
-                logger.error(f"Erro no loop de limpeza de pagamentos: {e}")
-                await asyncio.sleep(60)
 
 # Instância global
 payment_manager = None
@@ -1,46 +1,223 @@
-import requests
+import aiohttp
+import asyncio
 import logging
+import random
+import time
 import uuid
-from typing import Optional
+from typing import Dict, Optional
+from core.utils.metrics import LatencyHistogram, instrument
 
-# Função para criar cobrança PIX Mercado Pago
+MERCADOPAGO_API_URL = "https://api.mercadopago.com"
 
-def criar_cobranca_pix(valor: float, descricao: str, access_token: str, payer_email: str = "comprador@email.com") -> Optional[str]:
+# Status que valem uma nova tentativa (limite de taxa e falhas do lado do Mercado Pago)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class MercadoPagoError(Exception):
+    """Erro retornado pela API do Mercado Pago"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Erro {status}: {message}")
+        self.status = status
+
+
+class MercadoPagoClient:
+    """Cliente assíncrono do Mercado Pago com sessão keep-alive compartilhada"""
+
+    def __init__(
+        self,
+        access_token: str,
+        base_url: str = MERCADOPAGO_API_URL,
+        max_concurrency: int = 8,
+        timeout: float = 15,
+        max_retries: int = 3,
+        backoff_base: float = 0.5
+    ):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session: Optional[aiohttp.ClientSession] = None
+
+        # Métricas
+        self.request_latency = LatencyHistogram()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Authorization": f"Bearer {self.access_token}"}
+            )
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def request(self, method: str, path: str, payload: Dict = None, params: Dict = None,
+                      idempotency_key: str = None) -> Dict:
+        """Faz uma requisição com novas tentativas (a chave de idempotência é a mesma em todas)"""
+        headers = {}
+        if idempotency_key:
+            headers["X-Idempotency-Key"] = idempotency_key
+
+        attempt = 0
+        while True:
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    self.requests += 1
+                    async with self._get_session().request(
+                        method, f"{self.base_url}{path}", json=payload, params=params, headers=headers
+                    ) as response:
+                        text = await response.text()
+                        if response.status < 400:
+                            return await response.json(content_type=None)
+                        error = MercadoPagoError(response.status, text)
+                        if response.status not in RETRYABLE_STATUS:
+                            raise error
+                        retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            finally:
+                self.request_latency.observe(time.perf_counter() - start)
+
+            if attempt >= self.max_retries:
+                self.failures += 1
+                raise error
+
+            attempt += 1
+            self.retries += 1
+            delay = self._backoff(attempt, retry_after)
+            logging.warning(f"[MercadoPago] {method} {path} falhou ({error}); tentativa {attempt + 1} em {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Backoff exponencial com jitter (ou o Retry-After informado pela API)"""
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return self.backoff_base * (2 ** (attempt - 1)) * (0.5 + random.random())
+
+    async def create_pix_payment(self, valor: float, descricao: str, payer_email: str,
+                                 idempotency_key: str = None, external_reference: str = None) -> Dict:
+        """Cria um pagamento PIX e retorna o objeto do pagamento"""
+        payload = {
+            "transaction_amount": float(valor),
+            "description": descricao,
+            "payment_method_id": "pix",
+            "payer": {
+                "email": payer_email
+            }
+        }
+        if external_reference:
+            # Permite encontrar o pagamento interno mesmo sem o id do Mercado Pago
+            payload["external_reference"] = external_reference
+        # Header obrigatório para evitar duplicatas
+        return await self.request(
+            "POST", "/v1/payments", payload=payload, idempotency_key=idempotency_key or str(uuid.uuid4())
+        )
+
+    async def get_payment(self, payment_id) -> Dict:
+        """Consulta um pagamento pelo id do Mercado Pago"""
+        return await self.request("GET", f"/v1/payments/{payment_id}")
+
+    async def search_payments(self, params: Dict) -> Dict:
+        """Busca pagamentos (um único request cobre vários pagamentos)"""
+        return await self.request("GET", "/v1/payments/search", params=params)
+
+    def get_statistics(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency": self.request_latency.snapshot(),
+        }
+
+
+# Instância global (uma sessão para todo o bot)
+mercadopago_client: Optional[MercadoPagoClient] = None
+
+
+def get_client(access_token: str, base_url: str = MERCADOPAGO_API_URL) -> MercadoPagoClient:
+    """Obtém o cliente compartilhado, recriando-o se o token ou a URL mudarem"""
+    global mercadopago_client
+    if (
+        mercadopago_client is None
+        or mercadopago_client.access_token != access_token
+        or mercadopago_client.base_url != base_url.rstrip("/")
+    ):
+        previous = mercadopago_client
+        mercadopago_client = MercadoPagoClient(access_token, base_url)
+        if previous:
+            asyncio.ensure_future(previous.close())
+    return mercadopago_client
+
+
+async def close_client():
+    """Fecha a sessão HTTP do cliente compartilhado"""
+    global mercadopago_client
+    if mercadopago_client:
+        await mercadopago_client.close()
+        mercadopago_client = None
+
+
+# Funções para criar cobrança PIX Mercado Pago
+
+@instrument("mercadopago_criar_pagamento_pix", failed=lambda result: result is None, api=True)
+async def criar_pagamento_pix(valor: float, descricao: str, access_token: str, payer_email: str = "comprador@email.com",
+                              idempotency_key: str = None, base_url: str = MERCADOPAGO_API_URL) -> Optional[Dict]:
     """
-    Cria uma cobrança PIX no Mercado Pago e retorna o código para gerar QR Code.
-    :param valor: Valor da cobrança (float)
-    :param descricao: Descrição da cobrança
-    :param access_token: Access token do Mercado Pago
-    :param payer_email: E-mail do pagador (opcional)
-    :return: Código PIX (str) ou None em caso de erro
+    Cria uma cobrança PIX no Mercado Pago e retorna o código PIX e o id do pagamento no Mercado Pago.
+    :param idempotency_key: Id do pagamento interno (usado como chave de idempotência e external_reference)
+    :return: {"qr_code", "provider_payment_id", "status"} ou None em caso de erro
     """
     # Validar valor
     if valor <= 0:
         logging.error(f"[MercadoPago] Valor inválido: {valor}. Deve ser maior que zero.")
         return None
-    
-    url = "https://api.mercadopago.com/v1/payments"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "X-Idempotency-Key": str(uuid.uuid4())  # Header obrigatório para evitar duplicatas
-    }
-    payload = {
-        "transaction_amount": float(valor),
-        "description": descricao,
-        "payment_method_id": "pix",
-        "payer": {
-            "email": payer_email
-        }
-    }
+
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        if response.status_code == 201:
-            data = response.json()
-            return data["point_of_interaction"]["transaction_data"]["qr_code"]
-        else:
-            logging.error(f"[MercadoPago] Erro {response.status_code}: {response.text}")
-            return None
+        client = get_client(access_token, base_url)
+        data = await client.create_pix_payment(
+            valor, descricao, payer_email, idempotency_key, external_reference=idempotency_key
+        )
+        return {
+            "qr_code": data["point_of_interaction"]["transaction_data"]["qr_code"],
+            "provider_payment_id": str(data.get("id")) if data.get("id") else None,
+            "status": data.get("status"),
+        }
+    except MercadoPagoError as e:
+        logging.error(f"[MercadoPago] {e}")
+        return None
     except Exception as e:
         logging.error(f"[MercadoPago] Exceção: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+
+async def criar_cobranca_pix(valor: float, descricao: str, access_token: str, payer_email: str = "comprador@email.com",
+                             idempotency_key: str = None, base_url: str = MERCADOPAGO_API_URL) -> Optional[str]:
+    """
+    Cria uma cobrança PIX no Mercado Pago e retorna o código para gerar QR Code.
+    :param valor: Valor da cobrança (float)
+    :param descricao: Descrição da cobrança
+    :param access_token: Access token do Mercado Pago
+    :param payer_email: E-mail do pagador (opcional)
+    :param idempotency_key: Chave de idempotência (ex.: id do pagamento interno)
+    :param base_url: URL da API (permite apontar para um servidor de testes)
+    :return: Código PIX (str) ou None em caso de erro
+    """
+    pagamento = await criar_pagamento_pix(valor, descricao, access_token, payer_email, idempotency_key, base_url)
+    return pagamento["qr_code"] if pagamento else None
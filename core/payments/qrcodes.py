@@ -0,0 +1,90 @@
+import asyncio
+import io
+import time
+from collections import OrderedDict
+from typing import Dict
+import discord
+import qrcode
+from core.utils.metrics import LatencyHistogram
+
+# Parâmetros fixos: o mesmo código PIX gera sempre o mesmo PNG
+QR_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_L
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+
+# QR Codes mantidos em memória para reenvio ("Ver QR Code")
+DEFAULT_CACHE_SIZE = 64
+
+
+def render_png(payload: str) -> bytes:
+    """Gera o PNG do QR Code direto em memória"""
+    qr = qrcode.QRCode(version=None, error_correction=QR_ERROR_CORRECTION, box_size=QR_BOX_SIZE, border=QR_BORDER)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class QRCodeRenderer:
+    """Renderiza QR Codes PIX em um thread do executor, com cache LRU pelo código PIX"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[str, bytes]" = OrderedDict()
+        # Renderizações em andamento (cliques repetidos aguardam a mesma)
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+        # Métricas
+        self.hits = 0
+        self.renders = 0
+        self.render_time = LatencyHistogram()
+
+    async def render(self, payload: str) -> bytes:
+        png = self.cache.get(payload)
+        if png is not None:
+            self.cache.move_to_end(payload)
+            self.hits += 1
+            return png
+
+        future = self.inflight.get(payload)
+        if future is None:
+            future = asyncio.ensure_future(self._render(payload))
+            self.inflight[payload] = future
+        return await asyncio.shield(future)
+
+    async def _render(self, payload: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            png = await loop.run_in_executor(None, render_png, payload)
+        finally:
+            self.inflight.pop(payload, None)
+        self.render_time.observe(time.perf_counter() - start)
+        self.renders += 1
+
+        self.cache[payload] = png
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return png
+
+    def discard(self, payload: str):
+        """Remove do cache o QR Code de um pagamento que não pode mais ser pago"""
+        self.cache.pop(payload, None)
+
+    async def get_file(self, payload: str, filename: str = "qrcode.png") -> discord.File:
+        """discord.File pronto para envio (um BytesIO novo a cada envio; o PNG vem do cache)"""
+        png = await self.render(payload)
+        return discord.File(io.BytesIO(png), filename=filename)
+
+    def get_statistics(self) -> Dict:
+        return {
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "renders": self.renders,
+            "render_time": self.render_time.snapshot(),
+        }
+
+
+# Instância global (sem configuração: pode ser usada desde a importação)
+qr_renderer = QRCodeRenderer()
@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from aiohttp import web
+from core.logs.logger import logger
+from core.payments.mercadopago import MERCADOPAGO_API_URL, get_client
+from core.utils.metrics import LatencyHistogram
+
+# Status internos que ainda aceitam a confirmação do Mercado Pago
+# (um PIX pago logo depois da expiração local continua valendo)
+CONFIRMABLE_STATUSES = ("pending", "expired")
+
+SEARCH_PAGE_SIZE = 100
+
+# Endereços em que o webhook pode rodar sem webhook_secret
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class PaymentReconciler:
+    """Confirma pagamentos PIX consultando o Mercado Pago (busca em lote + webhook)"""
+
+    def __init__(self, payment_manager, access_token: str, base_url: str = MERCADOPAGO_API_URL, config: Dict = None):
+        config = config or {}
+        self.payment_manager = payment_manager
+        self.access_token = access_token
+        self.base_url = base_url
+
+        # Intervalo de consulta adaptativo pela idade do pagamento pendente mais novo
+        self.fast_interval = config.get("fast_interval", 3)
+        self.fast_age = config.get("fast_age", 120)
+        self.normal_interval = config.get("normal_interval", 10)
+        self.slow_age = config.get("slow_age", 900)
+        self.slow_interval = config.get("slow_interval", 30)
+        # Janela extra para pagamentos confirmados logo após a expiração local
+        self.grace_minutes = config.get("grace_minutes", 30)
+
+        # Webhook local (opcional)
+        self.webhook_enabled = config.get("webhook_enabled", False)
+        # Somente local por padrão (um proxy reverso expõe o endpoint); público só com webhook_secret
+        self.webhook_host = config.get("webhook_host", "127.0.0.1")
+        self.webhook_port = config.get("webhook_port", 8080)
+        self.webhook_path = config.get("webhook_path", "/webhooks/mercadopago")
+        self.webhook_secret = config.get("webhook_secret")
+        self.webhook_runner: Optional[web.AppRunner] = None
+        # Verificações disparadas pelo webhook (referência mantida até terminarem)
+        self.verify_tasks: Set[asyncio.Task] = set()
+
+        self.wakeup: Optional[asyncio.Event] = None
+        self.running = False
+
+        # Métricas
+        self.polls = 0
+        self.confirmed = 0
+        self.webhook_events = 0
+        self.time_to_confirm = LatencyHistogram()
+
+        payment_manager.add_status_listener(self.on_payment_status_changed)
+
+    @property
+    def client(self):
+        return get_client(self.access_token, self.base_url)
+
+    def on_payment_status_changed(self, payment: Dict, old_status: Optional[str]):
+        """Acorda o loop quando um novo pagamento pendente é criado"""
+        if old_status is None and payment.get("status") == "pending" and self.wakeup:
+            self.wakeup.set()
+
+    def interval_for_age(self, age: float) -> float:
+        if age < self.fast_age:
+            return self.fast_interval
+        if age < self.slow_age:
+            return self.normal_interval
+        return self.slow_interval
+
+    def next_poll_delay(self) -> Optional[float]:
+        """Próximo intervalo de consulta (None quando não há pagamentos pendentes)"""
+        pending_ids = self.payment_manager.index.ids_by_status("pending")
+        if not pending_ids:
+            return None
+        newest = max(self.payment_manager.index.created_at(payment_id) for payment_id in pending_ids)
+        return self.interval_for_age(time.time() - newest)
+
+    def get_candidates(self) -> List[Dict]:
+        """Pagamentos pendentes e expirados recentemente"""
+        candidates = self.payment_manager.get_payments_by_status("pending")
+        cutoff = (datetime.now() - timedelta(minutes=self.grace_minutes)).isoformat()
+        candidates += [
+            payment for payment in self.payment_manager.get_payments_by_status("expired")
+            if (payment.get("expires_at") or "") >= cutoff
+        ]
+        return candidates
+
+    async def poll_once(self) -> int:
+        """Consulta em lote os pagamentos aprovados desde o pendente mais antigo"""
+        candidates = self.get_candidates()
+        if not candidates:
+            return 0
+
+        self.polls += 1
+        oldest = min(payment.get("created_at") or datetime.now().isoformat() for payment in candidates)
+        begin = datetime.fromisoformat(oldest) - timedelta(minutes=5)
+        params = {
+            "status": "approved",
+            "range": "date_last_updated",
+            "begin_date": begin.astimezone().isoformat(timespec="milliseconds"),
+            "end_date": "NOW",
+            "sort": "date_last_updated",
+            "criteria": "desc",
+            "limit": SEARCH_PAGE_SIZE,
+        }
+
+        confirmed = 0
+        remaining = len(candidates)
+        offset = 0
+        while remaining > 0:
+            params["offset"] = offset
+            data = await self.client.search_payments(params)
+            results = data.get("results") or []
+            for provider_payment in results:
+                if self.apply_provider_payment(provider_payment):
+                    confirmed += 1
+                    remaining -= 1
+            if len(results) < SEARCH_PAGE_SIZE:
+                break
+            offset += SEARCH_PAGE_SIZE
+        return confirmed
+
+    def find_payment(self, provider_payment: Dict) -> Optional[Dict]:
+        payment = None
+        if provider_payment.get("external_reference"):
+            payment = self.payment_manager.get_payment(provider_payment["external_reference"])
+        if not payment and provider_payment.get("id"):
+            payment = self.payment_manager.get_payment_by_provider_id(provider_payment["id"])
+        return payment
+
+    def apply_provider_payment(self, provider_payment: Dict) -> bool:
+        """Marca o pagamento interno como pago se o Mercado Pago o aprovou"""
+        if provider_payment.get("status") != "approved":
+            return False
+        payment = self.find_payment(provider_payment)
+        if not payment or payment.get("status") not in CONFIRMABLE_STATUSES:
+            return False
+
+        payment_id = payment["id"]
+        created_at = payment.get("created_at")
+        updated = self.payment_manager.update_payment_status(payment_id, "paid", {
+            "provider_payment_id": str(provider_payment.get("id")),
+            "provider_status": provider_payment.get("status"),
+            "provider_approved_at": provider_payment.get("date_approved"),
+        })
+        if not updated:
+            return False
+
+        self.confirmed += 1
+        if created_at:
+            self.time_to_confirm.observe(max(0.0, time.time() - datetime.fromisoformat(created_at).timestamp()))
+        logger.success(f"💰 Pagamento confirmado pelo Mercado Pago: {payment_id}")
+        return True
+
+    async def verify_provider_payment(self, provider_payment_id) -> bool:
+        """Consulta um pagamento específico (usado pelo webhook)"""
+        try:
+            provider_payment = await self.client.get_payment(provider_payment_id)
+            return self.apply_provider_payment(provider_payment)
+        except Exception as e:
+            logger.error(f"Erro ao verificar pagamento {provider_payment_id} no Mercado Pago: {e}")
+            return False
+
+    def validate_signature(self, request: web.Request, data_id: str) -> bool:
+        """Valida o header x-signature do Mercado Pago (quando há segredo configurado)"""
+        if not self.webhook_secret:
+            return True
+        parts = dict(
+            part.strip().split("=", 1)
+            for part in request.headers.get("x-signature", "").split(",")
+            if "=" in part
+        )
+        ts, signature = parts.get("ts"), parts.get("v1")
+        if not ts or not signature:
+            return False
+        manifest = f"id:{data_id};request-id:{request.headers.get('x-request-id', '')};ts:{ts};"
+        expected = hmac.new(self.webhook_secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    async def handle_webhook(self, request: web.Request) -> web.Response:
+        """Recebe a notificação e confirma o pagamento consultando a API (o corpo não é confiável)"""
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+        topic = body.get("type") or request.query.get("type") or request.query.get("topic")
+        data_id = (body.get("data") or {}).get("id") or request.query.get("data.id") or request.query.get("id")
+
+        if topic != "payment" or not data_id:
+            return web.Response(status=200)
+        if not self.validate_signature(request, str(data_id)):
+            logger.warning(f"Webhook do Mercado Pago com assinatura inválida (pagamento {data_id})")
+            return web.Response(status=401)
+
+        self.webhook_events += 1
+        # Responder rápido; a verificação roda em segundo plano
+        task = asyncio.create_task(self.verify_provider_payment(data_id))
+        self.verify_tasks.add(task)
+        task.add_done_callback(self.verify_tasks.discard)
+        return web.Response(status=200)
+
+    async def start_webhook_server(self):
+        if not self.webhook_secret and self.webhook_host not in LOOPBACK_HOSTS:
+            # Sem segredo qualquer um poderia disparar consultas: endpoint público exige assinatura
+            logger.error(f"Webhook do Mercado Pago não iniciado: {self.webhook_host} é público e webhook_secret não está configurado")
+            return
+        app = web.Application()
+        app.router.add_post(self.webhook_path, self.handle_webhook)
+        self.webhook_runner = web.AppRunner(app)
+        await self.webhook_runner.setup()
+        await web.TCPSite(self.webhook_runner, self.webhook_host, self.webhook_port).start()
+        # Porta 0: o sistema escolhe uma porta livre
+        self.webhook_port = self.webhook_runner.addresses[0][1]
+        logger.info(f"🔔 Webhook do Mercado Pago em {self.webhook_host}:{self.webhook_port}{self.webhook_path}")
+
+    async def stop(self):
+        self.running = False
+        if self.wakeup:
+            self.wakeup.set()
+        if self.webhook_runner:
+            await self.webhook_runner.cleanup()
+            self.webhook_runner = None
+
+    async def start_reconciliation_loop(self):
+        """Loop de reconciliação: consulta mais frequente enquanto há pagamentos recentes"""
+        self.running = True
+        self.wakeup = asyncio.Event()
+        if self.webhook_enabled:
+            try:
+                await self.start_webhook_server()
+            except Exception as e:
+                logger.error(f"Erro ao iniciar webhook do Mercado Pago: {e}")
+
+        logger.info("🔄 Reconciliação de pagamentos ativa")
+        while self.running:
+            try:
+                delay = self.next_poll_delay()
+                if delay is None:
+                    # Sem pendentes: espera um novo pagamento (ou o intervalo lento)
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=self.slow_interval)
+                        # Pagamento recém-criado: dar tempo para o PIX ser pago
+                        await asyncio.sleep(self.fast_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(delay)
+                if self.running:
+                    await self.poll_once()
+            except Exception as e:
+                logger.error(f"Erro no loop de reconciliação de pagamentos: {e}")
+                await asyncio.sleep(self.slow_interval)
+
+    def get_statistics(self) -> Dict:
+        return {
+            "polls": self.polls,
+            "confirmed": self.confirmed,
+            "webhook_events": self.webhook_events,
+            "time_to_confirm": self.time_to_confirm.snapshot(),
+            "next_poll": self.next_poll_delay(),
+        }
+
+
+# Instância global
+payment_reconciler = None
+
+
+def setup(access_token: str, base_url: str = MERCADOPAGO_API_URL, config: Dict = None):
+    """Configura a reconciliação de pagamentos"""
+    global payment_reconciler
+    from core.payments.manager import payment_manager
+    if not payment_manager:
+        logger.warning("Reconciliação de pagamentos não iniciada: gerenciador de pagamentos indisponível")
+        return
+    payment_reconciler = PaymentReconciler(payment_manager, access_token, base_url, config)
@@ -0,0 +1,273 @@
+import asyncio
+import fnmatch
+import hashlib
+import os
+import shutil
+import time
+import zipfile
+import yaml
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from core.logs.logger import logger
+
+# Padrões removidos por padrão (sintaxe parecida com .gitignore)
+DEFAULT_IGNORE = [
+    "node_modules/",
+    "__pycache__/",
+    ".git/",
+    "venv/",
+    ".venv/",
+    "__MACOSX/",
+    ".DS_Store",
+    "Thumbs.db",
+    "*.pyc",
+    "*.log",
+]
+
+# Nunca removidos, independentemente da lista
+PROTECTED_FILES = ("squarecloud.app", "squarecloud.config")
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Hashes lembrados como "não compensa recompactar" (os mais antigos saem primeiro)
+MAX_NOT_WORTH = 4096
+
+# Nível de compressão por entrada: atributo público só a partir do Python 3.13
+ZIPINFO_LEVEL_ATTRIBUTE = (
+    "compress_level" if "compress_level" in getattr(zipfile.ZipInfo, "__slots__", ())
+    else "_compresslevel"
+)
+
+
+def is_ignored(name: str, patterns: List[str]) -> bool:
+    """
+    Verifica um caminho do ZIP contra a lista de padrões:
+    - "pasta/" remove a pasta em qualquer nível
+    - padrões sem "/" comparam com cada parte do caminho (ex.: "*.log")
+    - padrões com "/" (ex.: "/build" ou "docs/*.md") comparam a partir da raiz
+    """
+    name = name.replace("\\", "/")
+    parts = [part for part in name.split("/") if part]
+    is_dir = name.endswith("/")
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            continue
+        if pattern.endswith("/"):
+            directory = pattern.rstrip("/")
+            # Qualquer parte que seja pasta (todas menos a última, ou a última se for pasta)
+            folders = parts if is_dir else parts[:-1]
+            if "/" in directory:
+                # Pasta ancorada na raiz (ex.: "/build/" ou "docs/old/")
+                if any(
+                    fnmatch.fnmatch("/".join(folders[:i]), directory.lstrip("/"))
+                    for i in range(1, len(folders) + 1)
+                ):
+                    return True
+            elif any(fnmatch.fnmatch(folder, directory) for folder in folders):
+                return True
+        elif "/" in pattern.strip("/"):
+            if fnmatch.fnmatch("/".join(parts), pattern.lstrip("/")):
+                return True
+        elif pattern.startswith("/"):
+            if parts and fnmatch.fnmatch(parts[0], pattern[1:]):
+                return True
+        elif any(fnmatch.fnmatch(part, pattern) for part in parts):
+            return True
+    return False
+
+
+def repack_zip(source_path: str, dest_path: str, patterns: List[str], compress_level: int) -> Dict:
+    """
+    Recompacta o ZIP entrada por entrada (sem carregar arquivos inteiros na memória),
+    descartando o que casa com a lista de padrões. Roda em um processo separado.
+    """
+    removed_entries = 0
+    removed_bytes = 0
+    kept_entries = 0
+    compression = zipfile.ZIP_DEFLATED if compress_level > 0 else zipfile.ZIP_STORED
+    entry_level = compress_level if compression == zipfile.ZIP_DEFLATED else None
+
+    with zipfile.ZipFile(source_path) as source, \
+            zipfile.ZipFile(dest_path, "w", compression, compresslevel=entry_level) as dest:
+        for info in source.infolist():
+            name = info.filename
+            if name not in PROTECTED_FILES and is_ignored(name, patterns):
+                removed_entries += 1
+                removed_bytes += info.file_size
+                continue
+
+            # Mantém nome, data e permissões; só a compressão muda
+            new_info = zipfile.ZipInfo(name, date_time=info.date_time)
+            new_info.external_attr = info.external_attr
+            new_info.create_system = info.create_system
+            new_info.compress_type = compression
+            setattr(new_info, ZIPINFO_LEVEL_ATTRIBUTE, entry_level)
+
+            if info.is_dir():
+                dest.writestr(new_info, b"")
+            else:
+                force_zip64 = info.file_size > zipfile.ZIP64_LIMIT
+                with source.open(info) as reader, \
+                        dest.open(new_info, "w", force_zip64=force_zip64) as writer:
+                    shutil.copyfileobj(reader, writer, COPY_BUFFER_SIZE)
+            kept_entries += 1
+
+    return {
+        "original_size": os.path.getsize(source_path),
+        "repacked_size": os.path.getsize(dest_path),
+        "kept_entries": kept_entries,
+        "removed_entries": removed_entries,
+        "removed_bytes": removed_bytes,
+    }
+
+
+class RepackStage:
+    """Etapa opcional entre o upload e o deploy: remove lixo do ZIP e recompacta (cache por hash)"""
+
+    def __init__(self):
+        self.config_file = "config/squarecloud.yaml"
+        self.cache_dir = os.path.join("uploads", "repacked")
+        config = self.load_config()
+        self.enabled = config.get("enabled", False)
+        self.ignore = list(config.get("ignore") or DEFAULT_IGNORE)
+        self.compress_level = int(config.get("compress_level", 6))
+        # Abaixo disso não vale a pena enviar a versão recompactada
+        self.min_savings_percent = float(config.get("min_savings_percent", 5))
+        # Chave das configurações: mudar a lista ou o nível invalida o cache
+        self.settings_key = hashlib.sha256(
+            f"{self.compress_level}|{'|'.join(self.ignore)}".encode()
+        ).hexdigest()[:8]
+
+        # Recompactações em andamento (um único worker por arquivo)
+        self.inflight: Dict[str, asyncio.Task] = {}
+        # Arquivos em que a recompactação não compensou (enviados como estão), com limite
+        self.not_worth: OrderedDict = OrderedDict()
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Métricas
+        self.repacked = 0
+        self.cache_hits = 0
+        self.skipped = 0
+        self.bytes_saved = 0
+
+    def load_config(self) -> Dict:
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, "r", encoding="utf-8") as f:
+                    return (yaml.safe_load(f) or {}).get("repack") or {}
+        except Exception as e:
+            logger.error(f"Erro ao carregar configurações de recompactação: {e}")
+        return {}
+
+    def cache_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}_{self.settings_key}.zip")
+
+    def schedule(self, zip_path: str, sha256: str) -> Optional[asyncio.Task]:
+        """Inicia a recompactação em segundo plano (logo após a validação do upload)"""
+        if not self.enabled or not sha256 or sha256 in self.not_worth:
+            return None
+        task = self.inflight.get(sha256)
+        if not task:
+            task = asyncio.ensure_future(self._repack(zip_path, sha256))
+            self.inflight[sha256] = task
+        return task
+
+    async def prepared_path(self, zip_path: str, sha256: str = None) -> str:
+        """
+        Arquivo a ser enviado no deploy: o recompactado, se já estiver pronto (ou em andamento),
+        senão o original. O deploy nunca recompacta por conta própria.
+        """
+        if not self.enabled or not sha256 or sha256 in self.not_worth:
+            return zip_path
+        from core.storage.async_io import run_io
+        try:
+            task = self.inflight.get(sha256)
+            if task:
+                return await asyncio.shield(task)
+            cached = self.cache_path(sha256)
+            if await run_io(os.path.exists, cached):
+                self.cache_hits += 1
+                # Atualiza o mtime: a limpeza remove só o que não é usado há tempo
+                await run_io(os.utime, cached)
+                return cached
+        except Exception as e:
+            logger.error(
+                f"Erro ao obter o ZIP recompactado de {zip_path}, enviando o original: {e}"
+            )
+        return zip_path
+
+    def mark_not_worth(self, sha256: str):
+        self.not_worth[sha256] = True
+        self.not_worth.move_to_end(sha256)
+        while len(self.not_worth) > MAX_NOT_WORTH:
+            self.not_worth.popitem(last=False)
+
+    async def _repack(self, zip_path: str, sha256: str) -> str:
+        from core.storage.async_io import run_io
+        from core.utils.workers import run_cpu
+        cached = self.cache_path(sha256)
+        temp_path = f"{cached}.part"
+        try:
+            if await run_io(os.path.exists, cached):
+                return cached
+            stats = await run_cpu(repack_zip, zip_path, temp_path, self.ignore, self.compress_level)
+            saved = stats["original_size"] - stats["repacked_size"]
+            if saved < stats["original_size"] * self.min_savings_percent / 100:
+                # Nada relevante para remover: o original é enviado e o resultado não é guardado
+                self.skipped += 1
+                self.mark_not_worth(sha256)
+                return zip_path
+
+            await run_io(os.replace, temp_path, cached)
+            self.repacked += 1
+            self.bytes_saved += saved
+            logger.info(
+                f"🗜️ ZIP recompactado: {stats['original_size'] / (1024 * 1024):.2f} MB -> "
+                f"{stats['repacked_size'] / (1024 * 1024):.2f} MB "
+                f"({stats['removed_entries']} arquivos removidos)"
+            )
+            return cached
+        except Exception as e:
+            # Roda em segundo plano: o erro fica no log e o deploy usa o original
+            logger.error(f"Erro ao recompactar {zip_path}, enviando o original: {e}")
+            return zip_path
+        finally:
+            self.inflight.pop(sha256, None)
+            if await run_io(os.path.exists, temp_path):
+                await run_io(os.remove, temp_path)
+
+    async def cleanup(self, max_age_hours: float) -> int:
+        """Remove versões recompactadas sem uso há mais de max_age_hours"""
+        from core.storage.async_io import remove_files, scan_dir
+        cutoff = time.time() - max_age_hours * 3600
+        inflight = {self.cache_path(sha256) for sha256 in self.inflight}
+        expired = [
+            file_path for _, file_path, _, mtime, _ in await scan_dir(self.cache_dir)
+            if mtime < cutoff and file_path not in inflight
+        ]
+        removed, _ = await remove_files(expired)
+        return removed
+
+    def get_statistics(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "repacked": self.repacked,
+            "cache_hits": self.cache_hits,
+            "skipped": self.skipped,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+# Instância global
+repack_stage = None
+
+
+def setup():
+    global repack_stage
+    repack_stage = RepackStage()
+    if repack_stage.enabled:
+        logger.info(
+            f"🗜️ Recompactação de ZIPs ativa ({len(repack_stage.ignore)} padrões ignorados)"
+        )
@@ -1,22 +1,190 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
 import yaml
-from mercadopago import criar_cobranca_pix
+import aiohttp
+from aiohttp import web
+from core.payments.mercadopago import close_client, criar_cobranca_pix, criar_pagamento_pix, get_client
 
-def test_criar_cobranca_pix():
-    # Carregar access_token do bot.yaml
+# Uso:
+#   python -m core.payments.test_mercadopago              -> API real (token do config/bot.yaml)
+#   python -m core.payments.test_mercadopago --stub       -> servidor local simulando a API
+#   python -m core.payments.test_mercadopago --reconcile  -> reconciliação contra o servidor local
+# Ou pelo pytest (o teste da API real é pulado sem um token configurado):
+#   python -m pytest core/payments/test_mercadopago.py
+
+PLACEHOLDER_TOKEN = "SEU_ACCESS_TOKEN_MERCADOPAGO_AQUI"
+
+def load_access_token():
+    """Token do config/bot.yaml (None se ausente ou ainda o valor de exemplo)"""
+    if not os.path.exists('config/bot.yaml'):
+        return None
     with open('config/bot.yaml', 'r', encoding='utf-8') as f:
-        bot_config = yaml.safe_load(f)
-        access_token = bot_config.get('mercadopago_access_token')
-    if not access_token:
-        print('Access token Mercado Pago não configurado.')
-        return
+        access_token = (yaml.safe_load(f) or {}).get('mercadopago_access_token')
+    return access_token if access_token and access_token != PLACEHOLDER_TOKEN else None
+
+async def run_criar_cobranca_pix(access_token):
     valor = 1.00
     descricao = 'Teste de cobrança PIX via Mercado Pago'
-    codigo_pix = criar_cobranca_pix(valor, descricao, access_token)
+    codigo_pix = await criar_cobranca_pix(valor, descricao, access_token)
     if codigo_pix:
         print('Código PIX gerado com sucesso:')
         print(codigo_pix)
     else:
         print('Falha ao gerar cobrança PIX.')
+    await close_client()
+
+async def start_stub_server(fail_first: int = 1):
+    """Servidor local que responde como a API de pagamentos (falhando as primeiras chamadas)"""
+    state = {"calls": 0, "idempotency_keys": [], "payments": {}}
+
+    async def create_payment(request):
+        state["calls"] += 1
+        key = request.headers.get("X-Idempotency-Key")
+        state["idempotency_keys"].append(key)
+        if state["calls"] <= fail_first:
+            return web.json_response({"message": "temporarily unavailable"}, status=503)
+        if key in state["payments"]:
+            return web.json_response(state["payments"][key], status=201)
+        body = await request.json()
+        payment = {
+            "id": len(state["payments"]) + 1,
+            "status": "pending",
+            "transaction_amount": body["transaction_amount"],
+            "point_of_interaction": {"transaction_data": {"qr_code": f"PIX-STUB-{key}"}}
+        }
+        payment["external_reference"] = body.get("external_reference")
+        state["payments"][key] = payment
+        return web.json_response(payment, status=201)
+
+    async def get_payment(request):
+        for payment in state["payments"].values():
+            if str(payment["id"]) == request.match_info["payment_id"]:
+                return web.json_response(payment)
+        return web.json_response({"message": "not found"}, status=404)
+
+    async def search_payments(request):
+        state["searches"] = state.get("searches", 0) + 1
+        status = request.query.get("status")
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", 30))
+        results = [p for p in state["payments"].values() if not status or p["status"] == status]
+        return web.json_response({"results": results[offset:offset + limit], "paging": {"total": len(results)}})
+
+    app = web.Application()
+    app.router.add_post('/v1/payments', create_payment)
+    app.router.add_get('/v1/payments/search', search_payments)
+    app.router.add_get('/v1/payments/{payment_id}', get_payment)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", state
+
+def test_criar_cobranca_pix():
+    access_token = load_access_token()
+    if not access_token:
+        raise unittest.SkipTest('Access token Mercado Pago não configurado (teste contra a API real)')
+    asyncio.run(run_criar_cobranca_pix(access_token))
+
+async def run_stub():
+    runner, base_url, state = await start_stub_server(fail_first=1)
+    try:
+        client = get_client("TEST-TOKEN", base_url)
+        client.backoff_base = 0.01
+        codigo_pix = await criar_cobranca_pix(1.00, 'Teste stub', "TEST-TOKEN", idempotency_key="pix_1", base_url=base_url)
+        assert codigo_pix == "PIX-STUB-pix_1", codigo_pix
+        # A retentativa após o 503 reutilizou a mesma chave de idempotência
+        assert state["idempotency_keys"] == ["pix_1", "pix_1"], state["idempotency_keys"]
+
+        # Chamadas concorrentes compartilham a mesma sessão
+        codigos = await asyncio.gather(*[
+            criar_cobranca_pix(1.00, 'Teste stub', "TEST-TOKEN", idempotency_key=f"pix_{i}", base_url=base_url)
+            for i in range(2, 22)
+        ])
+        assert all(codigos), codigos
+        print('Servidor stub: OK')
+        print(client.get_statistics())
+    finally:
+        await close_client()
+        await runner.cleanup()
+
+def approve(state, idempotency_key):
+    """Simula o pagamento do PIX no servidor local"""
+    payment = state["payments"][idempotency_key]
+    payment["status"] = "approved"
+    payment["date_approved"] = "2024-01-01T00:00:00.000-03:00"
+    return payment
+
+def test_stub():
+    asyncio.run(run_stub())
+
+async def run_reconcile():
+    from core.payments.manager import PaymentManager
+    from core.payments.reconciliation import PaymentReconciler
+    from core.storage.async_io import drain_writes
+
+    runner, base_url, state = await start_stub_server(fail_first=0)
+    workdir = os.getcwd()
+    # Diretório temporário: o PaymentManager grava em data/ relativo ao diretório atual
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            payment_manager = PaymentManager()
+            reconciler = PaymentReconciler(payment_manager, "TEST-TOKEN", base_url, {
+                "webhook_enabled": True, "webhook_host": "127.0.0.1", "webhook_port": 0
+            })
+            await reconciler.start_webhook_server()
+
+            # Polling em lote: 5 pagamentos, 3 aprovados, uma única busca
+            ids = []
+            for i in range(5):
+                payment_id = payment_manager.create_payment(1000 + i, 5.0, "Teste reconciliação")
+                pagamento = await criar_pagamento_pix(5.0, "Teste", "TEST-TOKEN", idempotency_key=payment_id, base_url=base_url)
+                payment_manager.set_provider_payment(payment_id, pagamento["provider_payment_id"], pagamento["qr_code"])
+                ids.append(payment_id)
+            for payment_id in ids[:3]:
+                approve(state, payment_id)
+            assert await reconciler.poll_once() == 3
+            assert state["searches"] == 1
+            assert [payment_manager.get_payment(p)["status"] for p in ids] == ["paid"] * 3 + ["pending"] * 2
+
+            # Webhook: notificação -> consulta do pagamento -> pago
+            provider_id = approve(state, ids[3])["id"]
+            async with aiohttp.ClientSession() as session:
+                webhook_url = f"http://127.0.0.1:{reconciler.webhook_port}/webhooks/mercadopago"
+                async with session.post(webhook_url,
+                                        json={"type": "payment", "data": {"id": str(provider_id)}}) as response:
+                    assert response.status == 200
+            for _ in range(50):
+                if payment_manager.get_payment(ids[3])["status"] == "paid":
+                    break
+                await asyncio.sleep(0.05)
+            assert payment_manager.get_payment(ids[3])["status"] == "paid"
+            assert reconciler.next_poll_delay() == reconciler.fast_interval
+
+            print('Reconciliação: OK')
+            print(reconciler.get_statistics())
+            await reconciler.stop()
+            await drain_writes()
+        finally:
+            os.chdir(workdir)
+            await close_client()
+            await runner.cleanup()
+
+def test_reconcile():
+    asyncio.run(run_reconcile())
 
 if __name__ == '__main__':
-    test_criar_cobranca_pix() 
\ No newline at end of file
+    if '--stub' in sys.argv:
+        test_stub()
+    elif '--reconcile' in sys.argv:
+        test_reconcile()
+    else:
+        try:
+            test_criar_cobranca_pix()
+        except unittest.SkipTest as e:
+            print(e)
@@ -1,5 +1,4 @@
 import os
-import json
 import asyncio
 import discord
 import aiohttp
@@ -7,14 +6,16 @@ import aiofiles
 from datetime import datetime
 from typing import Dict, List, Optional
 from core.logs.logger import logger
-from core.squarecloud.client import SquareCloudManager
+from core.squarecloud.client import get_manager
+from core.storage import get_repository
 
 class BackupManager:
     def __init__(self):
         self.backup_folder = "backups"
         self.backup_data_file = "data/backups.json"
         self.backup_data: Dict = {}
-        self.squarecloud_manager = SquareCloudManager()
+        self.repository = get_repository("backups", self.backup_data_file)
+        self.squarecloud_manager = get_manager()
         self.ensure_backup_folder()
         self.load_backup_data()
     
@@ -25,20 +26,10 @@ class BackupManager:
             logger.info(f"Pasta de backups criada: {self.backup_folder}")
     
     def load_backup_data(self):
-        """Carrega dados de backup do arquivo JSON"""
+        """Carrega dados de backup do repositório"""
         try:
-            if os.path.exists(self.backup_data_file):
-                with open(self.backup_data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Verificar se é uma lista (formato antigo) e converter para dicionário
-                    if isinstance(data, list):
-                        logger.warning("Formato antigo de backups.json detectado (lista). Convertendo para dicionário...")
-                        self.backup_data = {}
-                        # Se havia dados na lista, tentar preservar (mas geralmente lista vazia)
-                        if data:
-                            logger.warning("Dados na lista serão perdidos na conversão")
-                    else:
-                        self.backup_data = data
+            if self.repository.exists():
+                self.backup_data = self.repository.load_all()
                 logger.info(f"📦 {len(self.backup_data)} registros de backup carregados")
             else:
                 self.save_backup_data()
@@ -47,11 +38,9 @@ class BackupManager:
             self.backup_data = {}
     
     def save_backup_data(self):
-        """Salva dados de backup no arquivo JSON"""
+        """Salva todos os dados de backup no repositório"""
         try:
-            os.makedirs(os.path.dirname(self.backup_data_file), exist_ok=True)
-            with open(self.backup_data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.backup_data, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.backup_data)
         except Exception as e:
             logger.error(f"Erro ao salvar dados de backup: {e}")
     
@@ -87,7 +76,7 @@ class BackupManager:
             # Adicionar ao registro
             backup_id = f"{app_id}_{timestamp}"
             self.backup_data[backup_id] = backup_record
-            self.save_backup_data()
+            self.repository.put(backup_id, backup_record)
             
             logger.info(f"✅ Backup criado: {backup_filename} para aplicação {app_id}")
             return backup_record
@@ -117,8 +106,10 @@ class BackupManager:
             
             # Buscar informações do backup
             backup_record = None
-            for record in self.backup_data.values():
+            record_key = None
+            for key, record in self.backup_data.items():
                 if record.get("id") == backup_id:
+                    record_key = key
                     backup_record = record
                     break
             
@@ -141,7 +132,7 @@ class BackupManager:
             backup_record["size_bytes"] = len(backup_data)
             backup_record["status"] = "downloaded"
             backup_record["downloaded_at"] = datetime.now().isoformat()
-            self.save_backup_data()
+            self.repository.put(record_key, backup_record)
             
             logger.info(f"✅ Backup baixado: {backup_path}")
             return backup_path
@@ -160,7 +151,7 @@ class BackupManager:
                 return None
             
             # Upload do backup como nova aplicação
-            app_id = await self.squarecloud_manager.upload_app(api_key, backup_path, app_name)
+            app_id = await self.squarecloud_manager.restore_app(api_key, backup_path, app_name)
             if not app_id:
                 logger.error(f"❌ Falha na restauração do backup")
                 return None
@@ -190,7 +181,7 @@ class BackupManager:
                 
                 # Remover do registro
                 del self.backup_data[backup_id]
-                self.save_backup_data()
+                self.repository.delete(backup_id)
                 
                 logger.info(f"🗑️ Registro de backup removido: {backup_id}")
                 return True
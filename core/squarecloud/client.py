@@ -1,9 +1,222 @@
 import yaml
 import os
 import asyncio
-from typing import Optional, Dict, List
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Dict, List, Tuple
 from squarecloud import Client, File
 from core.logs.logger import logger
+from core.utils.metrics import instrument, metrics
+
+# Consultas ao cache de respostas por recurso e resultado (hit, miss, coalesced)
+cache_lookups = metrics.counter(
+    "squarecloud_cache_lookups_total", "Consultas ao cache de respostas da Square Cloud", ("resource", "result")
+)
+
+class ClientRegistry:
+    """Clientes da Square Cloud reutilizados por API key (LRU + expiração por inatividade)"""
+    
+    def __init__(self, max_clients: int = 256, idle_timeout: float = 900):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        # api_key -> (cliente, último uso); ordem = menos recentemente usado primeiro
+        self.clients: "OrderedDict[str, Tuple[Client, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_sweep = time.monotonic()
+        
+        # Métricas e ganchos (event, key_id) para métricas de conexão
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.listeners: List[Callable[[str, str], None]] = []
+    
+    def configure(self, config: Dict):
+        self.max_clients = int(config.get("max_clients", self.max_clients))
+        self.idle_timeout = float(config.get("idle_timeout", self.idle_timeout))
+    
+    @staticmethod
+    def key_id(api_key: str) -> str:
+        """Identificador da chave seguro para logs e métricas"""
+        return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    
+    def add_listener(self, callback: Callable[[str, str], None]):
+        """Registra um callback chamado em created/reused/evicted"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+    
+    def _emit(self, event: str, api_key: str):
+        for callback in list(self.listeners):
+            try:
+                callback(event, self.key_id(api_key))
+            except Exception as e:
+                logger.error(f"Erro em listener do registro de clientes: {e}")
+    
+    def get(self, api_key: str) -> Client:
+        """Obtém o cliente da chave, criando-o apenas na primeira vez"""
+        now = time.monotonic()
+        if now - self.last_sweep > 60:
+            self.evict_idle(now)
+        
+        evicted = []
+        with self.lock:
+            entry = self.clients.get(api_key)
+            if entry:
+                self.hits += 1
+                client = entry[0]
+                self.clients[api_key] = (client, now)
+                self.clients.move_to_end(api_key)
+                event = "reused"
+            else:
+                self.misses += 1
+                client = Client(api_key)
+                self.clients[api_key] = (client, now)
+                event = "created"
+                while len(self.clients) > self.max_clients:
+                    evicted.append(self.clients.popitem(last=False))
+        
+        self._emit(event, api_key)
+        for evicted_key, (evicted_client, _) in evicted:
+            self._evict(evicted_key, evicted_client)
+        return client
+    
+    def evict_idle(self, now: float = None) -> int:
+        """Remove clientes sem uso há mais de idle_timeout segundos"""
+        now = now or time.monotonic()
+        with self.lock:
+            self.last_sweep = now
+            idle = [
+                (api_key, client) for api_key, (client, last_used) in self.clients.items()
+                if now - last_used > self.idle_timeout
+            ]
+            for api_key, _ in idle:
+                del self.clients[api_key]
+        for api_key, client in idle:
+            self._evict(api_key, client)
+        return len(idle)
+    
+    def _evict(self, api_key: str, client: Client):
+        self.evictions += 1
+        self._emit("evicted", api_key)
+        # Fechar a sessão HTTP do cliente, se a biblioteca expuser uma
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"Erro ao fechar cliente Square Cloud: {e}")
+    
+    def get_statistics(self) -> Dict:
+        return {
+            "clients": len(self.clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+# Registro global de clientes (compartilhado por todo o bot)
+client_registry = ClientRegistry()
+
+# Validade padrão (segundos) das respostas em cache, por recurso
+DEFAULT_CACHE_TTLS = {
+    "apps": 30,
+    "status": 10,
+    "backups": 60,
+    "domains": 120,
+}
+
+class ResponseCache:
+    """Cache de leitura com validade por recurso e agrupamento de requisições simultâneas"""
+    
+    def __init__(self, ttls: Dict = None, max_entries: int = 2048):
+        self.ttls = dict(DEFAULT_CACHE_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_entries = max_entries
+        # (key_id, recurso, app_id) -> (expira_em, valor)
+        self.entries: Dict[Tuple, Tuple[float, object]] = {}
+        # (key_id, recurso, app_id) -> requisição em andamento
+        self.inflight: Dict[Tuple, asyncio.Task] = {}
+        # Incrementado a cada invalidação: respostas iniciadas antes não entram no cache
+        self.generations: Dict[str, int] = {}
+        
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+    
+    async def get_or_fetch(self, resource: str, api_key: str, app_id: Optional[str], fetch: Callable):
+        """Retorna o valor em cache ou busca uma única vez, mesmo com várias chamadas simultâneas"""
+        key_id = ClientRegistry.key_id(api_key)
+        key = (key_id, resource, app_id)
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            cache_lookups.inc(resource=resource, result="hit")
+            return entry[1]
+        
+        task = self.inflight.get(key)
+        if task:
+            self.coalesced += 1
+            cache_lookups.inc(resource=resource, result="coalesced")
+        else:
+            self.misses += 1
+            cache_lookups.inc(resource=resource, result="miss")
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self.inflight[key] = task
+        # shield: cancelar uma interação não cancela a busca compartilhada
+        return await asyncio.shield(task)
+    
+    async def _fetch(self, key: Tuple, fetch: Callable):
+        key_id, resource, _ = key
+        generation = self.generations.get(key_id, 0)
+        try:
+            value = await fetch()
+            ttl = self.ttls.get(resource, 0)
+            if ttl > 0 and self.generations.get(key_id, 0) == generation:
+                if len(self.entries) >= self.max_entries:
+                    self._purge_expired()
+                self.entries[key] = (time.monotonic() + ttl, value)
+            return value
+        finally:
+            self.inflight.pop(key, None)
+    
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self.entries.items() if expires_at <= now]:
+            del self.entries[key]
+        # Ainda cheio: descartar as entradas que expiram primeiro
+        while len(self.entries) >= self.max_entries:
+            del self.entries[min(self.entries, key=lambda key: self.entries[key][0])]
+    
+    def invalidate(self, api_key: str, app_id: str = None):
+        """Descarta o cache da chave (ou só da aplicação e da lista de aplicações)"""
+        key_id = ClientRegistry.key_id(api_key)
+        self.generations[key_id] = self.generations.get(key_id, 0) + 1
+        self.invalidations += 1
+        for key in list(self.entries):
+            if key[0] == key_id and (app_id is None or key[1] == "apps" or key[2] == app_id):
+                del self.entries[key]
+    
+    def get_statistics(self) -> Dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+def request_failed(result) -> bool:
+    """Os métodos tratam os erros da API e retornam None/False (ou status "error" no upload)"""
+    return result is None or result is False or (isinstance(result, dict) and result.get("status") == "error")
+
 
 class SquareCloudManager:
     def __init__(self, api_key: str = None):
@@ -11,9 +224,11 @@ class SquareCloudManager:
         self.config = self.load_config()
         self.client = None
         self.api_key = api_key or self.config.get("api_key")
+        client_registry.configure(self.config.get("client_pool") or {})
+        self.cache = ResponseCache(self.config.get("cache_ttl") or {})
         
         if self.api_key and self.api_key != "SUA_API_KEY_SQUARECLOUD_AQUI":
-            self.client = Client(self.api_key)
+            self.client = client_registry.get(self.api_key)
             logger.info("Cliente Square Cloud inicializado")
         else:
             logger.warning("API Key da Square Cloud não configurada")
@@ -34,11 +249,19 @@ class SquareCloudManager:
             return {}
     
     def get_client(self, api_key: Optional[str] = None) -> Optional[Client]:
-        """Obtém cliente da Square Cloud"""
+        """Obtém cliente da Square Cloud (reutilizado por API key)"""
         if api_key:
-            return Client(api_key)
+            return client_registry.get(api_key)
         return self.client
     
+    def get_cache_statistics(self) -> Dict:
+        """Estatísticas do cache de respostas e do registro de clientes"""
+        return {
+            "cache": self.cache.get_statistics(),
+            "clients": client_registry.get_statistics(),
+        }
+    
+    @instrument("squarecloud_upload_app", failed=request_failed, api=True)
     async def upload_app(self, api_key: str, zip_path: str) -> Dict:
         """Faz upload de uma aplicação para a Square Cloud"""
         try:
@@ -51,6 +274,7 @@ class SquareCloudManager:
             
             file = File(zip_path)
             result = await client.upload_app(file=file)
+            self.cache.invalidate(api_key or self.api_key)
             
             logger.info(f"Upload realizado: {result.id if hasattr(result, 'id') else 'N/A'}")
             return {"status": "success", "result": result}
@@ -59,34 +283,47 @@ class SquareCloudManager:
             logger.error(f"❌ Erro no upload: {e}")
             return {"status": "error", "error": str(e)}
     
-    async def list_apps(self, api_key: str) -> List:
-        """Lista todas as aplicações do usuário"""
+    async def list_apps(self, api_key: str, raise_errors: bool = False) -> List:
+        """Lista todas as aplicações do usuário (em cache)"""
         try:
             client = self.get_client(api_key)
             if not client:
                 return []
             
-            apps = await client.all_apps()
+            @instrument("squarecloud_list_apps", failed=request_failed, api=True)
+            async def fetch():
+                return await client.all_apps()
+
+            apps = await self.cache.get_or_fetch("apps", api_key or self.api_key, None, fetch)
             return apps
             
         except Exception as e:
             logger.error(f"❌ Erro ao listar aplicações: {e}")
+            if raise_errors:
+                raise
             return []
     
-    async def get_app_status(self, api_key: str, app_id: str) -> Optional[Dict]:
-        """Obtém status de uma aplicação"""
+    async def get_app_status(self, api_key: str, app_id: str, raise_errors: bool = False) -> Optional[Dict]:
+        """Obtém status de uma aplicação (em cache)"""
         try:
             client = self.get_client(api_key)
             if not client:
                 return None
             
-            status = await client.app_status(app_id=app_id)
+            @instrument("squarecloud_get_app_status", failed=request_failed, api=True)
+            async def fetch():
+                return await client.app_status(app_id=app_id)
+
+            status = await self.cache.get_or_fetch("status", api_key or self.api_key, app_id, fetch)
             return status
             
         except Exception as e:
             logger.error(f"❌ Erro ao obter status da aplicação: {e}")
+            if raise_errors:
+                raise
             return None
     
+    @instrument("squarecloud_start_app", failed=request_failed, api=True)
     async def start_app(self, api_key: str, app_id: str) -> bool:
         """Inicia uma aplicação"""
         try:
@@ -95,6 +332,7 @@ class SquareCloudManager:
                 return False
             
             await client.start_app(app_id=app_id)
+            self.cache.invalidate(api_key or self.api_key, app_id)
             logger.info(f"🚀 Aplicação {app_id} iniciada")
             return True
             
@@ -102,6 +340,7 @@ class SquareCloudManager:
             logger.error(f"❌ Erro ao iniciar aplicação: {e}")
             return False
     
+    @instrument("squarecloud_stop_app", failed=request_failed, api=True)
     async def stop_app(self, api_key: str, app_id: str) -> bool:
         """Para uma aplicação"""
         try:
@@ -110,6 +349,7 @@ class SquareCloudManager:
                 return False
             
             await client.stop_app(app_id=app_id)
+            self.cache.invalidate(api_key or self.api_key, app_id)
             logger.info(f"⏹️ Aplicação {app_id} parada")
             return True
             
@@ -117,6 +357,7 @@ class SquareCloudManager:
             logger.error(f"❌ Erro ao parar aplicação: {e}")
             return False
     
+    @instrument("squarecloud_restart_app", failed=request_failed, api=True)
     async def restart_app(self, api_key: str, app_id: str) -> bool:
         """Reinicia uma aplicação"""
         try:
@@ -125,6 +366,7 @@ class SquareCloudManager:
                 return False
             
             await client.restart_app(app_id=app_id)
+            self.cache.invalidate(api_key or self.api_key, app_id)
             logger.info(f"🔄 Aplicação {app_id} reiniciada")
             return True
             
@@ -132,6 +374,7 @@ class SquareCloudManager:
             logger.error(f"❌ Erro ao reiniciar aplicação: {e}")
             return False
     
+    @instrument("squarecloud_delete_app", failed=request_failed, api=True)
     async def delete_app(self, api_key: str, app_id: str) -> bool:
         """Deleta uma aplicação"""
         try:
@@ -141,6 +384,7 @@ class SquareCloudManager:
             
             app = await client.app(app_id)
             await app.delete()
+            self.cache.invalidate(api_key or self.api_key)
             logger.info(f"🗑️ Aplicação {app_id} deletada")
             return True
             
@@ -148,6 +392,7 @@ class SquareCloudManager:
             logger.error(f"❌ Erro ao deletar aplicação: {e}")
             return False
     
+    @instrument("squarecloud_get_app_logs", failed=request_failed, api=True)
     async def get_app_logs(self, api_key: str, app_id: str) -> Optional[str]:
         """Obtém logs de uma aplicação"""
         try:
@@ -162,6 +407,7 @@ class SquareCloudManager:
             logger.error(f"❌ Erro ao obter logs da aplicação: {e}")
             return None
     
+    @instrument("squarecloud_create_backup", failed=request_failed, api=True)
     async def create_backup(self, api_key: str, app_id: str) -> Optional[Dict]:
         """Cria backup de uma aplicação"""
         try:
@@ -170,6 +416,7 @@ class SquareCloudManager:
                 return None
             
             backup_info = await client.backup(app_id)
+            self.cache.invalidate(api_key or self.api_key, app_id)
             logger.info(f"📦 Backup criado para aplicação {app_id}")
             return backup_info
         except Exception as e:
@@ -177,19 +424,26 @@ class SquareCloudManager:
             return None
     
     async def list_backups(self, api_key: str, app_id: str) -> List[Dict]:
-        """Lista backups de uma aplicação"""
+        """Lista backups de uma aplicação (em cache)"""
         try:
             client = self.get_client(api_key)
             if not client:
                 return []
             
-            backups = await client.all_app_backups(app_id=app_id)
+            @instrument("squarecloud_list_backups", failed=request_failed, api=True)
+            async def fetch():
+                return await client.all_app_backups(app_id=app_id)
+
+            backups = await self.cache.get_or_fetch(
+                "backups", api_key or self.api_key, app_id, fetch
+            )
             logger.info(f"📦 {len(backups)} backups encontrados para aplicação {app_id}")
             return backups
         except Exception as e:
             logger.error(f"Erro ao listar backups: {e}")
             return []
     
+    @instrument("squarecloud_download_backup", failed=request_failed, api=True)
     async def download_backup(self, api_key: str, backup_id: str, app_id: str) -> Optional[bytes]:
         """Download de um backup específico"""
         try:
@@ -204,7 +458,8 @@ class SquareCloudManager:
             logger.error(f"Erro ao baixar backup: {e}")
             return None
     
-    async def upload_app(self, api_key: str, file_path: str, app_name: str = None) -> Optional[str]:
+    @instrument("squarecloud_restore_app", failed=request_failed, api=True)
+    async def restore_app(self, api_key: str, file_path: str, app_name: str = None) -> Optional[str]:
         """Upload de uma aplicação (para restore de backup)"""
         try:
             client = self.get_client(api_key)
@@ -216,6 +471,7 @@ class SquareCloudManager:
                 app_name = os.path.splitext(os.path.basename(file_path))[0]
             
             app_info = await client.upload_app(file_path, app_name)
+            self.cache.invalidate(api_key or self.api_key)
             app_id = app_info.get("id")
             
             if app_id:
@@ -229,6 +485,7 @@ class SquareCloudManager:
             logger.error(f"Erro ao fazer upload da aplicação: {e}")
             return None
 
+    @instrument("squarecloud_set_domain", failed=request_failed, api=True)
     async def set_domain(self, api_key: str, app_id: str, domain: str) -> bool:
         """Configura um domínio personalizado para uma aplicação"""
         try:
@@ -237,12 +494,14 @@ class SquareCloudManager:
                 return False
             
             await client.set_domain(app_id, domain)
+            self.cache.invalidate(api_key or self.api_key, app_id)
             logger.info(f"🌐 Domínio configurado: {domain} para aplicação {app_id}")
             return True
         except Exception as e:
             logger.error(f"Erro ao configurar domínio: {e}")
             return False
     
+    @instrument("squarecloud_remove_domain", failed=request_failed, api=True)
     async def remove_domain(self, api_key: str, app_id: str, domain: str) -> bool:
         """Remove um domínio personalizado de uma aplicação"""
         try:
@@ -251,6 +510,7 @@ class SquareCloudManager:
                 return False
             
             await client.remove_domain(app_id, domain)
+            self.cache.invalidate(api_key or self.api_key, app_id)
             logger.info(f"🗑️ Domínio removido: {domain} da aplicação {app_id}")
             return True
         except Exception as e:
@@ -258,13 +518,19 @@ class SquareCloudManager:
             return False
     
     async def list_domains(self, api_key: str, app_id: str) -> List[Dict]:
-        """Lista domínios de uma aplicação"""
+        """Lista domínios de uma aplicação (em cache)"""
         try:
             client = self.get_client(api_key)
             if not client:
                 return []
             
-            domains = await client.domains(app_id)
+            @instrument("squarecloud_list_domains", failed=request_failed, api=True)
+            async def fetch():
+                return await client.domains(app_id)
+
+            domains = await self.cache.get_or_fetch(
+                "domains", api_key or self.api_key, app_id, fetch
+            )
             logger.info(f"🌐 {len(domains)} domínios encontrados para aplicação {app_id}")
             return domains
         except Exception as e:
@@ -277,3 +543,10 @@ squarecloud_manager = None
 def setup(api_key: str):
     global squarecloud_manager
     squarecloud_manager = SquareCloudManager(api_key)
+
+def get_manager() -> SquareCloudManager:
+    """Obtém o gerenciador compartilhado (criado com a chave do YAML se ainda não existir)"""
+    global squarecloud_manager
+    if squarecloud_manager is None:
+        squarecloud_manager = SquareCloudManager()
+    return squarecloud_manager
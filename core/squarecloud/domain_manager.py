@@ -1,34 +1,24 @@
-import json
-import os
 import asyncio
 import discord
 from datetime import datetime
 from typing import Dict, List, Optional
 from core.logs.logger import logger
-from core.squarecloud.client import SquareCloudManager
+from core.squarecloud.client import get_manager
+from core.storage import get_repository
 
 class DomainManager:
     def __init__(self):
         self.domain_data_file = "data/domains.json"
         self.domain_data: Dict = {}
-        self.squarecloud_manager = SquareCloudManager()
+        self.repository = get_repository("domains", self.domain_data_file)
+        self.squarecloud_manager = get_manager()
         self.load_domain_data()
     
     def load_domain_data(self):
-        """Carrega dados de domínios do arquivo JSON"""
+        """Carrega dados de domínios do repositório"""
         try:
-            if os.path.exists(self.domain_data_file):
-                with open(self.domain_data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Verificar se é uma lista (formato antigo) e converter para dicionário
-                    if isinstance(data, list):
-                        logger.warning("Formato antigo de domains.json detectado (lista). Convertendo para dicionário...")
-                        self.domain_data = {}
-                        # Se havia dados na lista, tentar preservar (mas geralmente lista vazia)
-                        if data:
-                            logger.warning("Dados na lista serão perdidos na conversão")
-                    else:
-                        self.domain_data = data
+            if self.repository.exists():
+                self.domain_data = self.repository.load_all()
                 logger.info(f"🌐 {len(self.domain_data)} registros de domínios carregados")
             else:
                 self.save_domain_data()
@@ -37,11 +27,9 @@ class DomainManager:
             self.domain_data = {}
     
     def save_domain_data(self):
-        """Salva dados de domínios no arquivo JSON"""
+        """Salva todos os dados de domínios no repositório"""
         try:
-            os.makedirs(os.path.dirname(self.domain_data_file), exist_ok=True)
-            with open(self.domain_data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.domain_data, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.domain_data)
         except Exception as e:
             logger.error(f"Erro ao salvar dados de domínios: {e}")
     
@@ -73,7 +61,7 @@ class DomainManager:
             # Adicionar ao registro
             domain_id = f"{app_id}_{domain}"
             self.domain_data[domain_id] = domain_record
-            self.save_domain_data()
+            self.repository.put(domain_id, domain_record)
             
             logger.info(f"✅ Domínio configurado: {domain} para aplicação {app_id}")
             return True
@@ -97,7 +85,7 @@ class DomainManager:
             domain_id = f"{app_id}_{domain}"
             if domain_id in self.domain_data:
                 del self.domain_data[domain_id]
-                self.save_domain_data()
+                self.repository.delete(domain_id)
                 logger.info(f"✅ Domínio removido do registro: {domain}")
             
             logger.info(f"✅ Domínio removido: {domain} da aplicação {app_id}")
@@ -184,7 +172,7 @@ class DomainManager:
             domain_id = f"{app_id}_{domain}"
             if domain_id in self.domain_data:
                 del self.domain_data[domain_id]
-                self.save_domain_data()
+                self.repository.delete(domain_id)
                 logger.info(f"🗑️ Registro de domínio removido: {domain_id}")
                 return True
             return False
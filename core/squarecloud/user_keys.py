@@ -1,29 +1,19 @@
-import json
-import os
 from typing import Optional, Dict
 from core.logs.logger import logger
+from core.storage import get_repository
 
 class UserKeysManager:
     def __init__(self):
         self.keys_file = "data/user_keys.json"
+        self.repository = get_repository("user_keys", self.keys_file)
         self.user_keys: Dict[str, str] = {}
         self.load_keys()
     
     def load_keys(self):
-        """Carrega chaves dos usuários do arquivo JSON"""
+        """Carrega chaves dos usuários do repositório"""
         try:
-            if os.path.exists(self.keys_file):
-                with open(self.keys_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Verificar se é uma lista (formato antigo) e converter para dicionário
-                    if isinstance(data, list):
-                        logger.warning("Formato antigo de user_keys.json detectado (lista). Convertendo para dicionário...")
-                        self.user_keys = {}
-                        # Se havia dados na lista, tentar preservar (mas geralmente lista vazia)
-                        if data:
-                            logger.warning("Dados na lista serão perdidos na conversão")
-                    else:
-                        self.user_keys = data
+            if self.repository.exists():
+                self.user_keys = self.repository.load_all()
                 logger.info(f"{len(self.user_keys)} chaves de usuários carregadas")
             else:
                 self.save_keys()
@@ -32,11 +22,9 @@ class UserKeysManager:
             self.user_keys = {}
     
     def save_keys(self):
-        """Salva chaves dos usuários no arquivo JSON"""
+        """Salva todas as chaves dos usuários no repositório"""
         try:
-            os.makedirs(os.path.dirname(self.keys_file), exist_ok=True)
-            with open(self.keys_file, 'w', encoding='utf-8') as f:
-                json.dump(self.user_keys, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.user_keys)
         except Exception as e:
             logger.error(f"Erro ao salvar chaves dos usuários: {e}")
     
@@ -52,8 +40,13 @@ class UserKeysManager:
                 return False
             
             self.user_keys[str(user_id)] = api_key.strip()
-            self.save_keys()
+            self.repository.put(user_id, self.user_keys[str(user_id)])
             logger.info(f"Chave da API configurada para usuário {user_id}")
+            
+            # Pagamentos confirmados que aguardavam a chave voltam para a fila de deploy
+            from core.payments.deploy_manager import deploy_manager
+            if deploy_manager:
+                deploy_manager.enqueue_user_payments(user_id)
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar chave da API: {e}")
@@ -65,7 +58,7 @@ class UserKeysManager:
             user_id_str = str(user_id)
             if user_id_str in self.user_keys:
                 del self.user_keys[user_id_str]
-                self.save_keys()
+                self.repository.delete(user_id_str)
                 logger.info(f"Chave da API removida para usuário {user_id}")
                 return True
             return False
@@ -0,0 +1,24 @@
+# Armazenamento do HyperDeploy (JSON, journal ou SQLite)
+from .repository import (
+    Repository,
+    JsonRepository,
+    SQLiteDatabase,
+    SQLiteRepository,
+    get_backend,
+    get_database,
+    get_repository,
+    transaction,
+)
+from .journal import JournalRepository
+
+__all__ = [
+    'Repository',
+    'JsonRepository',
+    'JournalRepository',
+    'SQLiteDatabase',
+    'SQLiteRepository',
+    'get_backend',
+    'get_database',
+    'get_repository',
+    'transaction',
+]
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from core.logs.logger import logger
+from core.utils.metrics import LatencyHistogram, metrics
+
+# Executor dedicado para disco: não disputa threads com o executor padrão do loop
+io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hyperdeploy-io")
+
+# Tempo das operações de disco executadas fora do loop (segundos)
+io_latency = LatencyHistogram()
+
+# Gravações dos repositórios por destino (arquivo JSON, journal ou banco SQLite)
+storage_write_seconds = metrics.histogram("storage_write_duration_seconds", "Duração das gravações de dados", ("target",))
+storage_write_errors = metrics.counter("storage_write_errors_total", "Gravações de dados que falharam", ("target",))
+
+# Gravações agrupadas: chave -> função mais recente ainda não executada
+_pending_writes: Dict[str, Callable[[], None]] = {}
+_write_tasks: Dict[str, asyncio.Task] = {}
+coalesced_writes = 0
+
+
+def _timed(func: Callable, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        io_latency.observe(time.perf_counter() - start)
+
+
+async def run_io(func: Callable, *args):
+    """Executa uma operação bloqueante de disco no executor dedicado"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, _timed, func, *args)
+
+
+def _timed_write(key: str, func: Callable[[], None]):
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception:
+        storage_write_errors.inc(target=key)
+        raise
+    finally:
+        storage_write_seconds.observe(time.perf_counter() - start, target=key)
+
+
+def submit_write(key: str, func: Callable[[], None]):
+    """Agenda uma gravação; gravações pendentes com a mesma chave são substituídas"""
+    global coalesced_writes
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Fora do loop (inicialização, scripts): grava na hora
+        _timed(_timed_write, key, func)
+        return
+
+    if key in _pending_writes:
+        coalesced_writes += 1
+    _pending_writes[key] = func
+    if key not in _write_tasks:
+        _write_tasks[key] = loop.create_task(_write_worker(key))
+
+
+async def _write_worker(key: str):
+    """Executa as gravações de uma chave em ordem, sempre a versão mais recente"""
+    try:
+        while key in _pending_writes:
+            func = _pending_writes.pop(key)
+            try:
+                await run_io(_timed_write, key, func)
+            except Exception as e:
+                logger.error(f"Erro na gravação assíncrona de {key}: {e}")
+    finally:
+        _write_tasks.pop(key, None)
+
+
+async def drain_writes():
+    """Aguarda todas as gravações agendadas"""
+    while _write_tasks:
+        await asyncio.gather(*list(_write_tasks.values()), return_exceptions=True)
+
+
+def flush_writes_sync():
+    """Executa na hora as gravações pendentes (encerramento sem loop ativo)"""
+    while _pending_writes:
+        key, func = _pending_writes.popitem()
+        try:
+            _timed(_timed_write, key, func)
+        except Exception as e:
+            logger.error(f"Erro na gravação de {key}: {e}")
+
+
+def pending_write_count() -> int:
+    return len(_pending_writes) + len(_write_tasks)
+
+
+def _scan_dir(path: str, suffix: Optional[str]) -> List[Tuple[str, str, int, float, float]]:
+    if not os.path.isdir(path):
+        return []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_file() or (suffix and not entry.name.endswith(suffix)):
+                continue
+            stat = entry.stat()
+            files.append((entry.name, entry.path, stat.st_size, stat.st_mtime, stat.st_ctime))
+    return files
+
+
+async def scan_dir(path: str, suffix: str = None) -> List[Tuple[str, str, int, float, float]]:
+    """Lista os arquivos de uma pasta: (nome, caminho, tamanho, mtime, ctime)"""
+    return await run_io(_scan_dir, path, suffix)
+
+
+def _remove_files(paths: List[str]) -> Tuple[int, int]:
+    removed = 0
+    removed_bytes = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+            removed_bytes += size
+        except FileNotFoundError:
+            continue
+    return removed, removed_bytes
+
+
+async def remove_files(paths: List[str]) -> Tuple[int, int]:
+    """Remove arquivos fora do loop, retornando (quantidade, bytes liberados)"""
+    if not paths:
+        return 0, 0
+    return await run_io(_remove_files, paths)
+
+
+def get_io_statistics() -> Dict:
+    """Estatísticas da camada de I/O assíncrona"""
+    return {
+        "latency": io_latency.snapshot(),
+        "pending_writes": pending_write_count(),
+        "coalesced_writes": coalesced_writes,
+    }
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from core.logs.logger import logger
+from core.storage.async_io import remove_files, run_io, scan_dir
+from core.storage.repository import get_repository
+
+# Status em que o pagamento não precisa mais do arquivo de deploy
+# (deploys que falham não são refeitos: o arquivo fica só a carência da coleta)
+RELEASE_STATUSES = ("deployed", "expired", "cancelled", "failed")
+
+
+def _commit_file(temp_path: str, blob_path: str) -> bool:
+    """Move o arquivo temporário para o blob; se o conteúdo já existe, descarta a cópia"""
+    if os.path.exists(blob_path):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, blob_path)
+    return True
+
+
+class BlobStore:
+    """Uploads endereçados pelo SHA-256 do conteúdo, com contagem de referências"""
+
+    def __init__(
+        self, root: str = "uploads/blobs", data_file: str = "data/blobs.json",
+        grace_hours: float = 1
+    ):
+        self.root = root
+        self.data_file = data_file
+        # Blobs sem referências ficam esse tempo antes de serem removidos
+        self.grace_seconds = grace_hours * 3600
+        self.repository = get_repository("blobs", self.data_file)
+        self.blobs: Dict[str, Dict] = {}
+        # Gravação de blobs e coleta não se intercalam
+        # (o arquivo existente pode estar sendo removido)
+        self.lock = asyncio.Lock()
+
+        # Métricas
+        self.dedup_hits = 0
+        self.bytes_saved = 0
+
+        os.makedirs(self.root, exist_ok=True)
+        self.load_blobs()
+
+    def load_blobs(self):
+        try:
+            if self.repository.exists():
+                self.blobs = self.repository.load_all()
+                for sha256, blob in self.blobs.items():
+                    if not blob["refs"]:
+                        self.schedule_collection(sha256)
+                logger.info(f"📦 {len(self.blobs)} blobs de upload carregados")
+        except Exception as e:
+            logger.error(f"Erro ao carregar blobs: {e}")
+            self.blobs = {}
+
+    def save_blob(self, sha256: str):
+        """Persiste apenas o blob alterado"""
+        try:
+            blob = self.blobs.get(sha256)
+            if blob is None:
+                self.repository.delete(sha256)
+            else:
+                self.repository.put(sha256, blob)
+        except Exception as e:
+            logger.error(f"Erro ao salvar blob {sha256[:12]}: {e}")
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, f"{sha256}.zip")
+
+    def schedule_collection(self, sha256: str):
+        """Agenda a remoção do blob para o fim da carência"""
+        from core.utils.deadlines import deadline_scheduler
+        blob = self.blobs.get(sha256)
+        if deadline_scheduler is None or not blob:
+            return
+        deadline_scheduler.schedule(
+            f"blob:{sha256}",
+            (blob.get("released_at") or 0) + self.grace_seconds,
+            lambda: self.collect_blob(sha256)
+        )
+
+    def cancel_collection(self, sha256: str):
+        from core.utils.deadlines import deadline_scheduler
+        if deadline_scheduler:
+            deadline_scheduler.cancel(f"blob:{sha256}")
+
+    def get_blob(self, sha256: str) -> Optional[Dict]:
+        return self.blobs.get(sha256)
+
+    async def commit(self, temp_path: str, sha256: str, size: int) -> str:
+        """Guarda um arquivo já baixado (e com hash calculado); retorna o caminho do blob"""
+        blob_path = self.path_for(sha256)
+        async with self.lock:
+            created = await run_io(_commit_file, temp_path, blob_path)
+            blob = self.blobs.get(sha256)
+            if blob is None:
+                blob = self._new_blob(sha256, blob_path, size)
+            elif not blob["refs"]:
+                # Reaproveitado sem referências: a carência recomeça antes do acquire
+                blob["released_at"] = time.time()
+                self.save_blob(sha256)
+                self.schedule_collection(sha256)
+        if not created:
+            self.dedup_hits += 1
+            self.bytes_saved += size
+            logger.info(
+                f"♻️ Upload duplicado reaproveitado: {sha256[:12]} ({size / (1024 * 1024):.2f} MB)"
+            )
+        return blob_path
+
+    def _new_blob(self, sha256: str, blob_path: str, size: int) -> Dict:
+        blob = {
+            "sha256": sha256,
+            "path": blob_path,
+            "size": size,
+            "refs": [],
+            "created_at": datetime.now().isoformat(),
+            # Sem referências ainda: o prazo de carência conta a partir daqui
+            "released_at": time.time(),
+        }
+        self.blobs[sha256] = blob
+        self.save_blob(sha256)
+        self.schedule_collection(sha256)
+        return blob
+
+    def acquire(self, sha256: str, ref: str) -> bool:
+        """Registra uma referência (ex.: payment:<id>, ticket:<canal>) ao blob"""
+        blob = self.blobs.get(sha256)
+        if not blob:
+            return False
+        if ref not in blob["refs"]:
+            blob["refs"].append(ref)
+            blob["released_at"] = None
+            self.save_blob(sha256)
+            self.cancel_collection(sha256)
+        return True
+
+    def release(self, sha256: str, ref: str) -> bool:
+        blob = self.blobs.get(sha256)
+        if not blob or ref not in blob["refs"]:
+            return False
+        blob["refs"].remove(ref)
+        if not blob["refs"]:
+            blob["released_at"] = time.time()
+            self.schedule_collection(sha256)
+        self.save_blob(sha256)
+        return True
+
+    def release_ref(self, ref: str) -> int:
+        """Remove a referência de todos os blobs que a possuem"""
+        return sum(
+            1 for sha256 in [sha256 for sha256, blob in self.blobs.items() if ref in blob["refs"]]
+            if self.release(sha256, ref)
+        )
+
+    def on_payment_status_changed(self, payment: Dict, old_status: Optional[str]):
+        """Libera o arquivo quando o pagamento termina (e o retém de novo se voltar a valer)"""
+        from core.payments.manager import get_deploy_files
+        ref = f"payment:{payment['id']}"
+        for deploy_file in get_deploy_files(payment):
+            sha256 = deploy_file.get("sha256")
+            if not sha256:
+                continue
+            if payment.get("status") in RELEASE_STATUSES:
+                self.release(sha256, ref)
+            else:
+                self.acquire(sha256, ref)
+
+    async def collect_blob(self, sha256: str) -> bool:
+        """Remove um blob cuja carência terminou (se continuar sem referências)"""
+        async with self.lock:
+            blob = self.blobs.get(sha256)
+            if not blob or blob["refs"]:
+                return False
+            if (blob.get("released_at") or 0) + self.grace_seconds > time.time():
+                return False
+            self.blobs.pop(sha256)
+            self.save_blob(sha256)
+            removed, _ = await remove_files([blob["path"]])
+        logger.debug(f"Blob sem referência removido: {sha256[:12]}")
+        return bool(removed)
+
+    async def collect_garbage(self) -> Tuple[int, int]:
+        """Remove blobs sem referências após a carência; retorna (quantidade, bytes)"""
+        async with self.lock:
+            cutoff = time.time() - self.grace_seconds
+            unreferenced = [
+                sha256 for sha256, blob in self.blobs.items()
+                if not blob["refs"] and (blob.get("released_at") or 0) < cutoff
+            ]
+            # Registros saem antes dos arquivos:
+            # nenhuma nova referência aponta para um blob removido
+            paths = []
+            for sha256 in unreferenced:
+                paths.append(self.blobs.pop(sha256)["path"])
+                self.save_blob(sha256)
+
+            # Arquivos sem registro (queda entre o rename e o registro)
+            known = {blob["path"] for blob in self.blobs.values()}
+            paths += [
+                file_path for _, file_path, _, mtime, _ in await scan_dir(self.root)
+                if file_path not in known and file_path not in paths and mtime < cutoff
+            ]
+            return await remove_files(paths)
+
+    def get_statistics(self) -> Dict:
+        return {
+            "blobs": len(self.blobs),
+            "bytes": sum(blob.get("size", 0) for blob in self.blobs.values()),
+            "referenced": sum(1 for blob in self.blobs.values() if blob["refs"]),
+            "dedup_hits": self.dedup_hits,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+# Instância global
+blob_store = None
+
+
+def setup():
+    global blob_store
+    blob_store = BlobStore()
+    from core.payments.manager import payment_manager
+    if payment_manager:
+        payment_manager.add_status_listener(blob_store.on_payment_status_changed)
+        # Pagamentos que terminaram antes (ex.: deploys com falha) ainda podem reter arquivos
+        for status in RELEASE_STATUSES:
+            for payment in payment_manager.get_payments_by_status(status):
+                blob_store.on_payment_status_changed(payment, status)
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from core.logs.logger import logger
+from core.storage.async_io import submit_write
+from core.storage.repository import (
+    Repository,
+    coerce_collection,
+    defer_flush,
+    encode_record,
+    render_collection,
+    write_text_atomic,
+)
+
+
+class JournalRepository(Repository):
+    """Coleção append-only: snapshot JSON + journal JSONL de mutações"""
+
+    def __init__(
+        self,
+        name: str,
+        snapshot_file: str,
+        journal_file: str,
+        compact_every: int = 1000,
+        fsync_interval: float = 1.0
+    ):
+        super().__init__(name)
+        self.data: Dict[str, Any] = {}
+        # Registros já serializados para o snapshot (atualizados a cada mutação)
+        self.encoded: Dict[str, str] = {}
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self.fsync_interval = fsync_interval
+        self.journal_entries = 0
+        self.pending_entries: List[str] = []
+        self.pending_lock = threading.Lock()
+        self.compact_requested = False
+        self.journal_handle = None
+        self.sync_scheduled = False
+        self.sync_due = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_file) or os.path.exists(self.journal_file)
+
+    def load_all(self) -> Dict[str, Any]:
+        """Carrega o snapshot e reaplica as mutações do journal"""
+        records = self._load_snapshot()
+
+        replayed = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Linha truncada por uma queda no meio da escrita
+                        logger.warning(f"Entrada inválida no journal de {self.name} (linha {line_number}) ignorada")
+                        continue
+                    self._apply(records, entry)
+                    replayed += 1
+
+        if replayed:
+            logger.info(f"📒 {replayed} mutações reaplicadas do journal de {self.name}")
+
+        # Consolidar tudo em um novo snapshot e começar um journal vazio
+        self.data = records
+        self.encoded = {key: encode_record(value) for key, value in records.items()}
+        self.compact()
+        return dict(records)
+
+    def _load_snapshot(self) -> Dict[str, Any]:
+        if not os.path.exists(self.snapshot_file):
+            return {}
+
+        with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+            return coerce_collection(self.name, json.load(f))
+
+    @staticmethod
+    def _apply(records: Dict[str, Any], entry: Dict):
+        key = entry.get("id")
+        if not key:
+            return
+        if entry.get("op") == "delete":
+            records.pop(key, None)
+        else:
+            # "payment" era o campo usado pelo journal original de pagamentos
+            records[key] = entry.get("value", entry.get("payment", {}))
+
+    def save_all(self, data: Dict):
+        self.data = {str(key): value for key, value in data.items()}
+        with self.pending_lock:
+            self.encoded = {key: encode_record(value) for key, value in self.data.items()}
+            self.pending_entries = []
+            self.compact_requested = True
+        self.flush()
+
+    def get(self, key) -> Optional[Any]:
+        return self.data.get(str(key))
+
+    def put(self, key, value: Any):
+        self.data[str(key)] = value
+        self.append(str(key), value)
+
+    def delete(self, key):
+        if self.data.pop(str(key), None) is not None:
+            self.append(str(key), None)
+
+    def append(self, key: str, value: Optional[Any]):
+        """Registra a versão atual de um registro (None remove o registro)"""
+        if value is None:
+            entry = {"op": "delete", "id": key}
+        else:
+            entry = {"op": "put", "id": key, "value": value}
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+        with self.pending_lock:
+            if value is None:
+                self.encoded.pop(key, None)
+            else:
+                self.encoded[key] = encode_record(value)
+            self.pending_entries.append(line)
+        self.flush()
+
+    def flush(self):
+        """Agenda a escrita das entradas pendentes (de uma vez só ao fim de uma transação)"""
+        if defer_flush(self):
+            return
+        submit_write(self.journal_file, self._drain)
+        self._schedule_sync()
+
+    def _drain(self):
+        """Escreve as entradas pendentes no journal, compactando quando necessário"""
+        with self.pending_lock:
+            entries, self.pending_entries = self.pending_entries, []
+            snapshot = None
+            if self.compact_requested or self.journal_entries + len(entries) >= self.compact_every:
+                # O snapshot já contém o efeito das entradas: elas não precisam ir ao journal
+                snapshot = self.encoded.copy()
+                self.compact_requested = False
+
+        if snapshot is not None:
+            self._write_snapshot(snapshot)
+        elif entries:
+            handle = self._get_handle()
+            handle.write("\n".join(entries) + "\n")
+            handle.flush()
+            self.journal_entries += len(entries)
+
+        if self.sync_due:
+            self.sync()
+
+    def compact(self):
+        """Grava um snapshot completo de forma atômica e esvazia o journal"""
+        with self.pending_lock:
+            self.pending_entries = []
+            snapshot = self.encoded.copy()
+            self.compact_requested = False
+        self._write_snapshot(snapshot)
+
+    def _write_snapshot(self, snapshot: Dict[str, str]):
+        write_text_atomic(self.snapshot_file, render_collection(snapshot), fsync=True)
+
+        # Só depois do snapshot estar no disco o journal pode ser descartado
+        self.close()
+        with open(self.journal_file, 'w', encoding='utf-8'):
+            pass
+        self.journal_entries = 0
+
+    def sync(self):
+        """Força a gravação do journal no disco"""
+        self.sync_due = False
+        try:
+            if self.journal_handle:
+                self.journal_handle.flush()
+                os.fsync(self.journal_handle.fileno())
+        except Exception as e:
+            logger.error(f"Erro ao sincronizar journal de {self.name}: {e}")
+
+    def close(self):
+        if self.journal_handle:
+            self.sync()
+            self.journal_handle.close()
+            self.journal_handle = None
+
+    def _get_handle(self):
+        if not self.journal_handle:
+            os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+            self.journal_handle = open(self.journal_file, 'a', encoding='utf-8')
+        return self.journal_handle
+
+    def _schedule_sync(self):
+        """Agrupa os fsyncs: no máximo um a cada fsync_interval segundos"""
+        if self.sync_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.sync()
+            return
+        self.sync_scheduled = True
+        loop.call_later(self.fsync_interval, self._request_sync)
+
+    def _request_sync(self):
+        self.sync_scheduled = False
+        self.sync_due = True
+        submit_write(self.journal_file, self._drain)
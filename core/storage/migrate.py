@@ -0,0 +1,62 @@
+import argparse
+from core.logs.logger import logger
+from core.storage.journal import JournalRepository
+from core.storage.repository import (
+    DEFAULT_SQLITE_PATH,
+    JsonRepository,
+    SQLiteDatabase,
+    SQLiteRepository,
+)
+
+# Coleções migradas: nome -> (arquivo JSON, journal opcional)
+COLLECTIONS = {
+    "payments": ("data/payments.json", "data/payments.journal.jsonl"),
+    "tickets": ("data/tickets.json", None),
+    "ticket_counter": ("data/ticket_counter.json", None),
+    "user_keys": ("data/user_keys.json", None),
+    "backups": ("data/backups.json", None),
+    "domains": ("data/domains.json", None),
+    "admin_config": ("data/admin_config.json", None),
+    "log_channels": ("data/log_channels.json", None),
+    "blobs": ("data/blobs.json", None),
+    "automation": ("data/automation.json", None),
+    "blacklist": ("data/blacklist.json", None),
+    "whitelist": ("data/whitelist.json", None),
+}
+
+
+def migrate(sqlite_path: str = DEFAULT_SQLITE_PATH) -> dict:
+    """Copia todas as coleções de data/*.json para o banco SQLite"""
+    database = SQLiteDatabase(sqlite_path)
+    migrated = {}
+    try:
+        with database.transaction():
+            for name, (json_file, journal_file) in COLLECTIONS.items():
+                if journal_file:
+                    source = JournalRepository(name, json_file, journal_file)
+                else:
+                    source = JsonRepository(name, json_file)
+                if not source.exists():
+                    continue
+                data = source.load_all()
+                SQLiteRepository(name, database).save_all(data)
+                migrated[name] = len(data)
+                logger.info(f"🗄️ {name}: {len(data)} registros migrados")
+    finally:
+        database.close()
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra os arquivos data/*.json para SQLite")
+    parser.add_argument("--sqlite-path", default=DEFAULT_SQLITE_PATH, help="Caminho do banco SQLite")
+    args = parser.parse_args()
+
+    migrated = migrate(args.sqlite_path)
+    total = sum(migrated.values())
+    print(f"✅ {total} registros migrados em {len(migrated)} coleções para {args.sqlite_path}")
+    print("Defina `storage.backend: sqlite` no config/bot.yaml para usar o novo banco.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+from core.storage.repository import DEFAULT_SQLITE_PATH, SQLiteDatabase
+
+
+def payment_summary(database: SQLiteDatabase):
+    """Quantidade e valor total dos pagamentos por status (agregado no SQLite)"""
+    return database.execute(
+        "SELECT status, COUNT(*), COALESCE(SUM(json_extract(data, '$.amount')), 0) "
+        "FROM records WHERE collection = 'payments' GROUP BY status ORDER BY status"
+    )
+
+
+def collection_sizes(database: SQLiteDatabase):
+    return database.execute(
+        "SELECT collection, COUNT(*) FROM records GROUP BY collection ORDER BY collection"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório a partir de uma réplica somente leitura")
+    parser.add_argument("--sqlite-path", default=DEFAULT_SQLITE_PATH, help="Caminho do banco SQLite")
+    args = parser.parse_args()
+
+    # Conexão somente leitura: não bloqueia o bot e não carrega as coleções em memória
+    database = SQLiteDatabase(args.sqlite_path, readonly=True)
+    try:
+        print("📦 Coleções")
+        for collection, count in collection_sizes(database):
+            print(f"  {collection}: {count}")
+        print("💰 Pagamentos por status")
+        for status, count, amount in payment_summary(database):
+            print(f"  {status}: {count} (R$ {amount:.2f})")
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
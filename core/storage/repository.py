@@ -0,0 +1,472 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import yaml
+from core.logs.logger import logger
+from core.storage.async_io import submit_write
+
+DEFAULT_SQLITE_PATH = "data/hyperdeploy.db"
+
+
+class Repository(abc.ABC):
+    """Interface comum de persistência de uma coleção chave -> registro"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abc.abstractmethod
+    def exists(self) -> bool:
+        """Indica se a coleção já foi persistida alguma vez"""
+
+    @abc.abstractmethod
+    def load_all(self) -> Dict[str, Any]:
+        """Lê todos os registros da coleção"""
+
+    @abc.abstractmethod
+    def save_all(self, data: Dict):
+        """Substitui todos os registros da coleção"""
+
+    @abc.abstractmethod
+    def get(self, key) -> Optional[Any]:
+        """Lê um registro (None se não existir)"""
+
+    @abc.abstractmethod
+    def put(self, key, value: Any):
+        """Insere ou atualiza um registro"""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Remove um registro"""
+
+    def find(self, status: str = None, user_id=None) -> List[Any]:
+        """Busca registros pelos campos indexados (status e user_id)"""
+        return [
+            value for value in self.load_all().values()
+            if isinstance(value, dict)
+            and (status is None or value.get("status") == status)
+            and (user_id is None or str(value.get("user_id")) == str(user_id))
+        ]
+
+
+def coerce_collection(name: str, data: Any) -> Dict:
+    """Converte o formato antigo (lista) das coleções JSON para dicionário"""
+    if isinstance(data, list):
+        logger.warning(f"Formato antigo de {name}.json detectado (lista). Convertendo para dicionário...")
+        # Se havia dados na lista, tentar preservar (mas geralmente lista vazia)
+        if data:
+            logger.warning("Dados na lista serão perdidos na conversão")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def encode_record(value: Any) -> str:
+    """Serializa um registro já com a indentação que terá dentro da coleção"""
+    return json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+
+
+def render_collection(encoded: Dict[str, str]) -> str:
+    """Monta o JSON da coleção a partir dos registros já serializados"""
+    if not encoded:
+        return "{}"
+    body = ",\n".join(
+        f"  {json.dumps(key, ensure_ascii=False)}: {value}" for key, value in encoded.items()
+    )
+    return "{\n" + body + "\n}"
+
+
+def write_text_atomic(path: str, text: str, fsync: bool = False):
+    """Grava um arquivo via arquivo temporário + rename"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+
+# Transações: as gravações de todos os backends são adiadas até o fim do bloco
+_transaction_depth = 0
+_dirty_repositories: List[Repository] = []
+
+
+def defer_flush(repository: Repository) -> bool:
+    """Adia a gravação do repositório se houver uma transação em andamento"""
+    if not _transaction_depth:
+        return False
+    if repository not in _dirty_repositories:
+        _dirty_repositories.append(repository)
+    return True
+
+
+class JsonRepository(Repository):
+    """Coleção persistida como um único arquivo JSON"""
+
+    def __init__(self, name: str, path: str):
+        super().__init__(name)
+        self.path = path
+        self.data: Dict[str, Any] = {}
+        # Registros já serializados: cada mutação serializa só o próprio registro
+        self.encoded: Dict[str, str] = {}
+        self.loaded_stat: Optional[tuple] = None
+        self.write_pending = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load_all(self) -> Dict[str, Any]:
+        # Sem mudanças no arquivo (ou com gravação nossa pendente) a memória já está atualizada
+        if self.write_pending or (self.loaded_stat and self.loaded_stat == self._stat()):
+            return dict(self.data)
+        if not self.exists():
+            self.data = {}
+            self.encoded = {}
+            return {}
+        stat = self._stat()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.data = coerce_collection(self.name, json.load(f))
+        self.encoded = {key: encode_record(value) for key, value in self.data.items()}
+        self.loaded_stat = stat
+        return dict(self.data)
+
+    def save_all(self, data: Dict):
+        self.data = {str(key): value for key, value in data.items()}
+        self.encoded = {key: encode_record(value) for key, value in self.data.items()}
+        self.flush()
+
+    def get(self, key) -> Optional[Any]:
+        return self.data.get(str(key))
+
+    def put(self, key, value: Any):
+        self.data[str(key)] = value
+        self.encoded[str(key)] = encode_record(value)
+        self.flush()
+
+    def delete(self, key):
+        if self.data.pop(str(key), None) is not None:
+            self.encoded.pop(str(key), None)
+            self.flush()
+
+    def flush(self):
+        """Agenda a gravação do arquivo (ou adia até o fim da transação em andamento)"""
+        if defer_flush(self):
+            return
+        self.write_pending = True
+        submit_write(self.path, self._write)
+
+    def _write(self):
+        # dict.copy() é atômico sob o GIL: snapshot consistente mesmo fora do loop
+        self.write_pending = False
+        write_text_atomic(self.path, render_collection(self.encoded.copy()))
+        self.loaded_stat = self._stat()
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+class SQLiteDatabase:
+    """Conexão SQLite compartilhada (modo WAL) entre todas as coleções"""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self.lock = threading.RLock()
+        self.transaction_depth = 0
+        # Mutações ainda não gravadas: (coleção, chave) -> linha (None remove)
+        self.pending_lock = threading.Lock()
+        self.pending_rows: Dict[tuple, Optional[tuple]] = {}
+        self.pending_replace: Dict[str, List[tuple]] = {}
+        # Mutações retiradas da fila pela gravação em andamento (ainda não confirmadas no banco)
+        self.committing_rows: Dict[tuple, Optional[tuple]] = {}
+        self.committing_replace: Dict[str, List[tuple]] = {}
+        # Enquanto houver um storage.transaction() aberto nada é gravado
+        self.held = 0
+
+        if readonly:
+            # Réplica de leitura: outro processo pode ler enquanto o bot escreve (WAL)
+            self.connection = sqlite3.connect(
+                f"file:{path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None
+            )
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                collection TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                status TEXT,
+                user_id TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (collection, key)
+            ) WITHOUT ROWID
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_records_status ON records (collection, status)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_records_user ON records (collection, user_id)"
+        )
+
+    def execute(self, sql: str, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def stage(self, collection: str, key: str, row: Optional[tuple]):
+        """Registra a versão mais recente de um registro para a próxima gravação"""
+        with self.pending_lock:
+            self.pending_rows[(collection, key)] = row
+
+    def stage_replace(self, collection: str, rows: List[tuple]):
+        """Registra a substituição completa de uma coleção"""
+        with self.pending_lock:
+            for pending_key in [k for k in self.pending_rows if k[0] == collection]:
+                del self.pending_rows[pending_key]
+            self.pending_replace[collection] = rows
+
+    def schedule_commit(self):
+        submit_write(f"sqlite:{self.path}", self.commit_pending)
+
+    def read(self, collection: str, key: str = None, status: str = None, user_id: str = None) -> Dict[str, str]:
+        """
+        Registros (chave -> JSON) da coleção que atendem aos filtros: o que está no banco
+        com as mutações ainda não gravadas por cima. Nenhuma gravação acontece na leitura.
+        """
+        def matches(row_key: str, row: tuple) -> bool:
+            return (
+                (key is None or row_key == key)
+                and (status is None or row[1] == status)
+                and (user_id is None or row[2] == user_id)
+            )
+
+        sql = "SELECT key, data, status, user_id FROM records WHERE collection = ?"
+        params = [collection]
+        for column, value in (("key", key), ("status", status), ("user_id", user_id)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                params.append(value)
+
+        # Sob o lock do banco nenhuma gravação está no meio: cada mutação está no banco ou em uma das camadas
+        with self.lock:
+            records = {row_key: data for row_key, data, _, _ in self.connection.execute(sql, params)}
+            with self.pending_lock:
+                layers = [
+                    (replace.get(collection), [(k[1], row) for k, row in rows.items() if k[0] == collection])
+                    for replace, rows in (
+                        (self.committing_replace, self.committing_rows),
+                        (self.pending_replace, self.pending_rows),
+                    )
+                ]
+
+        for replace, changes in layers:
+            if replace is not None:
+                records = {row_key: row[0] for row_key, row in replace if matches(row_key, row)}
+            for row_key, row in changes:
+                if row is not None and matches(row_key, row):
+                    records[row_key] = row[0]
+                else:
+                    records.pop(row_key, None)
+        return records
+
+    def commit_pending(self):
+        """Grava todas as mutações pendentes em uma única transação"""
+        if self.held:
+            return
+        with self.pending_lock:
+            rows, self.pending_rows = self.pending_rows, {}
+            replace, self.pending_replace = self.pending_replace, {}
+            self.committing_rows, self.committing_replace = rows, replace
+        if not rows and not replace:
+            return
+
+        now = time.time()
+        with self.lock:
+            try:
+                self._write_rows(rows, replace, now)
+            finally:
+                with self.pending_lock:
+                    self.committing_rows, self.committing_replace = {}, {}
+
+    def _write_rows(self, rows: Dict[tuple, Optional[tuple]], replace: Dict[str, List[tuple]], now: float):
+        with self.transaction():
+            for collection, collection_rows in replace.items():
+                self.connection.execute("DELETE FROM records WHERE collection = ?", (collection,))
+                self.connection.executemany(
+                    "INSERT INTO records (collection, key, data, status, user_id, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(collection, key, *row, now) for key, row in collection_rows]
+                )
+            for (collection, key), row in rows.items():
+                if row is None:
+                    self.connection.execute(
+                        "DELETE FROM records WHERE collection = ? AND key = ?", (collection, key)
+                    )
+                else:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO records "
+                        "(collection, key, data, status, user_id, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (collection, key, *row, now)
+                    )
+
+    def executemany(self, sql: str, rows):
+        with self.lock:
+            self.connection.executemany(sql, rows)
+
+    @contextmanager
+    def transaction(self):
+        """Transação (aninhável) envolvendo qualquer número de coleções"""
+        with self.lock:
+            if self.transaction_depth == 0:
+                self.connection.execute("BEGIN IMMEDIATE")
+            self.transaction_depth += 1
+            try:
+                yield
+            except BaseException:
+                self.transaction_depth -= 1
+                if self.transaction_depth == 0:
+                    self.connection.execute("ROLLBACK")
+                raise
+            else:
+                self.transaction_depth -= 1
+                if self.transaction_depth == 0:
+                    self.connection.execute("COMMIT")
+
+    def close(self):
+        if not self.readonly:
+            self.commit_pending()
+        with self.lock:
+            self.connection.close()
+
+
+class SQLiteRepository(Repository):
+    """Coleção persistida na tabela `records` de um banco SQLite"""
+
+    def __init__(self, name: str, database: SQLiteDatabase):
+        super().__init__(name)
+        self.database = database
+
+    @staticmethod
+    def _row(value: Any):
+        status = user_id = None
+        if isinstance(value, dict):
+            status = value.get("status")
+            if value.get("user_id") is not None:
+                user_id = str(value.get("user_id"))
+        return json.dumps(value, ensure_ascii=False), status, user_id
+
+    def exists(self) -> bool:
+        return bool(self.database.read(self.name))
+
+    def load_all(self) -> Dict[str, Any]:
+        return {key: json.loads(data) for key, data in self.database.read(self.name).items()}
+
+    def save_all(self, data: Dict):
+        self.database.stage_replace(
+            self.name, [(str(key), self._row(value)) for key, value in data.items()]
+        )
+        self.flush()
+
+    def get(self, key) -> Optional[Any]:
+        data = self.database.read(self.name, key=str(key)).get(str(key))
+        return json.loads(data) if data is not None else None
+
+    def put(self, key, value: Any):
+        self.database.stage(self.name, str(key), self._row(value))
+        self.flush()
+
+    def delete(self, key):
+        self.database.stage(self.name, str(key), None)
+        self.flush()
+
+    def find(self, status: str = None, user_id=None) -> List[Any]:
+        records = self.database.read(self.name, status=status, user_id=str(user_id) if user_id is not None else None)
+        return [json.loads(data) for data in records.values()]
+
+    def flush(self):
+        """Agenda a gravação das mutações (ou adia até o fim da transação em andamento)"""
+        if defer_flush(self):
+            return
+        self.database.schedule_commit()
+
+
+# Configuração e instâncias compartilhadas
+_storage_config: Optional[Dict] = None
+_databases: Dict[str, SQLiteDatabase] = {}
+
+
+def load_storage_config() -> Dict:
+    """Lê a seção `storage` do config/bot.yaml (backend json por padrão)"""
+    global _storage_config
+    if _storage_config is None:
+        _storage_config = {}
+        try:
+            if os.path.exists('config/bot.yaml'):
+                with open('config/bot.yaml', 'r', encoding='utf-8') as f:
+                    _storage_config = (yaml.safe_load(f) or {}).get("storage") or {}
+        except Exception as e:
+            logger.error(f"Erro ao carregar configuração de armazenamento: {e}")
+    return _storage_config
+
+
+def get_backend() -> str:
+    return str(load_storage_config().get("backend", "json")).lower()
+
+
+def get_database(path: str = None) -> SQLiteDatabase:
+    """Obtém (ou abre) o banco SQLite compartilhado"""
+    path = path or load_storage_config().get("sqlite_path", DEFAULT_SQLITE_PATH)
+    if path not in _databases:
+        _databases[path] = SQLiteDatabase(path)
+        logger.info(f"🗄️ Banco SQLite aberto: {path}")
+    return _databases[path]
+
+
+def get_repository(name: str, json_file: str, journal_file: str = None) -> Repository:
+    """Cria o repositório de uma coleção conforme o backend configurado"""
+    if get_backend() == "sqlite":
+        return SQLiteRepository(name, get_database())
+    if journal_file:
+        from core.storage.journal import JournalRepository
+        return JournalRepository(name, json_file, journal_file)
+    return JsonRepository(name, json_file)
+
+
+@contextmanager
+def transaction():
+    """Agrupa mutações de várias coleções: são gravadas juntas ao fim do bloco"""
+    global _transaction_depth
+    database = get_database() if get_backend() == "sqlite" else None
+    _transaction_depth += 1
+    if database:
+        database.held += 1
+    try:
+        yield
+    finally:
+        _transaction_depth -= 1
+        if database:
+            database.held -= 1
+        if _transaction_depth == 0:
+            dirty = list(_dirty_repositories)
+            _dirty_repositories.clear()
+            for repository in dirty:
+                repository.flush()
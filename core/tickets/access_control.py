@@ -0,0 +1,201 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional, Set
+from core.logs.logger import logger
+from core.storage import get_repository
+
+# Intervalo entre verificações de mudança nos arquivos das listas (segundos)
+RELOAD_INTERVAL = 5
+
+# Prefixos das chaves das listas: "user:<id>", "guild:<id>", "sha256:<hash>"
+KEY_PREFIXES = ("user", "guild", "sha256")
+
+
+def parse_key(key: str) -> Optional[tuple]:
+    """Converte uma chave da lista em (tipo, valor); números sem prefixo são IDs de usuário"""
+    key = str(key).strip()
+    kind, _, value = key.partition(":")
+    if not value:
+        kind, value = "user", kind
+    if kind not in KEY_PREFIXES or not value:
+        return None
+    if kind == "sha256":
+        return kind, value.lower()
+    try:
+        return kind, int(value)
+    except ValueError:
+        return None
+
+
+class AccessControl:
+    """Blacklist/whitelist em conjuntos em memória: checagem O(1) antes de qualquer I/O"""
+
+    def __init__(self):
+        self.blacklist_repository = get_repository("blacklist", "data/blacklist.json")
+        self.whitelist_repository = get_repository("whitelist", "data/whitelist.json")
+        self.blacklist: Dict[str, Dict] = {}
+        self.whitelist: Dict[str, Dict] = {}
+
+        # Conjuntos usados nos caminhos quentes (reconstruídos a cada recarga)
+        self.blocked_users: Set[int] = set()
+        self.blocked_guilds: Set[int] = set()
+        self.blocked_hashes: Set[str] = set()
+        self.allowed_users: Set[int] = set()
+        self.allowed_guilds: Set[int] = set()
+        self.allowed_hashes: Set[str] = set()
+
+        # Assinatura (mtime, tamanho) dos arquivos na última carga
+        self.signatures: Dict[str, Optional[tuple]] = {}
+        self.reloads = 0
+        # Rejeições por ponto de entrada (upload, ticket, painel...)
+        self.rejections: Dict[str, int] = {}
+        self.load()
+
+    @staticmethod
+    def load_list(repository) -> Dict:
+        return repository.load_all() if repository.exists() else {}
+
+    def load(self):
+        try:
+            self.blacklist = self.load_list(self.blacklist_repository)
+            self.whitelist = self.load_list(self.whitelist_repository)
+            self.signatures = self.current_signatures()
+            self.rebuild()
+        except Exception as e:
+            logger.error(f"Erro ao carregar blacklist/whitelist: {e}")
+
+    def rebuild(self):
+        """Monta os conjuntos de checagem a partir das listas"""
+        blocked = {kind: set() for kind in KEY_PREFIXES}
+        allowed = {kind: set() for kind in KEY_PREFIXES}
+        for entries, target in ((self.blacklist, blocked), (self.whitelist, allowed)):
+            for key in entries:
+                parsed = parse_key(key)
+                if parsed:
+                    target[parsed[0]].add(parsed[1])
+                else:
+                    logger.warning(f"Chave inválida ignorada nas listas de acesso: {key}")
+        self.blocked_users = blocked["user"]
+        self.blocked_guilds = blocked["guild"]
+        self.blocked_hashes = blocked["sha256"]
+        self.allowed_users = allowed["user"]
+        self.allowed_guilds = allowed["guild"]
+        self.allowed_hashes = allowed["sha256"]
+
+    def current_signatures(self) -> Dict[str, Optional[tuple]]:
+        """mtime e tamanho dos arquivos JSON (outros backends não têm arquivo para observar)"""
+        signatures = {}
+        for repository in (self.blacklist_repository, self.whitelist_repository):
+            path = getattr(repository, "path", None)
+            if not path:
+                continue
+            try:
+                stat = os.stat(path)
+                signatures[path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signatures[path] = None
+        return signatures
+
+    def reload_if_changed(self) -> bool:
+        """Recarrega as listas se algum arquivo mudou (edição manual, outro processo)"""
+        signatures = self.current_signatures()
+        if signatures == self.signatures:
+            return False
+        previous = (self.blacklist, self.whitelist)
+        self.load()
+        # Gravações feitas pelo próprio bot também mudam o arquivo
+        if (self.blacklist, self.whitelist) == previous:
+            return False
+        self.reloads += 1
+        logger.info(
+            "🔄 Listas de acesso recarregadas "
+            f"({len(self.blacklist)} bloqueios, {len(self.whitelist)} liberações)"
+        )
+        return True
+
+    # Checagens (apenas consultas em conjuntos, sem I/O)
+
+    def check(
+        self, user_id: int = None, guild_id: int = None, sha256: str = None, surface: str = None
+    ) -> Optional[str]:
+        """
+        Retorna a chave que bloqueia o acesso (ou None se liberado).
+        Bloqueio explícito do usuário sempre vale; usuário liberado ignora bloqueios
+        de servidor e de arquivo.
+        :param surface: ponto de entrada (upload, ticket...) contabilizado nas rejeições
+        """
+        blocked_by = None
+        if user_id is not None and user_id in self.blocked_users:
+            blocked_by = f"user:{user_id}"
+        elif user_id is not None and user_id in self.allowed_users:
+            return None
+        elif guild_id is not None and guild_id in self.blocked_guilds:
+            blocked_by = f"guild:{guild_id}"
+        elif sha256 and sha256.lower() in self.blocked_hashes:
+            blocked_by = f"sha256:{sha256.lower()}"
+
+        if blocked_by and surface:
+            self.rejections[surface] = self.rejections.get(surface, 0) + 1
+            logger.warning(f"🚫 Acesso negado ({surface}): {blocked_by}")
+        return blocked_by
+
+    def is_whitelisted(self, user_id: int = None, guild_id: int = None, sha256: str = None) -> bool:
+        return (
+            (user_id is not None and user_id in self.allowed_users)
+            or (guild_id is not None and guild_id in self.allowed_guilds)
+            or bool(sha256 and sha256.lower() in self.allowed_hashes)
+        )
+
+    # Alterações (painel/automação)
+
+    def add_to_blacklist(self, key: str, reason: str, details: Dict = None):
+        self.blacklist[key] = {
+            "reason": reason, "added_at": datetime.now().isoformat(), **(details or {})
+        }
+        self.blacklist_repository.put(key, self.blacklist[key])
+        self.rebuild()
+        logger.warning(f"🚫 Adicionado à blacklist: {key} ({reason})")
+
+    def remove_from_blacklist(self, key: str) -> bool:
+        if self.blacklist.pop(key, None) is None:
+            return False
+        self.blacklist_repository.delete(key)
+        self.rebuild()
+        return True
+
+    def add_to_whitelist(self, key: str, reason: str):
+        self.whitelist[key] = {"reason": reason, "added_at": datetime.now().isoformat()}
+        self.whitelist_repository.put(key, self.whitelist[key])
+        self.rebuild()
+
+    def remove_from_whitelist(self, key: str) -> bool:
+        if self.whitelist.pop(key, None) is None:
+            return False
+        self.whitelist_repository.delete(key)
+        self.rebuild()
+        return True
+
+    def get_statistics(self) -> Dict:
+        return {
+            "blacklist": len(self.blacklist),
+            "whitelist": len(self.whitelist),
+            "blocked_users": len(self.blocked_users),
+            "blocked_guilds": len(self.blocked_guilds),
+            "blocked_hashes": len(self.blocked_hashes),
+            "rejections": dict(self.rejections),
+            "total_rejections": sum(self.rejections.values()),
+            "reloads": self.reloads,
+        }
+
+
+# Instância global
+access_control = None
+
+
+def setup():
+    global access_control
+    access_control = AccessControl()
+    logger.info(
+        f"🛡️ Controle de acesso ativo ({len(access_control.blacklist)} bloqueios, "
+        f"{len(access_control.whitelist)} liberações)"
+    )
@@ -0,0 +1,272 @@
+import hashlib
+import heapq
+import io
+import posixpath
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from core.logs.logger import logger
+from core.payments.repack import DEFAULT_IGNORE, PROTECTED_FILES, is_ignored
+from core.storage import get_repository
+from core.utils.metrics import LatencyHistogram
+
+# Tamanho dos sketches MinHash (bottom-k): erro de estimativa ~ 1/sqrt(k)
+SKETCH_SIZE = 128
+
+# Arquivos de código lidos para o sketch de conteúdo
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".mjs", ".cjs", ".ts", ".jsx", ".tsx", ".java", ".kt", ".go", ".rs",
+    ".rb", ".php", ".cs", ".lua", ".c", ".cpp", ".h", ".ex", ".exs", ".dart",
+}
+
+# Limites de leitura por arquivo e por ZIP (o fingerprint deve custar milissegundos)
+MAX_SOURCE_FILE_BYTES = 256 * 1024
+MAX_SOURCE_TOTAL_BYTES = 4 * 1024 * 1024
+
+# Arquivos minúsculos (ex.: __init__.py vazio) são iguais em quase todo projeto
+MIN_FILE_SIZE = 64
+# Sketches com poucos elementos não dizem nada (projetos triviais parecem todos iguais)
+MIN_SKETCH_ELEMENTS = 8
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def fingerprint_zip(zip_path: str, sketch_size: int = SKETCH_SIZE) -> Dict:
+    """
+    Fingerprint do projeto (roda em um processo separado):
+    - files: bottom-k dos (CRC32, tamanho) de cada arquivo, direto do diretório central
+      (sem descompactar)
+    - source: bottom-k dos pares de linhas normalizadas dos arquivos de código, lidos em streaming
+    """
+    file_hashes: Set[int] = set()
+    shingles: Set[int] = set()
+    source_bytes = 0
+
+    with zipfile.ZipFile(zip_path) as archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename not in PROTECTED_FILES
+            and not is_ignored(info.filename, DEFAULT_IGNORE)
+        ]
+        for info in entries:
+            if info.file_size >= MIN_FILE_SIZE:
+                file_hashes.add(_hash64(f"{info.CRC}:{info.file_size}".encode()))
+
+        sources = [
+            info for info in entries
+            if posixpath.splitext(info.filename)[1].lower() in SOURCE_EXTENSIONS
+        ]
+        # Menores primeiro: mais arquivos cobertos dentro do limite total
+        for info in sorted(sources, key=lambda info: info.file_size):
+            if source_bytes >= MAX_SOURCE_TOTAL_BYTES:
+                break
+            limit = min(MAX_SOURCE_FILE_BYTES, MAX_SOURCE_TOTAL_BYTES - source_bytes)
+            previous = None
+            with archive.open(info) as raw:
+                reader = io.TextIOWrapper(raw, encoding="utf-8", errors="ignore")
+                read = 0
+                for line in reader:
+                    read += len(line)
+                    if read > limit:
+                        break
+                    # Ignora indentação e espaços: reformatar o código não esconde a cópia
+                    normalized = " ".join(line.split())
+                    if len(normalized) < 4:
+                        continue
+                    if previous is not None:
+                        shingles.add(_hash64(f"{previous}\n{normalized}".encode()))
+                    previous = normalized
+                source_bytes += min(read, limit)
+
+    return {
+        "files": heapq.nsmallest(sketch_size, file_hashes),
+        "source": heapq.nsmallest(sketch_size, shingles),
+        "file_count": len(entries),
+        "source_bytes": source_bytes,
+    }
+
+
+def estimate_similarity(
+    a: List[int], b: List[int], sketch_size: int = SKETCH_SIZE
+) -> Optional[float]:
+    """Jaccard estimado a partir de dois sketches bottom-k (None se forem pequenos demais)"""
+    if len(a) < MIN_SKETCH_ELEMENTS or len(b) < MIN_SKETCH_ELEMENTS:
+        return None
+    set_a, set_b = set(a), set(b)
+    union = heapq.nsmallest(sketch_size, set_a | set_b)
+    shared = sum(1 for value in union if value in set_a and value in set_b)
+    return shared / len(union)
+
+
+class CopycatDetector:
+    """Detecta uploads muito parecidos com projetos enviados por outros usuários"""
+
+    def __init__(self):
+        self.automation_file = "data/automation.json"
+        self.repository = get_repository("automation", self.automation_file)
+        self.config: Dict = {}
+        self.load()
+
+        # sha256 -> fingerprint (LRU limitado a cache_size)
+        self.fingerprints: "OrderedDict[str, Dict]" = OrderedDict()
+        # (dimensão, valor do sketch) -> sha256 dos projetos que o contêm
+        self.index: Dict[Tuple[str, int], Set[str]] = {}
+
+        # Métricas
+        self.checks = 0
+        self.flagged = 0
+        self.blocked = 0
+        self.fingerprint_time = LatencyHistogram()
+
+    def load(self):
+        try:
+            self.config = self.repository.load_all() if self.repository.exists() else {}
+        except Exception as e:
+            logger.error(f"Erro ao carregar configurações de automação: {e}")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get("enabled")) and bool(self.config.get("copycat_detection"))
+
+    @property
+    def threshold(self) -> float:
+        return float(self.config.get("threshold", 90))
+
+    @property
+    def cache_size(self) -> int:
+        return max(1, int(self.config.get("cache_size", 1000)))
+
+    # Cache de fingerprints
+
+    def remember(self, sha256: str, fingerprint: Dict):
+        if sha256 in self.fingerprints:
+            self.fingerprints.move_to_end(sha256)
+            return
+        self.fingerprints[sha256] = fingerprint
+        for dimension in ("files", "source"):
+            for value in fingerprint[dimension]:
+                self.index.setdefault((dimension, value), set()).add(sha256)
+        while len(self.fingerprints) > self.cache_size:
+            self.forget(next(iter(self.fingerprints)))
+
+    def forget(self, sha256: str):
+        fingerprint = self.fingerprints.pop(sha256, None)
+        if not fingerprint:
+            return
+        for dimension in ("files", "source"):
+            for value in fingerprint[dimension]:
+                holders = self.index.get((dimension, value))
+                if holders:
+                    holders.discard(sha256)
+                    if not holders:
+                        del self.index[(dimension, value)]
+
+    def find_best_match(self, sha256: str, fingerprint: Dict, user_id: int) -> Optional[Dict]:
+        """
+        Projeto de outro usuário mais parecido
+        (só compara candidatos que compartilham valores do sketch)
+        """
+        # Similaridade >= threshold exige compartilhar boa parte dos valores do sketch
+        min_shared = max(1, int(SKETCH_SIZE * self.threshold / 100 * 0.5))
+        best = None
+        for dimension in ("files", "source"):
+            counts: Dict[str, int] = {}
+            for value in fingerprint[dimension]:
+                for other in self.index.get((dimension, value), ()):
+                    counts[other] = counts.get(other, 0) + 1
+            for other, shared in counts.items():
+                candidate = self.fingerprints[other]
+                if candidate["user_id"] == user_id:
+                    continue
+                needed = min(min_shared, len(fingerprint[dimension]), len(candidate[dimension]))
+                if shared < needed:
+                    continue
+                similarity = estimate_similarity(fingerprint[dimension], candidate[dimension])
+                if similarity is None:
+                    continue
+                score = similarity * 100
+                if not best or score > best["score"]:
+                    best = {
+                        "score": score, "dimension": dimension,
+                        "matched_sha256": other, "matched_user_id": candidate["user_id"],
+                    }
+
+        # Conteúdo idêntico enviado por outro usuário
+        same = self.fingerprints.get(sha256)
+        if same and same["user_id"] != user_id:
+            best = {
+                "score": 100.0, "dimension": "sha256",
+                "matched_sha256": sha256, "matched_user_id": same["user_id"],
+            }
+        return best
+
+    async def check(self, file_info: Dict, user_id: int) -> Optional[Dict]:
+        """
+        Calcula o fingerprint do upload e compara com o cache.
+        :return: {"score", "matched_user_id", ..., "blocked"} se passou do threshold, senão None
+        """
+        if not self.enabled or not file_info.get("sha256"):
+            return None
+        from core.utils.workers import run_cpu
+
+        sha256 = file_info["sha256"]
+        self.checks += 1
+        start = time.perf_counter()
+        fingerprint = await run_cpu(fingerprint_zip, file_info["file_path"])
+        self.fingerprint_time.observe(time.perf_counter() - start)
+        fingerprint["user_id"] = user_id
+
+        from core.tickets.access_control import access_control
+        match = None
+        if not (access_control and access_control.is_whitelisted(user_id, sha256=sha256)):
+            match = self.find_best_match(sha256, fingerprint, user_id)
+            if match and match["score"] < self.threshold:
+                match = None
+        if not match:
+            # Só projetos sem correspondência entram no cache:
+            # uma cópia não pode "reivindicar" o original
+            self.remember(sha256, fingerprint)
+            return None
+
+        self.flagged += 1
+        match["blocked"] = False
+        logger.warning(
+            f"🕵️ Possível cópia: upload de {user_id} {match['score']:.0f}% parecido "
+            f"com projeto de {match['matched_user_id']}"
+        )
+        if self.config.get("auto_blacklist") and access_control:
+            access_control.add_to_blacklist(
+                f"sha256:{sha256}", "Cópia de projeto de outro usuário", {
+                    "user_id": user_id,
+                    "score": round(match["score"], 1),
+                    "matched_user_id": match["matched_user_id"],
+                }
+            )
+            self.blocked += 1
+            match["blocked"] = True
+        return match
+
+    def get_statistics(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "cached": len(self.fingerprints),
+            "checks": self.checks,
+            "flagged": self.flagged,
+            "blocked": self.blocked,
+            "fingerprint_time": self.fingerprint_time.snapshot(),
+        }
+
+
+# Instância global
+copycat_detector = None
+
+
+def setup():
+    global copycat_detector
+    copycat_detector = CopycatDetector()
+    if copycat_detector.enabled:
+        logger.info(f"🕵️ Detecção de cópias ativa (limite {copycat_detector.threshold:.0f}%)")
@@ -1,28 +1,30 @@
 import discord
 import asyncio
-import json
-import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from core.logs.logger import logger
+from core.storage import get_repository
 import threading
 
 class TicketManager:
     def __init__(self, bot):
         self.bot = bot
         self.active_tickets: Dict[int, Dict] = {}
+        # Canais de tickets abertos -> dono (filtro rápido do on_message)
+        self.ticket_channels: Dict[int, int] = {}
         self.tickets_file = "data/tickets.json"
         self.counter_file = "data/ticket_counter.json"
+        self.repository = get_repository("tickets", self.tickets_file)
+        self.counter_repository = get_repository("ticket_counter", self.counter_file)
         self.ticket_counter = self.load_ticket_counter()
         self.counter_lock = threading.Lock()
         self.load_tickets()
     
     def load_ticket_counter(self):
         try:
-            if os.path.exists(self.counter_file):
-                with open(self.counter_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return int(data.get("counter", 1))
+            if self.counter_repository.exists():
+                self.counter_repository.load_all()
+                return int(self.counter_repository.get("counter") or 1)
             else:
                 self.save_ticket_counter(1)
                 return 1
@@ -32,9 +34,7 @@ class TicketManager:
     
     def save_ticket_counter(self, value):
         try:
-            os.makedirs(os.path.dirname(self.counter_file), exist_ok=True)
-            with open(self.counter_file, 'w', encoding='utf-8') as f:
-                json.dump({"counter": value}, f, indent=2, ensure_ascii=False)
+            self.counter_repository.put("counter", value)
         except Exception as e:
             logger.error(f"Erro ao salvar ticket_counter: {e}")
     
@@ -47,37 +47,91 @@ class TicketManager:
     
     def load_tickets(self):
         try:
-            if os.path.exists(self.tickets_file):
-                with open(self.tickets_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Verificar se é uma lista (formato antigo) e converter para dicionário
-                    if isinstance(data, list):
-                        logger.warning("Formato antigo de tickets.json detectado (lista). Convertendo para dicionário...")
-                        self.active_tickets = {}
-                        # Se havia dados na lista, tentar preservar (mas geralmente lista vazia)
-                        if data:
-                            logger.warning("Dados na lista serão perdidos na conversão")
-                    else:
-                        self.active_tickets = {int(k): v for k, v in data.items()}
+            if self.repository.exists():
+                data = self.repository.load_all()
+                self.active_tickets = {int(k): v for k, v in data.items()}
+                self.rebuild_channel_index()
+                self.schedule_expiries()
                 logger.info(f"📋 {len(self.active_tickets)} tickets carregados")
             else:
                 self.save_tickets()
         except Exception as e:
             logger.error(f"Erro ao carregar tickets: {e}")
             self.active_tickets = {}
+            self.ticket_channels = {}
+    
+    def rebuild_channel_index(self):
+        self.ticket_channels = {
+            ticket["channel_id"]: user_id
+            for user_id, ticket in self.active_tickets.items()
+            if ticket.get("channel_id") and ticket.get("status") == "open"
+        }
+    
+    def get_timeout_minutes(self) -> int:
+        from core.payments.config_manager import config_manager
+        return config_manager.get_ticket_timeout_minutes() if config_manager else 30
+    
+    def schedule_expiry(self, user_id: int):
+        """Registra no agendador o fechamento do ticket ao fim do timeout"""
+        from core.utils.deadlines import deadline_scheduler
+        ticket = self.active_tickets.get(user_id)
+        if deadline_scheduler is None or not ticket:
+            return
+        created_at = ticket["created_at"]
+        deadline = datetime.fromisoformat(created_at) + timedelta(minutes=self.get_timeout_minutes())
+        deadline_scheduler.schedule(
+            f"ticket:{user_id}",
+            deadline.timestamp(),
+            lambda: self.expire_ticket(user_id, created_at)
+        )
+    
+    def schedule_expiries(self):
+        """Reconstrói os prazos a partir dos tickets persistidos"""
+        for user_id in self.active_tickets:
+            self.schedule_expiry(user_id)
+    
+    async def expire_ticket(self, user_id: int, created_at: str):
+        ticket = self.active_tickets.get(user_id)
+        # O usuário pode ter fechado e aberto outro ticket nesse meio tempo
+        if not ticket or ticket.get("created_at") != created_at:
+            return False
+        return await self.close_ticket(user_id, f"Ticket expirado ({self.get_timeout_minutes()} minutos)")
+    
+    def is_ticket_channel(self, channel_id: int) -> bool:
+        """Consulta O(1): o canal é de um ticket aberto?"""
+        return channel_id in self.ticket_channels
     
     def save_tickets(self):
         try:
-            os.makedirs(os.path.dirname(self.tickets_file), exist_ok=True)
-            with open(self.tickets_file, 'w', encoding='utf-8') as f:
-                json.dump(self.active_tickets, f, indent=2, ensure_ascii=False)
+            self.repository.save_all(self.active_tickets)
         except Exception as e:
             logger.error(f"Erro ao salvar tickets: {e}")
     
+    def save_ticket(self, user_id: int):
+        """Persiste apenas o ticket alterado"""
+        try:
+            ticket = self.active_tickets.get(user_id)
+            if ticket is None:
+                self.repository.delete(user_id)
+            else:
+                self.repository.put(user_id, ticket)
+        except Exception as e:
+            logger.error(f"Erro ao salvar ticket {user_id}: {e}")
+    
+    def get_journey_id(self, user_id: int) -> Optional[str]:
+        """Id da jornada do ticket (segue para o pagamento e o deploy)"""
+        ticket = self.active_tickets.get(user_id)
+        return ticket.get("journey_id") if ticket else None
+    
     async def create_ticket(self, user_id: int, guild_id: int, channel_id: int) -> Optional[discord.TextChannel]:
+        from core.logs.tracing import end_span, new_journey_id, start_span
+        span = None
         try:
             if user_id in self.active_tickets:
                 return None
+            from core.tickets.access_control import access_control
+            if access_control and access_control.check(user_id, guild_id, surface="ticket"):
+                return None
             guild = self.bot.get_guild(guild_id)
             if not guild:
                 logger.error(f"Guild não encontrada: {guild_id}")
@@ -89,6 +143,10 @@ class TicketManager:
                 logger.error(f"Usuário {user_id} não encontrado no servidor {guild_id}")
                 return None
             
+            # A jornada do cliente começa aqui: o id vai no ticket e depois no pagamento
+            journey_id = new_journey_id()
+            span = start_span(journey_id, "ticket", user_id=user_id)
+            
             category = discord.utils.get(guild.categories, name="Tickets")
             if not category:
                 category = await guild.create_category("Tickets")
@@ -107,6 +165,7 @@ class TicketManager:
             # Verificar se o bot tem permissões para criar canais
             if not guild.me.guild_permissions.manage_channels:
                 logger.error(f"Bot não tem permissão para gerenciar canais no servidor {guild.name}")
+                end_span(span, "error")
                 return None
             
             channel = await guild.create_text_channel(
@@ -119,6 +178,7 @@ class TicketManager:
             # Verificar se o canal foi criado corretamente
             if not channel:
                 logger.error(f"Falha ao criar canal de ticket para {user_id}")
+                end_span(span, "error")
                 return None
             
             # Verificar se as permissões foram aplicadas corretamente
@@ -138,9 +198,12 @@ class TicketManager:
                 "user_id": user_id,
                 "files": [],
                 "payment_status": "pending",
-                "ticket_number": ticket_number
+                "ticket_number": ticket_number,
+                "journey_id": journey_id
             }
-            self.save_tickets()
+            self.ticket_channels[channel.id] = user_id
+            self.save_ticket(user_id)
+            self.schedule_expiry(user_id)
             
             # Enviar mensagem inicial com instruções
             await self.send_ticket_welcome_message(channel, user_id, ticket_number)
@@ -149,9 +212,11 @@ class TicketManager:
             await self.log_ticket_created(user_id, ticket_number, channel.id)
             
             logger.info(f"Ticket criado: {ticket_name} para {user_id} (PRIVADO)")
+            end_span(span, ticket_number=ticket_number)
             return channel
         except Exception as e:
             logger.error(f"Erro ao criar ticket: {e}")
+            end_span(span, "error", error=str(e))
             await self.log_ticket_error(user_id, f"Erro ao criar ticket: {e}")
             return None
 
@@ -252,11 +317,20 @@ class TicketManager:
                 return False
             ticket_info = self.active_tickets[user_id]
             channel_id = ticket_info["channel_id"]
+            self.ticket_channels.pop(channel_id, None)
+            from core.utils.deadlines import deadline_scheduler
+            if deadline_scheduler:
+                deadline_scheduler.cancel(f"ticket:{user_id}")
             channel = self.bot.get_channel(channel_id)
             if channel:
                 await channel.delete(reason=f"Ticket fechado: {reason}")
             del self.active_tickets[user_id]
-            self.save_tickets()
+            self.save_ticket(user_id)
+            
+            # Arquivos enviados no ticket deixam de ser retidos por ele
+            from core.storage.blobs import blob_store
+            if blob_store:
+                blob_store.release_ref(f"ticket:{channel_id}")
             
             # Log de ticket fechado
             await self.log_ticket_closed(user_id, reason, ticket_info.get("ticket_number", 0))
@@ -272,12 +346,28 @@ class TicketManager:
             if user_id not in self.active_tickets:
                 return False
             self.active_tickets[user_id]["files"].append(file_info)
-            self.save_tickets()
+            self.save_ticket(user_id)
             logger.info(f"📁 Arquivo adicionado ao ticket {user_id}: {file_info.get('filename', 'N/A')}")
             return True
         except Exception as e:
             logger.error(f"Erro ao adicionar arquivo ao ticket: {e}")
             return False
+    def set_ticket_payment(self, user_id: int, payment_id: str, filenames: List[str]):
+        """Vincula o pagamento ao ticket e aos arquivos cobrados por ele"""
+        try:
+            ticket = self.active_tickets.get(user_id)
+            if not ticket:
+                return False
+            ticket["payment_id"] = payment_id
+            ticket.setdefault("payments", []).append(payment_id)
+            for file_info in ticket["files"]:
+                if file_info.get("filename") in filenames:
+                    file_info["payment_id"] = payment_id
+            self.save_ticket(user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao vincular pagamento ao ticket: {e}")
+            return False
     def get_ticket_info(self, user_id: int) -> Optional[Dict]:
         return self.active_tickets.get(user_id)
     
@@ -327,29 +417,6 @@ class TicketManager:
             ticket for ticket in self.active_tickets.values()
             if ticket.get("payment_status") == payment_status
         ]
-    
-    async def cleanup_expired_tickets(self):
-        """Limpa tickets expirados"""
-        try:
-            # Obter timeout configurado do config_manager
-            from core.payments.config_manager import config_manager
-            timeout_minutes = config_manager.get_ticket_timeout_minutes() if config_manager else 30
-            current_time = datetime.now()
-            expired_tickets = []
-            
-            for user_id, ticket_info in self.active_tickets.items():
-                created_at = datetime.fromisoformat(ticket_info["created_at"])
-                if current_time - created_at > timedelta(minutes=timeout_minutes):
-                    expired_tickets.append(user_id)
-            
-            for user_id in expired_tickets:
-                await self.close_ticket(user_id, f"Ticket expirado ({timeout_minutes} minutos)")
-                
-            if expired_tickets:
-                logger.info(f"🧹 {len(expired_tickets)} tickets expirados removidos")
-                
-        except Exception as e:
-            logger.error(f"Erro ao limpar tickets expirados: {e}")
 
     # Métodos de Log
     async def log_ticket_created(self, user_id: int, ticket_number: int, channel_id: int):
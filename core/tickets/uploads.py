@@ -1,21 +1,38 @@
 import discord
 import os
 import aiofiles
+import aiohttp
 import asyncio
+import hashlib
 from datetime import datetime
+from contextlib import asynccontextmanager
 from typing import Dict, Optional, List
 from core.logs.logger import logger
-import qrcode
-from core.payments.mercadopago import criar_cobranca_pix
+from core.logs.tracing import end_span, start_span
+from core.utils.metrics import discord_send_errors, discord_send_seconds, instrument
+from core.payments.mercadopago import MERCADOPAGO_API_URL, criar_pagamento_pix
 import yaml
 from datetime import datetime, timedelta
 from core.payments.config_manager import config_manager
 
+# Tamanho dos blocos do download: memória por upload constante, independente do arquivo
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Downloads simultâneos de anexos (somando todos os tickets)
+MAX_PARALLEL_DOWNLOADS = 3
+# Anexos considerados por mensagem (o Discord permite até 10)
+MAX_ATTACHMENTS_PER_UPLOAD = 10
+
 class UploadManager:
     def __init__(self, bot):
         self.bot = bot
         self.uploads_dir = "uploads"
         self.allowed_extensions = ['.zip']
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        # Pipeline por ticket: canal -> lock e quantos uploads usam/esperam o lock
+        self.channel_locks: Dict[int, asyncio.Lock] = {}
+        self.channel_waiting: Dict[int, int] = {}
+        self.download_semaphore = asyncio.Semaphore(MAX_PARALLEL_DOWNLOADS)
         self.ensure_uploads_dir()
         
         # Carregar access_token do Mercado Pago
@@ -23,9 +40,21 @@ class UploadManager:
             with open('config/bot.yaml', 'r', encoding='utf-8') as f:
                 bot_config = yaml.safe_load(f)
                 self.mercadopago_token = bot_config.get('mercadopago_access_token')
+                self.mercadopago_api_url = bot_config.get('mercadopago_api_url') or MERCADOPAGO_API_URL
         except Exception as e:
             logger.error(f"Erro ao carregar access_token Mercado Pago: {e}")
             self.mercadopago_token = None
+            self.mercadopago_api_url = MERCADOPAGO_API_URL
+        
+        # Validação do ZIP (seção validation do squarecloud.yaml)
+        try:
+            with open('config/squarecloud.yaml', 'r', encoding='utf-8') as f:
+                self.validation_config = (yaml.safe_load(f) or {}).get('validation') or {}
+        except Exception as e:
+            logger.error(f"Erro ao carregar configurações de validação: {e}")
+            self.validation_config = {}
+        from core.utils.workers import DEFAULT_MAX_WORKERS, configure as configure_workers
+        configure_workers(self.validation_config.get('workers', DEFAULT_MAX_WORKERS))
     
     def get_max_file_size(self):
         """Obter tamanho máximo dinâmico da configuração"""
@@ -39,6 +68,19 @@ class UploadManager:
             logger.error(f"Erro ao obter tamanho máximo: {e}")
             return 25 * 1024 * 1024  # 25MB padrão
     
+    def get_http_session(self) -> aiohttp.ClientSession:
+        """Sessão HTTP compartilhada para baixar anexos do CDN do Discord"""
+        if self.http_session is None or self.http_session.closed:
+            self.http_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+            )
+        return self.http_session
+    
+    async def close(self):
+        if self.http_session and not self.http_session.closed:
+            await self.http_session.close()
+        self.http_session = None
+    
     def ensure_uploads_dir(self):
         try:
             if not os.path.exists(self.uploads_dir):
@@ -47,7 +89,10 @@ class UploadManager:
         except Exception as e:
             logger.error(f"Erro ao criar diretório de uploads: {e}")
     
+    @instrument("upload", failed=lambda files: not files)
     async def process_upload(self, message: discord.Message) -> Optional[Dict]:
+        """Processa os anexos de uma mensagem (quem chama filtra as mensagens sem anexo)"""
+        span = None
         try:
             # VERIFICAÇÃO DE PERMISSÕES - Apenas o dono do ticket pode fazer upload
             from core.tickets.manager import ticket_manager
@@ -68,43 +113,128 @@ class UploadManager:
                 await self.log_unauthorized_upload(message.author.id, message.channel.id)
                 return None
             
-            if not message.attachments:
-                return None
-            attachment = message.attachments[0]
+            # Span do upload inclui a espera pela vez no canal do ticket
+            span = start_span(
+                ticket_manager.get_journey_id(message.author.id), "upload",
+                attachments=len(message.attachments)
+            )
             
+            # Uploads do mesmo ticket são processados um de cada vez: nunca dois pagamentos em paralelo
+            async with self.channel_pipeline(message.channel.id):
+                files = await self.process_batch(message)
+            end_span(span, "ok" if files else "rejected", files=len(files or []))
+            return files
+            
+        except Exception as e:
+            logger.error(f"Erro ao processar upload: {e}")
+            end_span(span, "error", error=str(e))
+            await self.log_upload_error(message.author.id, str(e))
+            return None
+
+    @asynccontextmanager
+    async def channel_pipeline(self, channel_id: int):
+        """Serializa os uploads de um canal (o lock some quando ninguém mais espera por ele)"""
+        lock = self.channel_locks.setdefault(channel_id, asyncio.Lock())
+        self.channel_waiting[channel_id] = self.channel_waiting.get(channel_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.channel_waiting[channel_id] -= 1
+            if not self.channel_waiting[channel_id]:
+                del self.channel_waiting[channel_id]
+                del self.channel_locks[channel_id]
+
+    async def process_batch(self, message: discord.Message) -> Optional[List[Dict]]:
+        """Processa todos os anexos da mensagem como um lote, com um único pagamento"""
+        max_size = self.get_max_file_size()
+        attachments = []
+        for attachment in message.attachments[:MAX_ATTACHMENTS_PER_UPLOAD]:
             # Verificar extensão
             if not self.is_valid_file(attachment.filename):
                 await self.send_invalid_file_message(message.channel)
-                return None
-                
+                continue
+            
             # Verificar tamanho
-            max_size = self.get_max_file_size()
             if attachment.size > max_size:
                 await self.send_file_too_large_message(message.channel, attachment.size)
-                return None
-            
+                continue
+            attachments.append(attachment)
+        if not attachments:
+            return None
+        
+        # Anexos processados em paralelo (downloads limitados pelo semáforo global)
+        results = await asyncio.gather(*(self.process_attachment(message, attachment) for attachment in attachments))
+        
+        # O mesmo conteúdo enviado duas vezes na mensagem é cobrado e implantado uma vez só
+        accepted = []
+        seen = set()
+        for file_info in results:
+            if file_info and file_info.get("sha256") not in seen:
+                seen.add(file_info.get("sha256"))
+                accepted.append(file_info)
+        if not accepted:
+            return None
+        
+        # Um pagamento para o lote inteiro
+        await self.process_payment_background(message, accepted)
+        return accepted
+
+    async def process_attachment(self, message: discord.Message, attachment: discord.Attachment) -> Optional[Dict]:
+        """Baixa, valida e registra no ticket um anexo do lote"""
+        from core.tickets.manager import ticket_manager
+        try:
             # Log de início do upload
             await self.log_upload_start(message.author.id, attachment.filename, attachment.size)
             
             # FEEDBACK IMEDIATO - Confirmar recebimento instantaneamente
             confirmation_message = await self.send_immediate_confirmation(message.channel, attachment)
             
-            # Processar arquivo e pagamento em paralelo para otimizar latência
-            file_task = asyncio.create_task(self.save_file_async(attachment, message.author.id))
-            payment_task = asyncio.create_task(self.prepare_payment_data(message.author.id, attachment))
-            
-            # Aguardar conclusão do salvamento do arquivo
-            file_info = await file_task
+            span = start_span(
+                ticket_manager.get_journey_id(message.author.id), "download",
+                filename=attachment.filename, size_bytes=attachment.size
+            )
+            async with self.download_semaphore:
+                file_info = await self.save_file_async(attachment, message.author.id)
+            end_span(span, "ok" if file_info else "error")
             if not file_info:
                 await confirmation_message.edit(content="❌ Erro ao salvar arquivo. Tente novamente.")
                 return None
             
+            # Validar a estrutura do ZIP antes de gerar o pagamento
+            validation = await self.validate_upload(file_info)
+            if validation and not validation["valid"]:
+                await self.send_validation_errors(confirmation_message, file_info, validation)
+                await self.log_upload_error(message.author.id, "ZIP inválido: " + "; ".join(validation["errors"]))
+                return None
+            file_info["warnings"] = validation["warnings"] if validation else []
+            
+            # Projeto bloqueado ou cópia de projeto de outro usuário
+            if await self.check_copycat(message, confirmation_message, file_info):
+                return None
+            
+            # O ticket retém o arquivo até ser fechado
+            from core.storage.blobs import blob_store
+            if blob_store and file_info.get("sha256"):
+                if not blob_store.acquire(file_info["sha256"], f"ticket:{message.channel.id}"):
+                    # Blob coletado durante a validação: o caminho não existe mais
+                    await confirmation_message.edit(
+                        content="❌ Erro ao salvar arquivo. Tente novamente."
+                    )
+                    await self.log_upload_error(
+                        message.author.id, f"Blob {file_info['sha256'][:12]} não encontrado"
+                    )
+                    return None
+            await ticket_manager.add_file_to_ticket(message.author.id, file_info)
+            
+            # Recompactação em segundo plano: o deploy só pega o arquivo pronto
+            from core.payments.repack import repack_stage
+            if repack_stage:
+                repack_stage.schedule(file_info["file_path"], file_info.get("sha256"))
+            
             # Atualizar confirmação com informações do arquivo
             await self.update_confirmation_with_file_info(confirmation_message, file_info)
             
-            # Processar pagamento em background (não bloquear)
-            asyncio.create_task(self.process_payment_background(message, file_info))
-            
             logger.info(f"Upload processado: {file_info['filename']} ({file_info['size_mb']:.2f}MB) por {message.author.id}")
             
             # Log de upload concluído
@@ -113,7 +243,7 @@ class UploadManager:
             return file_info
             
         except Exception as e:
-            logger.error(f"Erro ao processar upload: {e}")
+            logger.error(f"Erro ao processar anexo {attachment.filename}: {e}")
             await self.log_upload_error(message.author.id, str(e))
             return None
 
@@ -158,6 +288,8 @@ class UploadManager:
             embed.add_field(name="⏰ Processado", value="agora mesmo", inline=True)
             embed.add_field(name="📋 Nome Interno", value=file_info['filename'], inline=False)
             embed.add_field(name="🔍 Detalhes", value=f"Tamanho real: {file_info['size_bytes']} bytes", inline=False)
+            if file_info.get('warnings'):
+                embed.add_field(name="⚠️ Avisos", value="\n".join(f"• {w}" for w in file_info['warnings']), inline=False)
             embed.set_footer(text="HyperDeploy • Sistema de Uploads")
             
             await message.edit(embed=embed)
@@ -166,23 +298,46 @@ class UploadManager:
             logger.error(f"Erro ao atualizar confirmação: {e}")
 
     async def save_file_async(self, attachment: discord.Attachment, user_id: int) -> Optional[Dict]:
-        """Salva arquivo de forma assíncrona otimizada"""
+        """Baixa o arquivo em blocos direto para o disco (SHA-256 e tamanho calculados no caminho)"""
+        from core.storage.async_io import run_io
+        
+        temp_path = None
         try:
             # Registrar tempo de início do upload
             upload_start_time = datetime.now()
             
             filename = f"{user_id}_{upload_start_time.strftime('%Y%m%d_%H%M%S')}_{attachment.filename}"
             file_path = os.path.join(self.uploads_dir, filename)
+            # Arquivo temporário na mesma pasta: a troca final é um rename atômico
+            temp_path = f"{file_path}.part"
             
-            # Leitura assíncrona otimizada
-            file_data = await attachment.read()
-            
-            # Escrita assíncrona
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(file_data)
+            max_size = self.get_max_file_size()
+            digest = hashlib.sha256()
+            size_bytes = 0
+            
+            async with self.get_http_session().get(attachment.url) as response:
+                response.raise_for_status()
+                async with aiofiles.open(temp_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        size_bytes += len(chunk)
+                        # O tamanho informado pelo anexo não é garantido: conferir durante o download
+                        if size_bytes > max_size:
+                            raise ValueError(f"Arquivo excede o tamanho máximo ({max_size / (1024 * 1024):.0f} MB)")
+                        digest.update(chunk)
+                        await f.write(chunk)
+            
+            if attachment.size and size_bytes != attachment.size:
+                raise ValueError(f"Download incompleto: {size_bytes} de {attachment.size} bytes")
+            
+            # Conteúdo idêntico a um upload anterior é guardado uma única vez
+            from core.storage.blobs import blob_store
+            sha256 = digest.hexdigest()
+            if blob_store:
+                file_path = await blob_store.commit(temp_path, sha256, size_bytes)
+            else:
+                await run_io(os.replace, temp_path, file_path)
+            temp_path = None
             
-            # Calcular tamanho real do arquivo salvo
-            size_bytes = os.path.getsize(file_path)
             size_mb = size_bytes / (1024 * 1024)
             
             return {
@@ -190,6 +345,7 @@ class UploadManager:
                 "file_path": file_path,
                 "size_mb": size_mb,
                 "size_bytes": size_bytes,
+                "sha256": sha256,
                 "uploaded_at": upload_start_time.isoformat(),
                 "original_filename": attachment.filename,
                 "upload_duration": (datetime.now() - upload_start_time).total_seconds()
@@ -197,35 +353,105 @@ class UploadManager:
         except Exception as e:
             logger.error(f"Erro ao salvar arquivo: {e}")
             return None
+        finally:
+            # Download interrompido: não deixar o arquivo parcial para trás
+            if temp_path and os.path.exists(temp_path):
+                try:
+                    await run_io(os.remove, temp_path)
+                except Exception as e:
+                    logger.error(f"Erro ao remover arquivo temporário {temp_path}: {e}")
 
-    async def prepare_payment_data(self, user_id: int, attachment: discord.Attachment) -> Dict:
-        """Prepara dados do pagamento em paralelo"""
+    async def validate_upload(self, file_info: Dict) -> Optional[Dict]:
+        """Verifica a estrutura do ZIP em um processo separado (None se a validação não pôde rodar)"""
+        if not self.validation_config.get('check_file_structure', True):
+            return None
+        
+        from core.storage.blobs import blob_store
+        from core.tickets.validation import DEFAULT_LIMITS, validate_zip
+        from core.utils.workers import run_cpu
+        
+        # Mesmo conteúdo já validado antes (upload repetido)
+        sha256 = file_info.get("sha256")
+        blob = blob_store.get_blob(sha256) if blob_store and sha256 else None
+        if blob and blob.get("validation"):
+            return blob["validation"]
+        
+        limits = {key: self.validation_config[key] for key in DEFAULT_LIMITS if key in self.validation_config}
         try:
-            # Obter valor do deploy da configuração
-            valor = config_manager.get_fresh_deploy_price() if config_manager else 10.00
-            
-            # Fallback para valor zero ou inválido
-            if not valor or valor <= 0:
-                valor = 10.00
-                logger.warning(f"⚠️ Valor inválido detectado, usando valor padrão: R$ {valor:.2f}")
-            
-            return {
-                "user_id": user_id,
-                "valor": valor,
-                "descricao": f"Deploy HyperDeploy - {attachment.filename}",
-                "filename": attachment.filename
-            }
+            result = await run_cpu(validate_zip, file_info["file_path"], limits)
         except Exception as e:
-            logger.error(f"Erro ao preparar dados do pagamento: {e}")
-            return {
-                "user_id": user_id,
-                "valor": 10.00,
-                "descricao": f"Deploy HyperDeploy - {attachment.filename}",
-                "filename": attachment.filename
-            }
+            # Falha da validação em si não deve impedir o deploy
+            logger.error(f"Erro ao validar ZIP {file_info['filename']}: {e}")
+            return None
+        
+        if blob:
+            blob["validation"] = result
+            blob_store.save_blob(sha256)
+        if not result["valid"]:
+            logger.info(f"ZIP rejeitado na validação: {file_info['filename']} ({len(result['errors'])} erros)")
+        return result
 
-    async def process_payment_background(self, message: discord.Message, file_info: Dict):
-        """Processa pagamento em background para não bloquear o upload"""
+    async def send_validation_errors(self, message: discord.Message, file_info: Dict, validation: Dict):
+        """Mostra ao usuário por que o ZIP foi rejeitado (nenhum pagamento é gerado)"""
+        try:
+            embed = discord.Embed(
+                title="❌ Arquivo Inválido",
+                description=f"**Arquivo:** {file_info['original_filename']}\nCorrija os problemas abaixo e envie o ZIP novamente.",
+                color=0xff0000,
+                timestamp=datetime.now()
+            )
+            embed.add_field(name="🚫 Problemas", value="\n".join(f"• {e}" for e in validation["errors"][:10])[:1024], inline=False)
+            if validation["warnings"]:
+                embed.add_field(name="⚠️ Avisos", value="\n".join(f"• {w}" for w in validation["warnings"])[:1024], inline=False)
+            embed.add_field(
+                name="🔧 Requisitos do ZIP",
+                value="• `squarecloud.app` ou `squarecloud.config` na raiz\n• Arquivo principal (MAIN) incluído no ZIP",
+                inline=False
+            )
+            embed.set_footer(text="HyperDeploy • Sistema de Uploads")
+            await message.edit(embed=embed)
+        except Exception as e:
+            logger.error(f"Erro ao enviar erros de validação: {e}")
+
+    async def check_copycat(self, message: discord.Message, confirmation_message: discord.Message, file_info: Dict) -> bool:
+        """Retorna True se o upload foi bloqueado (blacklist ou cópia com blacklist automática)"""
+        from core.tickets.access_control import access_control
+        from core.tickets.copycat import copycat_detector
+        user_id = message.author.id
+        try:
+            # Só agora o hash é conhecido: arquivo já bloqueado não gera pagamento
+            blocked_by = access_control.check(user_id, sha256=file_info.get("sha256"), surface="upload") if access_control else None
+            if not blocked_by and copycat_detector:
+                match = await copycat_detector.check(file_info, user_id)
+                if match:
+                    file_info["copycat"] = match
+                    await self.log_copycat(user_id, file_info, match)
+                    if match["blocked"]:
+                        blocked_by = f"sha256:{file_info['sha256']}"
+            if blocked_by:
+                await confirmation_message.delete()
+                await self.send_blocked_upload_message(message.channel)
+                await self.log_upload_error(user_id, f"Upload bloqueado ({blocked_by})")
+                return True
+        except Exception as e:
+            # A detecção não deve impedir uploads legítimos
+            logger.error(f"Erro na detecção de cópias: {e}")
+        return False
+
+    async def send_blocked_upload_message(self, channel: discord.TextChannel):
+        embed = discord.Embed(
+            title="🚫 Upload Bloqueado",
+            description="Este upload não pode ser processado. Entre em contato com um administrador.",
+            color=0xff0000
+        )
+        embed.set_footer(text="HyperDeploy • Sistema de Uploads")
+        await channel.send(embed=embed, delete_after=15)
+
+    async def process_payment_background(self, message: discord.Message, files: List[Dict]):
+        """Gera um único pagamento para os arquivos do lote"""
+        from core.tickets.manager import ticket_manager
+        journey_id = ticket_manager.get_journey_id(message.author.id) if ticket_manager else None
+        span = start_span(journey_id, "payment", files=len(files))
         try:
             if not self.mercadopago_token:
                 raise Exception("Access token Mercado Pago não configurado.")
@@ -242,46 +468,64 @@ class UploadManager:
             if valor <= 0:
                 raise Exception(f"Valor inválido para pagamento: R$ {valor:.2f}. Configure um valor maior que zero.")
             
+            # Um deploy (aplicação) por arquivo do lote
+            valor = round(valor * len(files), 2)
+            filenames = ", ".join(file_info['filename'] for file_info in files)
+            
             # Criar pagamento no sistema
             from core.payments.manager import payment_manager
             user_id = message.author.id
-            descricao = f"Deploy HyperDeploy - {file_info['filename']}"
-            
-            # Criar pagamento
-            payment_id = payment_manager.create_payment(user_id, valor, descricao)
-            if not payment_id:
-                raise Exception("Erro ao criar pagamento no sistema.")
-            
-            # Adicionar arquivo ao pagamento
-            payment_manager.add_deploy_file(payment_id, file_info['file_path'])
+            if len(files) == 1:
+                descricao = f"Deploy HyperDeploy - {files[0]['filename']}"
+            else:
+                descricao = f"Deploy HyperDeploy - {len(files)} arquivos"
+            
+            # Criar pagamento e vincular o arquivo em uma única transação
+            from core.storage import transaction
+            with transaction():
+                payment_id = payment_manager.create_payment(user_id, valor, descricao, journey_id)
+                if not payment_id:
+                    raise Exception("Erro ao criar pagamento no sistema.")
+                
+                # Adicionar arquivos ao pagamento (o pagamento retém os blobs até o deploy)
+                from core.storage.blobs import blob_store
+                for file_info in files:
+                    payment_manager.add_deploy_file(
+                        payment_id, file_info['file_path'], file_info.get('sha256'), file_info['original_filename']
+                    )
+                    if blob_store and file_info.get('sha256'):
+                        blob_store.acquire(file_info['sha256'], f"payment:{payment_id}")
+                
+                # O ticket registra qual pagamento cobre cada arquivo enviado
+                if ticket_manager:
+                    ticket_manager.set_ticket_payment(user_id, payment_id, [file_info['filename'] for file_info in files])
             
             # Log de pagamento criado
-            await self.log_payment_created(user_id, payment_id, valor, file_info['filename'])
+            await self.log_payment_created(user_id, payment_id, valor, filenames)
             
-            # Gerar PIX
-            pix_code = criar_cobranca_pix(valor, descricao, self.mercadopago_token)
-            if not pix_code:
+            # Gerar PIX (o id do pagamento é a chave de idempotência: retentativas não duplicam a cobrança)
+            pagamento_pix = await criar_pagamento_pix(
+                valor, descricao, self.mercadopago_token,
+                idempotency_key=payment_id, base_url=self.mercadopago_api_url
+            )
+            if not pagamento_pix:
                 raise Exception("Erro ao gerar cobrança PIX Mercado Pago.")
+            pix_code = pagamento_pix["qr_code"]
             
-            # Gerar QR Code a partir do código PIX
-            qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-            qr.add_data(pix_code)
-            qr.make(fit=True)
-            img = qr.make_image(fill_color="black", back_color="white")
-            nome_arquivo = f"mp_qrcode_{message.author.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-            caminho_completo = os.path.join("qrcodes", nome_arquivo)
-            if not os.path.exists("qrcodes"):
-                os.makedirs("qrcodes")
-            img.save(caminho_completo)
+            # Guardar o id do Mercado Pago para a reconciliação automática
+            if pagamento_pix.get("provider_payment_id"):
+                payment_manager.set_provider_payment(payment_id, pagamento_pix["provider_payment_id"], pix_code)
             
-            # Enviar QR Code
-            await send_qr_code(message.channel, user_id, payment_id, valor, file_info['file_path'])
+            # Enviar QR Code (gerado em memória a partir do código PIX)
+            await send_qr_code(message.channel, user_id, payment_id, valor, filenames, pix_code)
             
             # Log de QR code enviado
             await self.log_qr_sent(user_id, payment_id, valor)
+            end_span(span, payment_id=payment_id, amount=valor)
             
         except Exception as e:
             logger.error(f"Erro na integração Mercado Pago: {e}")
+            end_span(span, "error", error=str(e))
             await self.log_payment_error(message.author.id, str(e))
             
             # Mensagem de erro mais informativa
@@ -358,6 +602,23 @@ class UploadManager:
         except Exception as e:
             logger.error(f"Erro ao logar erro de upload: {e}")
 
+    async def log_copycat(self, user_id: int, file_info: Dict, match: Dict):
+        """Log de possível cópia de projeto"""
+        try:
+            from core.logs.organized_logger import log_action
+            await log_action(
+                user_id=user_id,
+                action="Possível Cópia de Projeto",
+                details=(
+                    f"Arquivo: {file_info['filename']} | Similaridade: {match['score']:.0f}% "
+                    f"com projeto de <@{match['matched_user_id']}>"
+                    + (" | Bloqueado automaticamente" if match["blocked"] else "")
+                ),
+                success=not match["blocked"]
+            )
+        except Exception as e:
+            logger.error(f"Erro ao logar possível cópia: {e}")
+
     async def log_payment_created(self, user_id: int, payment_id: str, valor: float, filename: str):
         """Log de pagamento criado"""
         try:
@@ -413,9 +674,10 @@ class UploadManager:
         except Exception as e:
             logger.error(f"Erro ao logar tentativa de upload não autorizado: {e}")
 
-async def send_qr_code(channel, user_id, payment_id, valor, file_path):
+async def send_qr_code(channel, user_id, payment_id, valor, file_path, pix_code):
     """Envia QR Code do PIX no canal"""
     try:
+        from core.payments.qrcodes import qr_renderer
         embed = discord.Embed(
             title="💳 Pagamento PIX Mercado Pago Necessário",
             description="Para prosseguir com o deploy, realize o pagamento via PIX usando o QR Code abaixo.",
@@ -427,21 +689,15 @@ async def send_qr_code(channel, user_id, payment_id, valor, file_path):
         embed.add_field(name="Arquivo", value=f"`{os.path.basename(file_path)}`", inline=True)
         embed.set_footer(text="HyperDeploy • Sistema de Pagamentos")
         
-        # Gerar QR Code
-        qr_path = f"qrcodes/{payment_id}_qrcode.png"
-        os.makedirs("qrcodes", exist_ok=True)
-        
-        # Aqui você precisaria gerar o QR Code real do PIX
-        # Por enquanto, vamos usar um placeholder
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(f"PIX_PAYMENT_{payment_id}")
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        img.save(qr_path)
-        
-        file = discord.File(qr_path, filename="qrcode.png")
+        # PNG gerado em memória (sem passar pelo disco) e guardado para reenvio
+        file = await qr_renderer.get_file(pix_code)
         embed.set_image(url="attachment://qrcode.png")
-        await channel.send(embed=embed, file=file)
+        try:
+            with discord_send_seconds.time(kind="qr_code"):
+                await channel.send(embed=embed, file=file)
+        except Exception:
+            discord_send_errors.inc(kind="qr_code")
+            raise
         logger.info(f"💳 QR Code Mercado Pago enviado para {user_id} - R$ {valor:.2f}")
         
     except Exception as e:
@@ -453,6 +709,9 @@ async def send_qr_code(channel, user_id, payment_id, valor, file_path):
         )
         await channel.send(embed=embed)
 
+# Instância global
+upload_manager = None
+
 def setup(bot):
     global upload_manager
     upload_manager = UploadManager(bot) 
\ No newline at end of file
@@ -0,0 +1,172 @@
+import posixpath
+import stat
+import zipfile
+from typing import Dict, List, Optional
+
+# Arquivos de configuração aceitos pela Square Cloud (na raiz do ZIP)
+CONFIG_FILES = ("squarecloud.app", "squarecloud.config")
+REQUIRED_CONFIG_KEYS = ("MAIN", "MEMORY")
+
+# Pastas que não deveriam ir no ZIP (apenas aviso)
+JUNK_DIRS = ("__MACOSX/", ".git/", "node_modules/", "__pycache__/", ".venv/", "venv/")
+
+# Limites padrão (sobrescritos pela seção validation do squarecloud.yaml)
+DEFAULT_LIMITS = {
+    "max_entries": 10000,
+    "max_uncompressed_mb": 1024,
+    "max_compression_ratio": 100,
+    "max_config_kb": 64,
+}
+
+
+def parse_config(text: str) -> Dict[str, str]:
+    """Lê o squarecloud.app/squarecloud.config (formato CHAVE=valor)"""
+    config = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        config[key.strip().upper()] = value.strip()
+    return config
+
+
+def is_unsafe_path(name: str) -> bool:
+    """Caminhos que escapariam da pasta da aplicação ao extrair"""
+    normalized = name.replace("\\", "/")
+    if normalized.startswith("/") or (len(normalized) > 1 and normalized[1] == ":"):
+        return True
+    return ".." in normalized.split("/")
+
+
+def validate_zip(zip_path: str, limits: Optional[Dict] = None) -> Dict:
+    """
+    Inspeciona o diretório central do ZIP (sem extrair) e verifica a estrutura
+    exigida pela Square Cloud.
+    Roda em um processo separado: recebe e retorna apenas tipos simples.
+    :return: {"valid", "errors", "warnings", "main", "entries", "uncompressed_size"}
+    """
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    errors: List[str] = []
+    warnings: List[str] = []
+    result = {
+        "valid": False, "errors": errors, "warnings": warnings,
+        "main": None, "entries": 0, "uncompressed_size": 0,
+    }
+
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        errors.append("O arquivo não é um ZIP válido ou está corrompido")
+        return result
+    except OSError as e:
+        errors.append(f"Não foi possível abrir o arquivo: {e}")
+        return result
+
+    with archive:
+        entries = archive.infolist()
+        result["entries"] = len(entries)
+        if not entries:
+            errors.append("O ZIP está vazio")
+            return result
+        if len(entries) > limits["max_entries"]:
+            errors.append(
+                f"O ZIP tem arquivos demais ({len(entries)}; máximo {limits['max_entries']})"
+            )
+            return result
+
+        names = set()
+        unsafe = []
+        encrypted = []
+        suspicious = []
+        junk = set()
+        total_size = 0
+        max_ratio = limits["max_compression_ratio"]
+        for info in entries:
+            name = info.filename.replace("\\", "/")
+            names.add(name)
+            total_size += info.file_size
+
+            if is_unsafe_path(name):
+                unsafe.append(name)
+            elif stat.S_ISLNK(info.external_attr >> 16):
+                unsafe.append(f"{name} (link simbólico)")
+            if info.flag_bits & 0x1:
+                encrypted.append(name)
+
+            # Taxa de compressão absurda em arquivos grandes = possível zip bomb
+            compress_size = max(info.compress_size, 1)
+            if info.file_size > 1024 * 1024 and info.file_size > max_ratio * compress_size:
+                suspicious.append(f"{name} ({info.file_size // compress_size}:1)")
+
+            for junk_dir in JUNK_DIRS:
+                if name.startswith(junk_dir) or f"/{junk_dir}" in name:
+                    junk.add(junk_dir.rstrip("/"))
+
+        result["uncompressed_size"] = total_size
+        if total_size > limits["max_uncompressed_mb"] * 1024 * 1024:
+            errors.append(
+                f"Conteúdo descompactado grande demais ({total_size / (1024 * 1024):.0f} MB; "
+                f"máximo {limits['max_uncompressed_mb']} MB)"
+            )
+        if unsafe:
+            errors.append("Caminhos não permitidos: " + _format_names(unsafe))
+        if encrypted:
+            errors.append("Arquivos protegidos por senha: " + _format_names(encrypted))
+        if suspicious:
+            errors.append("Taxa de compressão suspeita: " + _format_names(suspicious))
+        if junk:
+            warnings.append("Pastas desnecessárias no ZIP: " + ", ".join(sorted(junk)))
+
+        # Arquivo de configuração na raiz
+        config_name = next((name for name in CONFIG_FILES if name in names), None)
+        if not config_name:
+            nested = sorted(
+                name for name in names
+                if posixpath.basename(name) in CONFIG_FILES
+            )
+            if nested:
+                errors.append(
+                    f"`{posixpath.basename(nested[0])}` deve estar na raiz do ZIP "
+                    f"(encontrado em `{nested[0]}`). Compacte o conteúdo da pasta, não a pasta."
+                )
+            else:
+                errors.append("Arquivo `squarecloud.app` ou `squarecloud.config` não encontrado")
+            return _finish(result)
+
+        config_info = archive.getinfo(config_name)
+        if config_info.file_size > limits["max_config_kb"] * 1024:
+            errors.append(f"`{config_name}` é grande demais para um arquivo de configuração")
+            return _finish(result)
+        try:
+            config = parse_config(archive.read(config_name).decode("utf-8", errors="replace"))
+        except Exception as e:
+            errors.append(f"Não foi possível ler `{config_name}`: {e}")
+            return _finish(result)
+
+        missing = [key for key in REQUIRED_CONFIG_KEYS if not config.get(key)]
+        if missing:
+            errors.append(f"`{config_name}` sem {', '.join(missing)}")
+
+        # Arquivo principal
+        main = config.get("MAIN")
+        if main:
+            main = main.replace("\\", "/")
+            while main.startswith("./"):
+                main = main[2:]
+            result["main"] = main
+            if is_unsafe_path(main):
+                errors.append(f"MAIN inválido: `{main}`")
+            elif main not in names:
+                errors.append(f"Arquivo principal `{main}` (MAIN) não encontrado no ZIP")
+
+    return _finish(result)
+
+
+def _format_names(names: List[str]) -> str:
+    return ", ".join(f"`{name}`" for name in names[:5])
+
+
+def _finish(result: Dict) -> Dict:
+    result["valid"] = not result["errors"]
+    return result
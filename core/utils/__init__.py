@@ -1,4 +1,6 @@
 # Utilitários do HyperDeploy
 from .cleanup import CleanupManager, start_cleanup, stop_cleanup
+from .deadlines import DeadlineScheduler
+from .supervisor import TaskSupervisor
 
-__all__ = ['CleanupManager', 'start_cleanup', 'stop_cleanup']
+__all__ = ['CleanupManager', 'DeadlineScheduler', 'TaskSupervisor', 'start_cleanup', 'stop_cleanup']
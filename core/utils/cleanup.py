@@ -1,6 +1,4 @@
-import os
 import asyncio
-import time
 from datetime import datetime, timedelta
 from core.logs.logger import logger
 
@@ -17,7 +15,8 @@ class CleanupManager:
         # Configurações de limpeza
         self.qrcode_expiry_hours = 1  # QR Codes expiram em 1 hora
         self.upload_expiry_hours = 24  # Uploads expiram em 24 horas
-        self.cleanup_interval = 300  # Limpeza a cada 5 minutos
+        # Expirações pontuais ficam com o agendador de prazos; a varredura é só uma rede de segurança
+        self.cleanup_interval = 3600  # Limpeza a cada 1 hora
     
     async def start_cleanup_service(self):
         """Inicia o serviço de limpeza automática"""
@@ -59,23 +58,20 @@ class CleanupManager:
     
     async def _cleanup_qrcodes(self):
         """Remove QR Codes expirados"""
-        if not os.path.exists(self.qrcodes_dir):
-            return 0
+        from core.storage.async_io import remove_files, scan_dir
         
-        removed_count = 0
-        expiry_time = datetime.now() - timedelta(hours=self.qrcode_expiry_hours)
+        expiry_time = (datetime.now() - timedelta(hours=self.qrcode_expiry_hours)).timestamp()
         
         try:
-            for filename in os.listdir(self.qrcodes_dir):
-                file_path = os.path.join(self.qrcodes_dir, filename)
-                
-                if os.path.isfile(file_path):
-                    file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                    
-                    if file_time < expiry_time:
-                        os.remove(file_path)
-                        removed_count += 1
-                        logger.debug(f"QR Code expirado removido: {filename}")
+            # Listagem e remoção rodam no executor de I/O, fora do loop
+            expired = [
+                (filename, file_path)
+                for filename, file_path, _, _, ctime in await scan_dir(self.qrcodes_dir)
+                if ctime < expiry_time
+            ]
+            removed_count, _ = await remove_files([file_path for _, file_path in expired])
+            for filename, _ in expired:
+                logger.debug(f"QR Code expirado removido: {filename}")
             
             return removed_count
             
@@ -84,26 +80,37 @@ class CleanupManager:
             return 0
     
     async def _cleanup_uploads(self):
-        """Remove uploads expirados"""
-        if not os.path.exists(self.uploads_dir):
-            return 0
+        """Remove uploads sem referências (blobs) e arquivos soltos expirados"""
+        from core.storage.async_io import remove_files, scan_dir
+        from core.storage.blobs import blob_store
         
-        removed_count = 0
-        expiry_time = datetime.now() - timedelta(hours=self.upload_expiry_hours)
+        expiry_time = (datetime.now() - timedelta(hours=self.upload_expiry_hours)).timestamp()
         
         try:
-            for filename in os.listdir(self.uploads_dir):
-                file_path = os.path.join(self.uploads_dir, filename)
-                
-                if os.path.isfile(file_path):
-                    file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                    
-                    if file_time < expiry_time:
-                        os.remove(file_path)
-                        removed_count += 1
-                        logger.debug(f"Upload expirado removido: {filename}")
+            # Blobs: removidos quando nenhum pagamento ou ticket os referencia
+            removed_count = 0
+            if blob_store:
+                removed_count, removed_bytes = await blob_store.collect_garbage()
+                if removed_count:
+                    logger.debug(f"{removed_count} blobs sem referência removidos ({removed_bytes / (1024 * 1024):.2f} MB)")
             
-            return removed_count
+            # Arquivos soltos (uploads antigos e downloads interrompidos): por idade
+            # Listagem e remoção rodam no executor de I/O, fora do loop
+            expired = [
+                (filename, file_path)
+                for filename, file_path, _, _, ctime in await scan_dir(self.uploads_dir)
+                if ctime < expiry_time
+            ]
+            removed, _ = await remove_files([file_path for _, file_path in expired])
+            for filename, _ in expired:
+                logger.debug(f"Upload expirado removido: {filename}")
+            
+            # Versões recompactadas sem uso recente
+            from core.payments.repack import repack_stage
+            if repack_stage and repack_stage.enabled:
+                removed += await repack_stage.cleanup(self.upload_expiry_hours)
+            
+            return removed_count + removed
             
         except Exception as e:
             logger.error(f"Erro ao limpar uploads: {e}")
@@ -128,20 +135,17 @@ class CleanupManager:
         
         # Contar arquivos atuais
         try:
-            if os.path.exists(self.qrcodes_dir):
-                stats['qrcodes_count'] = len([f for f in os.listdir(self.qrcodes_dir) if os.path.isfile(os.path.join(self.qrcodes_dir, f))])
-            else:
-                stats['qrcodes_count'] = 0
-                
-            if os.path.exists(self.uploads_dir):
-                stats['uploads_count'] = len([f for f in os.listdir(self.uploads_dir) if os.path.isfile(os.path.join(self.uploads_dir, f))])
-            else:
-                stats['uploads_count'] = 0
-                
+            from core.storage.async_io import scan_dir
+            stats['qrcodes_count'] = len(await scan_dir(self.qrcodes_dir))
+            from core.storage.blobs import blob_store
+            stats['uploads_count'] = len(await scan_dir(self.uploads_dir))
+            stats['blobs_count'] = blob_store.get_statistics()['blobs'] if blob_store else 0
+            
         except Exception as e:
             logger.error(f"Erro ao contar arquivos: {e}")
             stats['qrcodes_count'] = 0
             stats['uploads_count'] = 0
+            stats['blobs_count'] = 0
         
         return stats
 
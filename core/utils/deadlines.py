@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from core.logs.logger import logger
+from core.utils.metrics import LatencyHistogram
+
+
+class DeadlineScheduler:
+    """
+    Prazos de expiração (pagamentos, tickets, seleções...) em um heap de (prazo, chave).
+    Um único loop dorme até o próximo prazo: sem nada vencendo, não há trabalho nenhum.
+    """
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, str]] = []
+        # chave -> (prazo, sequência, callback); entradas do heap com outra sequência estão obsoletas
+        self.entries: Dict[str, Tuple[float, int, Callable]] = {}
+        self.sequence = itertools.count()
+        self.changed = asyncio.Event()
+        self.running_callbacks: Set[asyncio.Task] = set()
+
+        # Métricas
+        self.fired = 0
+        self.failures = 0
+        # Atraso entre o prazo e a execução do callback
+        self.lateness = LatencyHistogram()
+
+    def schedule(self, key: str, deadline: float, callback: Callable):
+        """Agenda (ou reagenda) o callback da chave para o timestamp deadline"""
+        sequence = next(self.sequence)
+        self.entries[key] = (deadline, sequence, callback)
+        heapq.heappush(self.heap, (deadline, sequence, key))
+        # Só acorda o loop se o novo prazo for o mais próximo
+        if self.heap[0][1] == sequence:
+            self.changed.set()
+        # Muitas entradas obsoletas: reconstruir o heap
+        if len(self.heap) > 64 and len(self.heap) > 2 * len(self.entries):
+            self.compact()
+
+    def cancel(self, key: str) -> bool:
+        """Cancela o prazo da chave (a entrada do heap é descartada quando chegar ao topo)"""
+        return self.entries.pop(key, None) is not None
+
+    def compact(self):
+        self.heap = [(deadline, sequence, key) for key, (deadline, sequence, _) in self.entries.items()]
+        heapq.heapify(self.heap)
+
+    def next_deadline(self) -> Optional[float]:
+        while self.heap:
+            deadline, sequence, key = self.heap[0]
+            entry = self.entries.get(key)
+            if entry and entry[1] == sequence:
+                return deadline
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now: float) -> List[Tuple[str, float, Callable]]:
+        due = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return due
+            _, _, key = heapq.heappop(self.heap)
+            _, _, callback = self.entries.pop(key)
+            due.append((key, deadline, callback))
+
+    async def run(self):
+        """Loop do agendador (serviço supervisionado)"""
+        while True:
+            now = time.time()
+            for key, deadline, callback in self.pop_due(now):
+                self.fire(key, deadline, callback, now)
+
+            deadline = self.next_deadline()
+            self.changed.clear()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def fire(self, key: str, deadline: float, callback: Callable, now: float):
+        self.fired += 1
+        self.lateness.observe(max(0.0, now - deadline))
+        try:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                # Callbacks com I/O (ex.: apagar o canal do ticket) não atrasam os próximos prazos
+                task = asyncio.ensure_future(self._await_callback(key, result))
+                self.running_callbacks.add(task)
+                task.add_done_callback(self.running_callbacks.discard)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Erro no prazo {key}: {e}")
+
+    async def _await_callback(self, key: str, coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Erro no prazo {key}: {e}")
+
+    def get_statistics(self) -> Dict:
+        deadline = self.next_deadline()
+        return {
+            "scheduled": len(self.entries),
+            "fired": self.fired,
+            "failures": self.failures,
+            "next_in": max(0.0, deadline - time.time()) if deadline is not None else None,
+            "lateness": self.lateness.snapshot(),
+        }
+
+
+# Instância global
+deadline_scheduler = None
+
+
+def setup():
+    global deadline_scheduler
+    if deadline_scheduler is None:
+        deadline_scheduler = DeadlineScheduler()
+    return deadline_scheduler
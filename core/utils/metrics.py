@@ -0,0 +1,302 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Limites padrão dos buckets de latência (em segundos)
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300
+)
+
+# Prefixo de todas as métricas exportadas
+METRICS_PREFIX = "hyperdeploy_"
+INF_LABEL = 'le="+Inf"'
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets fixos (memória constante)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # Um contador por bucket + um para valores acima do último limite
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Registra uma amostra"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, pct: float) -> float:
+        """Estimativa do percentil (limite superior do bucket correspondente)"""
+        with self.lock:
+            if self.count == 0:
+                return 0.0
+            target = pct / 100 * self.count
+            cumulative = 0
+            for index, bucket_count in enumerate(self.counts):
+                cumulative += bucket_count
+                if cumulative >= target:
+                    if index < len(self.buckets):
+                        return min(self.buckets[index], self.max)
+                    return self.max
+            return self.max
+
+    def snapshot(self) -> Dict:
+        """Resumo do histograma para estatísticas"""
+        with self.lock:
+            count = self.count
+            total = self.total
+            maximum = self.max
+        return {
+            "count": count,
+            "avg": total / count if count else 0.0,
+            "max": maximum,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+    def export(self) -> Tuple[List[Tuple[float, int]], int, float]:
+        """Buckets cumulativos (limite, contagem), total de amostras e soma (formato Prometheus)"""
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+            total = self.total
+        cumulative = 0
+        buckets = []
+        for limit, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets.append((limit, cumulative))
+        return buckets, count, total
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence, extra: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Família de métricas com rótulos (labels).
+    Com function, o valor é lido na hora da coleta: número ou {(valores dos rótulos): número}.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Callable = None):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Dict[tuple, float]:
+        if self.function is None:
+            with self.lock:
+                return dict(self.values)
+        value = self.function()
+        if isinstance(value, dict):
+            return {key if isinstance(key, tuple) else (key,): number for key, number in value.items()}
+        return {(): value}
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Um LatencyHistogram por combinação de rótulos (buckets fixos, memória constante)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self.histograms: Dict[tuple, LatencyHistogram] = {}
+
+    def labels(self, **labels) -> LatencyHistogram:
+        key = self._key(labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram(self.buckets))
+        return histogram
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for key, histogram in histograms:
+            buckets, count, total = histogram.export()
+            for limit, cumulative in buckets:
+                labels = _format_labels(self.labelnames, key, f'le="{limit}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, INF_LABEL)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro das métricas do processo, exportadas no formato texto do Prometheus"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        metric = self.metrics.get(METRICS_PREFIX + name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(METRICS_PREFIX + name)
+                if metric is None:
+                    metric = cls(name, *args, **kwargs)
+                    self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Callable = None) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames, function)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Callable = None) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames, function)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                # Uma coleta com erro não derruba as demais
+                lines.append(f"# {metric.name}: erro na coleta ({e})")
+        return "\n".join(lines) + "\n"
+
+
+# Registro global (sem configuração: pode ser usado desde a importação)
+metrics = MetricsRegistry()
+
+operation_seconds = metrics.histogram(
+    "operation_duration_seconds", "Duração das operações instrumentadas", ("operation",)
+)
+operations_total = metrics.counter(
+    "operations_total", "Operações instrumentadas por resultado", ("operation", "outcome")
+)
+discord_send_seconds = metrics.histogram(
+    "discord_send_duration_seconds", "Duração dos envios de mensagens ao Discord", ("kind",)
+)
+discord_send_errors = metrics.counter(
+    "discord_send_errors_total", "Envios de mensagens ao Discord que falharam", ("kind",)
+)
+
+
+def instrument(operation: str, failed: Callable[[object], bool] = None, api: bool = False):
+    """
+    Decorador: mede a duração e conta sucesso/erro da função (síncrona ou assíncrona).
+    :param failed: identifica falhas pelo retorno (para funções que tratam o erro e retornam None/False)
+    :param api: registra também no log de chamadas de API (logger.api_call)
+    """
+    def record(start: float, outcome: str):
+        elapsed = time.perf_counter() - start
+        operation_seconds.observe(elapsed, operation=operation)
+        operations_total.inc(operation=operation, outcome=outcome)
+        if api:
+            from core.logs.logger import logger
+            logger.api_call(operation, outcome, round(elapsed * 1000))
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = "error" if failed and failed(result) else "ok"
+                    return result
+                finally:
+                    record(start, outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "error" if failed and failed(result) else "ok"
+                return result
+            finally:
+                record(start, outcome)
+        return wrapper
+
+    return decorator
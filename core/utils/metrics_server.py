@@ -0,0 +1,175 @@
+import asyncio
+from typing import Dict, Optional
+from aiohttp import web
+from core.logs.logger import logger
+from core.utils.metrics import metrics
+
+# Content-Type do formato texto do Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PAYMENT_STATUSES = ("pending", "paid", "processing", "deployed", "failed", "expired")
+
+
+def _payments_by_status() -> Dict:
+    from core.payments.manager import payment_manager
+    if not payment_manager:
+        return {}
+    return {status: payment_manager.index.count_by_status(status) for status in PAYMENT_STATUSES}
+
+
+def _deploy_statistics() -> Dict:
+    from core.payments.deploy_manager import deploy_manager
+    return deploy_manager.get_deploy_statistics() if deploy_manager else {}
+
+
+def _log_shipping_statistics() -> Dict:
+    from core.logs.shipping import log_shipper
+    return log_shipper.get_statistics() if log_shipper else {}
+
+
+def _mercadopago_statistics() -> Dict:
+    from core.payments.mercadopago import mercadopago_client
+    return mercadopago_client.get_statistics() if mercadopago_client else {}
+
+
+def _supervisor_statistics() -> Dict:
+    from core.utils.supervisor import supervisor
+    return supervisor.get_statistics() if supervisor else {}
+
+
+def _open_tickets() -> int:
+    from core.tickets.manager import ticket_manager
+    return len(ticket_manager.active_tickets) if ticket_manager else 0
+
+
+def _uploads_waiting() -> int:
+    from core.tickets.uploads import upload_manager
+    return sum(upload_manager.channel_waiting.values()) if upload_manager else 0
+
+
+def _scheduled_deadlines() -> int:
+    from core.utils.deadlines import deadline_scheduler
+    return len(deadline_scheduler.entries) if deadline_scheduler else 0
+
+
+def _pending_writes() -> int:
+    from core.storage.async_io import pending_write_count
+    return pending_write_count()
+
+
+def register_collectors():
+    """Métricas lidas na hora da coleta a partir do estado dos gerenciadores (filas, contadores)"""
+    metrics.gauge(
+        "deploy_queue_depth", "Deploys aguardando na fila",
+        function=lambda: _deploy_statistics().get("queue_depth", 0)
+    )
+    metrics.gauge(
+        "deploys_active", "Deploys em execução",
+        function=lambda: _deploy_statistics().get("active", 0)
+    )
+    metrics.counter(
+        "deploys_completed_total", "Deploys concluídos",
+        function=lambda: _deploy_statistics().get("completed", 0)
+    )
+    metrics.gauge("payments", "Pagamentos por status", ("status",), function=_payments_by_status)
+    metrics.gauge("tickets_open", "Tickets abertos", function=_open_tickets)
+    metrics.gauge(
+        "uploads_waiting", "Uploads aguardando a vez no canal do ticket", function=_uploads_waiting
+    )
+    metrics.gauge(
+        "deadlines_scheduled", "Prazos de expiração agendados", function=_scheduled_deadlines
+    )
+    metrics.gauge(
+        "storage_pending_writes", "Gravações de dados agendadas", function=_pending_writes
+    )
+    metrics.gauge(
+        "log_shipping_backlog", "Logs aguardando envio aos canais",
+        function=lambda: _log_shipping_statistics().get("backlog", 0)
+    )
+    metrics.counter(
+        "log_shipping_dropped_total", "Logs descartados por tipo", ("log_type",),
+        function=lambda: _log_shipping_statistics().get("dropped", {})
+    )
+    metrics.counter(
+        "log_shipping_sampled_total", "Logs descartados por amostragem (sobrecarga)", ("log_type",),
+        function=lambda: _log_shipping_statistics().get("sampled", {})
+    )
+    metrics.counter(
+        "mercadopago_requests_total", "Requisições ao Mercado Pago",
+        function=lambda: _mercadopago_statistics().get("requests", 0)
+    )
+    metrics.counter(
+        "mercadopago_retries_total", "Novas tentativas ao Mercado Pago",
+        function=lambda: _mercadopago_statistics().get("retries", 0)
+    )
+    metrics.counter(
+        "mercadopago_failures_total", "Requisições ao Mercado Pago sem sucesso",
+        function=lambda: _mercadopago_statistics().get("failures", 0)
+    )
+    metrics.counter(
+        "task_failures_total", "Falhas das tarefas em segundo plano", ("task",),
+        function=lambda: {
+            name: stats["failures"] for name, stats in _supervisor_statistics().items()
+        }
+    )
+    metrics.counter(
+        "task_restarts_total", "Reinícios das tarefas em segundo plano", ("task",),
+        function=lambda: {
+            name: stats["restarts"] for name, stats in _supervisor_statistics().items()
+        }
+    )
+
+class MetricsServer:
+    """Endpoint HTTP local com as métricas no formato do Prometheus"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9108, path: str = "/metrics"):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.runner: Optional[web.AppRunner] = None
+        self.stopped: Optional[asyncio.Event] = None
+        self.scrapes = 0
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        self.scrapes += 1
+        return web.Response(
+            body=metrics.render().encode("utf-8"), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE}
+        )
+
+    async def serve(self):
+        """Serviço supervisionado: mantém o endpoint no ar até a parada"""
+        self.stopped = asyncio.Event()
+        app = web.Application()
+        app.router.add_get(self.path, self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, self.host, self.port).start()
+            logger.info(f"📈 Métricas em http://{self.host}:{self.port}{self.path}")
+            await self.stopped.wait()
+        finally:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def stop(self):
+        if self.stopped:
+            self.stopped.set()
+
+
+# Instância global
+metrics_server = None
+
+
+def setup(config: Dict = None):
+    """Registra as métricas dos gerenciadores e cria o endpoint (se habilitado em `metrics`)"""
+    global metrics_server
+    config = config or {}
+    register_collectors()
+    if not config.get("enabled"):
+        return None
+    metrics_server = MetricsServer(
+        config.get("host", "127.0.0.1"),
+        int(config.get("port", 9108)),
+        config.get("path", "/metrics")
+    )
+    return metrics_server
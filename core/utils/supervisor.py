@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from core.logs.logger import logger
+from core.utils.metrics import LatencyHistogram
+
+# Espera antes de reiniciar um serviço que caiu (dobra a cada queda seguida)
+RESTART_BACKOFF_MIN = 1
+RESTART_BACKOFF_MAX = 300
+# Um serviço que ficou de pé por esse tempo volta ao backoff mínimo
+STABLE_RUN_SECONDS = 60
+# Limite padrão de cada gancho de parada (None: o gancho controla o próprio tempo)
+SHUTDOWN_HOOK_TIMEOUT = 60
+
+
+class SupervisedJob:
+    """Estado e métricas de uma tarefa supervisionada"""
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable], interval: Optional[float], jitter: float):
+        self.name = name
+        self.factory = factory
+        # interval None = serviço (corrotina com o próprio loop); senão, tarefa periódica
+        self.interval = interval
+        self.jitter = jitter
+        self.task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[float] = None
+        # Duração de cada execução e atraso em relação ao horário agendado
+        self.runtime = LatencyHistogram()
+        self.lag = LatencyHistogram()
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def next_delay(self) -> float:
+        """Intervalo com variação aleatória: tarefas de mesmo intervalo não disparam juntas"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def get_statistics(self) -> Dict:
+        return {
+            "kind": "service" if self.interval is None else "periodic",
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "last_run_at": self.last_run_at,
+            "runtime": self.runtime.snapshot(),
+            "lag": self.lag.snapshot(),
+        }
+
+
+class TaskSupervisor:
+    """Dono de todos os loops em segundo plano: uma instância por tarefa, reinício com backoff e parada ordenada"""
+
+    def __init__(self):
+        self.jobs: Dict[str, SupervisedJob] = {}
+        # Chamados na parada, antes de cancelar as tarefas (ex.: esperar deploys em andamento)
+        self.shutdown_hooks: Dict[str, Tuple[Callable[[], Awaitable], Optional[float]]] = {}
+        self.stopping = False
+
+    def add_periodic(self, name: str, func: Callable, interval: float, jitter: float = 0.1):
+        """Registra uma tarefa executada a cada interval segundos (func pode ser síncrona ou assíncrona)"""
+        if name not in self.jobs:
+            self.jobs[name] = SupervisedJob(name, func, interval, jitter)
+
+    def add_service(self, name: str, factory: Callable[[], Awaitable], on_shutdown: Callable[[], Awaitable] = None,
+                    shutdown_timeout: Optional[float] = SHUTDOWN_HOOK_TIMEOUT):
+        """
+        Registra um serviço de longa duração (reiniciado com backoff se cair).
+        :param shutdown_timeout: limite do on_shutdown (None para ganchos que já têm o próprio prazo)
+        """
+        if name not in self.jobs:
+            self.jobs[name] = SupervisedJob(name, factory, None, 0)
+        if on_shutdown:
+            self.shutdown_hooks[name] = (on_shutdown, shutdown_timeout)
+
+    def start(self) -> int:
+        """Inicia as tarefas que ainda não estão rodando (seguro de chamar a cada reconexão)"""
+        started = 0
+        for job in self.jobs.values():
+            if job.running or self.stopping:
+                continue
+            runner = self._run_service if job.interval is None else self._run_periodic
+            job.task = asyncio.create_task(runner(job), name=f"supervisor:{job.name}")
+            started += 1
+        if started:
+            logger.info(f"🧭 {started} tarefa(s) em segundo plano iniciada(s)")
+        return started
+
+    async def _run_periodic(self, job: SupervisedJob):
+        loop = asyncio.get_running_loop()
+        # Primeira execução também com variação: nada dispara em rajada na inicialização
+        scheduled = loop.time() + job.next_delay() * random.random()
+        while not self.stopping:
+            await asyncio.sleep(max(0, scheduled - loop.time()))
+            started = loop.time()
+            job.lag.observe(max(0.0, started - scheduled))
+            try:
+                result = job.factory()
+                if asyncio.iscoroutine(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                logger.error(f"Erro na tarefa {job.name}: {e}")
+            finally:
+                job.runs += 1
+                job.last_run_at = time.time()
+                job.runtime.observe(loop.time() - started)
+            scheduled = loop.time() + job.next_delay()
+
+    async def _run_service(self, job: SupervisedJob):
+        loop = asyncio.get_running_loop()
+        backoff = RESTART_BACKOFF_MIN
+        while not self.stopping:
+            started = loop.time()
+            job.runs += 1
+            job.last_run_at = time.time()
+            try:
+                await job.factory()
+                if self.stopping:
+                    return
+                logger.warning(f"Serviço {job.name} terminou inesperadamente")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                logger.error(f"Erro no serviço {job.name}: {e}")
+            finally:
+                job.runtime.observe(loop.time() - started)
+
+            if loop.time() - started >= STABLE_RUN_SECONDS:
+                backoff = RESTART_BACKOFF_MIN
+            delay = backoff * random.uniform(0.5, 1.5)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+            logger.info(f"🔁 Reiniciando {job.name} em {delay:.0f}s")
+            await asyncio.sleep(delay)
+            job.restarts += 1
+
+    async def shutdown(self):
+        """Para novas execuções, espera os ganchos de parada e cancela o que restar"""
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("🧭 Encerrando tarefas em segundo plano...")
+
+        for name, (hook, timeout) in self.shutdown_hooks.items():
+            try:
+                if timeout is None:
+                    await hook()
+                else:
+                    await asyncio.wait_for(hook(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Parada de {name} excedeu {timeout:.0f}s")
+            except Exception as e:
+                logger.error(f"Erro ao parar {name}: {e}")
+
+        tasks = [job.task for job in self.jobs.values() if job.running]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_statistics(self) -> Dict:
+        return {name: job.get_statistics() for name, job in self.jobs.items()}
+
+
+# Instância global
+supervisor = None
+
+
+def setup():
+    global supervisor
+    if supervisor is None:
+        supervisor = TaskSupervisor()
+    return supervisor
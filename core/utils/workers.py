@@ -0,0 +1,75 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+from core.logs.logger import logger
+from core.utils.metrics import LatencyHistogram
+
+# Trabalho pesado de CPU (ex.: inspeção de ZIPs) roda fora do processo do bot
+DEFAULT_MAX_WORKERS = min(2, os.cpu_count() or 1)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_max_workers = DEFAULT_MAX_WORKERS
+
+# Tempo das tarefas executadas no pool (segundos)
+cpu_latency = LatencyHistogram()
+
+
+def configure(max_workers: int):
+    """Define o tamanho do pool (vale para o próximo pool criado)"""
+    global _max_workers
+    _max_workers = max(1, int(max_workers))
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Sem fork direto: o processo já tem threads (I/O, escrita dos logs) e um fork com
+        # algum lock delas ocupado pode travar o worker
+        methods = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in methods else "spawn"
+        _process_pool = ProcessPoolExecutor(
+            max_workers=_max_workers, mp_context=multiprocessing.get_context(method)
+        )
+        logger.info(f"⚙️ Pool de processos iniciado ({_max_workers} workers)")
+    return _process_pool
+
+
+async def run_cpu(func: Callable, *args):
+    """Executa uma função (de nível de módulo) em um processo separado"""
+    global _process_pool
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        pool = get_process_pool()
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # Um worker morreu (OOM, sinal): recriar o pool e tentar uma vez
+            if _process_pool is pool:
+                logger.warning("Pool de processos quebrado; recriando")
+                # Encerrar o pool antigo libera o thread de gerenciamento e os workers mortos
+                pool.shutdown(wait=False, cancel_futures=True)
+                _process_pool = None
+            return await loop.run_in_executor(get_process_pool(), func, *args)
+    finally:
+        cpu_latency.observe(time.perf_counter() - start)
+
+
+def shutdown_workers():
+    """Encerra o pool de processos"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def get_worker_statistics() -> Dict:
+    return {
+        "max_workers": _max_workers,
+        "running": _process_pool is not None,
+        "latency": cpu_latency.snapshot(),
+    }